@@ -26,3 +26,8 @@ class CFModel(Sequential):
     # The rate function to predict user's rating of unrated items
     def rate(self, user_id, item_id):
         return self.predict([np.array([user_id]), np.array([item_id])])[0][0]
+
+    # NumPy copy of the factors (models.numpy_inference.NumpyCF) for serving without a predict call per pair
+    def to_numpy(self):
+        from models.numpy_inference import NumpyCF
+        return NumpyCF.from_keras(self)
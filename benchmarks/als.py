@@ -0,0 +1,53 @@
+# Benchmark: ImplicitALS seconds per iteration vs factors and threads, and precision@K
+# Run from the repository root with: python -m benchmarks.als
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+from models.als import ImplicitALS, load_user_item_matrix
+from utils.evaluation_metrics import ranking_metrics
+
+def holdout_split(user_items, test_share=0.2, seed=0):
+    # Hide a random share of every user's interactions for evaluation
+    coo = user_items.tocoo()
+    test = np.random.default_rng(seed).random(coo.nnz) < test_share
+    def part(mask):
+        return sp.csr_matrix((coo.data[mask], (coo.row[mask], coo.col[mask])), shape=user_items.shape)
+    return part(~test), part(test)
+
+def seconds_per_iteration(user_items, factors, n_threads, iterations=3):
+    times = []
+    ImplicitALS(factors=factors, iterations=iterations, n_threads=n_threads).fit(
+        user_items, callback=lambda iteration, seconds: times.append(seconds))
+    return min(times)
+
+def main(factor_counts=(32, 64, 128), ks=(5, 10, 20)):
+    user_items = load_user_item_matrix()
+    print(f"{user_items.shape[0]} users x {user_items.shape[1]} items, {user_items.nnz} interactions")
+
+    thread_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    print(f"{'factors':>7} " + " ".join(f"{f'{n} thr (s)':>10}" for n in thread_counts))
+    for factors in factor_counts:
+        timings = [seconds_per_iteration(user_items, factors, n) for n in thread_counts]
+        print(f"{factors:>7} " + " ".join(f"{t:>10.3f}" for t in timings))
+
+    # Ranking quality on held-out interactions, against a most-popular baseline
+    train, test = holdout_split(user_items)
+    users = np.flatnonzero(np.diff(test.indptr))
+    popular = np.argsort(-np.asarray((train > 0).sum(axis=0)).ravel(), kind='stable')
+    baseline = np.tile(popular, (len(users), 1))
+    seen = train[users].toarray() > 0
+    baseline = np.array([row[~s[row]][:max(ks)] for row, s in zip(baseline, seen)])
+    results = {'most popular': ranking_metrics(baseline, test[users], ks)}
+    for factors in factor_counts:
+        model = ImplicitALS(factors=factors, iterations=15).fit(train)
+        top, _ = model.recommend(users, train, max(ks))
+        results[f'ALS {factors} factors'] = ranking_metrics(top, test[users], ks)
+
+    print(f"\n{'model':<18} " + " ".join(f"{f'P@{k}':>7} {f'NDCG@{k}':>8}" for k in ks))
+    for name, metrics in results.items():
+        print(f"{name:<18} " + " ".join(f"{metrics[f'precision@{k}']:>7.4f} {metrics[f'ndcg@{k}']:>8.4f}" for k in ks))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Benchmark: cold-start import time and time-to-first-recommendation
+# Run from the repository root with: python -m benchmarks.cold_start
+import importlib.util
+import json
+import subprocess
+import sys
+import tempfile
+
+import config
+
+# Each case runs in a fresh interpreter so module caches do not hide import cost
+CASES = {
+    'collaborative_filtering': ('models.collaborative_filtering', 'CollaborativeFilteringModel', 1),
+    'content_based': ('models.content_based', 'ContentBasedModel', 'Toy Story (1995)'),
+    'deep_learning': ('models.deep_learning', 'DeepLearningModel', 1),
+}
+
+SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+module = __import__({module!r}, fromlist=[{cls!r}])
+imported = time.perf_counter()
+model = getattr(module, {cls!r})()
+model = model.load({path!r}) if {load!r} else model.build()
+model.recommend({query!r})
+done = time.perf_counter()
+if not {load!r}:
+    model.save({path!r})
+print(json.dumps({{'import': imported - start, 'first_recommendation': done - start}}))
+'''
+
+def run_case(module, cls, query, path, load):
+    code = SCRIPT.format(module=module, cls=cls, query=query, path=path, load=load)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=config.BASE_DIR, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    print(f"{'model':<24} {'import (s)':>10} {'build+rec (s)':>14} {'load+rec (s)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (module, cls, query) in CASES.items():
+            if name == 'deep_learning' and importlib.util.find_spec('tensorflow') is None:
+                print(f"{name:<24} skipped (tensorflow not installed)")
+                continue
+            built = run_case(module, cls, query, f'{tmp}/{name}', load=False)
+            loaded = run_case(module, cls, query, f'{tmp}/{name}', load=True)
+            print(f"{name:<24} {built['import']:>10.3f} {built['first_recommendation']:>14.3f} "
+                  f"{loaded['first_recommendation']:>13.3f}")
+
+if __name__ == "__main__":
+    main()
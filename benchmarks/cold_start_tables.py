@@ -0,0 +1,61 @@
+# Benchmark: cold-start table build, lookup latency and incremental updates vs SVD predictions for an unknown user
+# Run from the repository root with: python -m benchmarks.cold_start_tables
+import time
+
+import numpy as np
+
+from benchmarks.common import load_ratings, time_call
+from models.cold_start import ColdStartRecommender
+
+def latency(func, n=2000):
+    # p50 / p99 of single calls in microseconds
+    samples = np.empty(n)
+    for i in range(n):
+        start = time.perf_counter()
+        func()
+        samples[i] = time.perf_counter() - start
+    return np.percentile(samples, 50) * 1e6, np.percentile(samples, 99) * 1e6
+
+def main(n_updates=20000):
+    from models.collaborative_filtering import CollaborativeFilteringModel
+
+    user_ratings = load_ratings()
+    build_time, model = time_call(lambda: ColdStartRecommender().build(user_ratings), repeat=1)
+    print(f"build: {build_time:.2f}s for {len(model.segments)} segments x {model.tables.shape[1]} buckets")
+
+    print(f"{'lookup':<45} {'p50 us':>8} {'p99 us':>8}")
+    lookups = {
+        'profiled user': lambda: model.recommend(user_id=1),
+        'unknown user (global table)': lambda: model.recommend(user_id=10**6),
+        'demographics + genre': lambda: model.recommend(demographics={'gender': 'F', 'age': 25}, genre='Comedy'),
+        'sparse segment (backoff)': lambda: model.recommend(demographics={'gender': 'M', 'age': 56, 'occupation': 8}),
+        'profiled user + exclude 100 rated': lambda: model.recommend(user_id=1, exclude=range(1, 101)),
+    }
+    for name, func in lookups.items():
+        p50, p99 = latency(func)
+        print(f"{name:<45} {p50:>8.1f} {p99:>8.1f}")
+
+    # Incremental updates: replayed ratings with the default periodic re-ranking
+    rng = np.random.default_rng(0)
+    rows = user_ratings.iloc[rng.integers(0, len(user_ratings), n_updates)]
+    updates = list(zip(rows['userId'].tolist(), rows['movieId'].tolist(), rows['rating'].tolist()))
+    start = time.perf_counter()
+    for user_id, movie_id, rating in updates:
+        model.add_rating(user_id, movie_id, rating)
+    seconds = time.perf_counter() - start
+    print(f"add_rating: {n_updates / seconds:,.0f} ratings/s including a refresh every {model.refresh_every}")
+    for user_id, movie_id, rating in updates[:model.refresh_every - 1]:
+        model.add_rating(user_id, movie_id, rating)
+    refresh_time, _ = time_call(model.refresh, repeat=1)
+    print(f"refresh of {model.refresh_every - 1} pending ratings: {refresh_time * 1e3:.1f} ms")
+
+    # What an unknown user used to cost: one SVD prediction per movie of the catalog
+    cf_model = CollaborativeFilteringModel().build(user_ratings)
+    svd_time, _ = time_call(lambda: cf_model.recommend(10**6), repeat=3)
+    cf_model.cold_start = model
+    table_time, _ = time_call(lambda: cf_model.recommend(10**6), repeat=3)
+    print(f"CollaborativeFilteringModel.recommend(unknown user): SVD {svd_time * 1e3:.2f} ms, "
+          f"cold-start table {table_time * 1e3:.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Shared helpers for the benchmark scripts
+import time
+
+import pandas as pd
+
+from utils.data_preprocessing import load_user_ratings
+
+def load_ratings():
+    # Load the bundled MovieLens ratings (user_ratings.csv)
+    return load_user_ratings()
+
+def time_call(func, *args, repeat=3, **kwargs):
+    """
+    Times a function call and keeps the best of several runs.
+
+    Args:
+        func: callable to benchmark
+        repeat: number of runs
+
+    Returns:
+        best: fastest wall time in seconds
+        result: return value of the last run
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def upscale_ratings(user_ratings, factor):
+    """
+    Builds a synthetic copy of the ratings `factor` times larger.
+
+    Every copy gets its own block of user ids, so the result has factor x
+    the users and ratings over the same movie catalog.
+
+    Args:
+        user_ratings: ratings dataframe (userId, movieId, rating, timestamp)
+        factor: number of copies
+
+    Returns:
+        upscaled ratings dataframe
+    """
+    offset = int(user_ratings['userId'].max())
+    copies = []
+    for i in range(factor):
+        copy = user_ratings.copy()
+        copy['userId'] = copy['userId'] + i * offset
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+def scale_ratings(user_ratings, n_ratings):
+    # Upscaled copy of the ratings truncated to exactly n_ratings rows (None keeps the sample)
+    if n_ratings is None:
+        return user_ratings
+    factor = -(-n_ratings // len(user_ratings))
+    return upscale_ratings(user_ratings, factor).iloc[:n_ratings].reset_index(drop=True)
+
+def trace_allocations(func, *args, **kwargs):
+    """
+    Runs a function once under tracemalloc.
+
+    Returns:
+        peak: highest traced memory during the call in bytes
+        retained_blocks: memory blocks allocated by the call and still alive after
+            it; tracemalloc does not count the allocations freed during the call
+        result: return value of the call
+    """
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = func(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retained_blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    return peak, retained_blocks, result
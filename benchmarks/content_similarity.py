@@ -0,0 +1,56 @@
+# Benchmark: dense cosine_sim matrix vs the top-K ContentSimilarityStore
+# Run from the repository root with: python -m benchmarks.content_similarity
+import os
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import linear_kernel
+
+import config
+from benchmarks.common import time_call
+from utils.ranking import top_n
+
+def peak_memory(func, *args, **kwargs):
+    # Peak traced allocation (MB) of a single call in this process
+    tracemalloc.start()
+    func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+def main(k=50):
+    # Imported here so the module-level example in content_based does not
+    # run before the timings start
+    from models.content_based import ContentSimilarityStore
+
+    movie_data = pd.read_csv(config.MOVIE_DATA_PATH)
+    features = TfidfVectorizer(stop_words='english').fit_transform(movie_data['genres'])
+    n_movies = features.shape[0]
+
+    dense_time, dense = time_call(linear_kernel, features, features, repeat=1)
+    dense_peak = peak_memory(linear_kernel, features, features)
+    print(f"dense linear_kernel: {dense_time:.2f}s, peak {dense_peak:.0f} MB, matrix {dense.nbytes / 2**20:.0f} MB")
+
+    store_peak = peak_memory(ContentSimilarityStore.build, features, k, n_jobs=1)
+    for n_jobs in sorted({1, 2, os.cpu_count() or 1}):
+        build_time, store = time_call(ContentSimilarityStore.build, features, k, n_jobs=n_jobs, repeat=1)
+        print(f"top-{k} store, n_jobs={n_jobs}: {build_time:.2f}s")
+    store_bytes = store.neighbours.nbytes + store.scores.nbytes
+    print(f"top-{k} store: peak {store_peak:.0f} MB (n_jobs=1), arrays {store_bytes / 2**20:.1f} MB")
+
+    # Query latency: sorting a full row of tuples vs slicing the store
+    queries = np.random.default_rng(0).choice(n_movies, 500)
+    sort_time, _ = time_call(lambda: [sorted(enumerate(dense[q]), key=lambda x: x[1], reverse=True)[1:11] for q in queries], repeat=1)
+    slice_time, _ = time_call(lambda: [store.most_similar(q, 10) for q in queries])
+    print(f"query: sorted tuples {sort_time / len(queries) * 1e3:.2f} ms, store slice {slice_time / len(queries) * 1e6:.1f} us")
+
+    # Agreement of the stored neighbours with an exact top-10 of the dense row
+    dense[np.arange(n_movies), np.arange(n_movies)] = -np.inf
+    reference, _ = top_n(dense[queries].astype(np.float32), 10)
+    same = np.mean(reference == store.neighbours[queries, :10])
+    print(f"top-10 agreement with dense matrix: {same:.3f}")
+
+if __name__ == "__main__":
+    main()
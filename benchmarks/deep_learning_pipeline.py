@@ -0,0 +1,69 @@
+# Benchmark: in-memory arrays vs the streaming tf.data pipeline for NeuMF training
+# Run from the repository root with: python -m benchmarks.deep_learning_pipeline
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import config
+from benchmarks.common import load_ratings, upscale_ratings
+from utils.ratings_store import ingest
+
+# Each mode trains in a fresh interpreter so peak RSS reflects only that mode
+SCRIPT = '''
+import json, resource, time
+import numpy as np, pandas as pd
+from models.deep_learning import build_neumf_model
+from utils.input_pipeline import make_ratings_dataset
+from utils.ratings_store import RatingsStore
+store = RatingsStore({store!r})
+user_encoder, movie_encoder = store.user_encoder(), store.movie_encoder()
+model = build_neumf_model(len(user_encoder), len(movie_encoder))
+start = time.perf_counter()
+if {mode!r} == 'arrays':
+    ratings = pd.read_csv({csv!r})
+    users = user_encoder.transform(ratings['userId'].values)
+    movies = movie_encoder.transform(ratings['movieId'].values)
+    model.fit([users, movies], ratings['rating'].values, batch_size={batch_size}, epochs={epochs}, verbose=0)
+    samples = len(ratings) * {epochs}
+else:
+    dataset = make_ratings_dataset(user_encoder, movie_encoder, {csv!r}, batch_size={batch_size}, subset='all')
+    model.fit(dataset, epochs={epochs}, verbose=0)
+    samples = store.n_ratings * {epochs}
+elapsed = time.perf_counter() - start
+peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({{'samples_per_second': samples / elapsed, 'peak_rss_mb': peak_mb}}))
+'''
+
+MODES = {
+    'arrays': 'pandas + in-memory arrays',
+    'stream': 'tf.data streaming',
+}
+
+def measure(mode, csv_path, store_path, batch_size, epochs):
+    code = SCRIPT.format(mode=mode, csv=csv_path, store=store_path, batch_size=batch_size, epochs=epochs)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=config.BASE_DIR, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(factors=(1, 10), batch_size=1024, epochs=1):
+    user_ratings = load_ratings()
+    with tempfile.TemporaryDirectory() as tmp:
+        for factor in factors:
+            csv_path = config.USER_RATINGS_PATH
+            if factor > 1:
+                csv_path = os.path.join(tmp, f'ratings_x{factor}.csv')
+                upscale_ratings(user_ratings, factor).to_csv(csv_path, index=False)
+            # The store provides the shared id encoders of the upscaled copy
+            store_path = os.path.join(tmp, f'store_x{factor}')
+            ingest(store_path, ratings_path=csv_path)
+
+            print(f"\n{factor}x ratings, batch size {batch_size}, {epochs} epoch(s)")
+            print(f"{'input':<26} {'samples/s':>10} {'peak RSS (MB)':>14}")
+            for mode, label in MODES.items():
+                result = measure(mode, csv_path, store_path, batch_size, epochs)
+                print(f"{label:<26} {result['samples_per_second']:>10.0f} {result['peak_rss_mb']:>14.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Load generator for server.py: p50/p99 latency and requests/second at increasing concurrency
+# Run from the repository root with: python -m benchmarks.http_load [--url http://localhost:5000]
+# Without --url a local server is started, once with and once without micro-batching.
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+import config
+from benchmarks.common import load_ratings
+from benchmarks.recommendation_cache import zipf_replay
+
+async def worker(host, port, paths, latencies):
+    # One keep-alive connection sending its share of the requests sequentially
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for path in paths:
+            start = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            await writer.drain()
+            status = (await reader.readline()).split()[1]
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            await reader.readexactly(length)
+            if status != b'200':
+                raise RuntimeError(f"{path} returned {status.decode()}")
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+async def run_level(host, port, paths, concurrency):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, paths[i::concurrency], latencies) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1e3
+    return len(latencies) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+def request_paths(n_requests, similar_share=0.2, seed=0):
+    # Zipf-distributed users for /recommend, a share of /similar on rated movies
+    user_ratings = load_ratings()
+    rng = np.random.default_rng(seed)
+    users = zipf_replay(user_ratings, n_requests, seed=seed)
+    movies = rng.choice(user_ratings['movieId'].unique(), n_requests)
+    similar = rng.random(n_requests) < similar_share
+    return [f"/similar/{m}" if s else f"/recommend/{u}" for u, m, s in zip(users, movies, similar)]
+
+def run(url, n_requests, levels):
+    parts = urlsplit(url)
+    paths = request_paths(n_requests)
+    print(f"{'concurrency':>11} {'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for concurrency in levels:
+        throughput, p50, p99 = asyncio.run(run_level(parts.hostname, parts.port, paths, concurrency))
+        print(f"{concurrency:>11} {throughput:>8.0f} {p50:>9.2f} {p99:>9.2f}")
+
+def start_server(port, max_batch):
+    process = subprocess.Popen([sys.executable, 'server.py', '--port', str(port), '--max-batch', str(max_batch),
+                                '--log-level', 'WARNING'], cwd=config.BASE_DIR)
+    # Wait until the models are loaded and the port accepts connections
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.5)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the recommendation service")
+    parser.add_argument('--url', help="running server to test (default: start local servers)")
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    if args.url:
+        run(args.url, args.requests, args.levels)
+        return
+    port = config.WEB_SERVER_PORT + 1
+    for max_batch, label in ((1, "micro-batching off"), (64, "micro-batching on (max 64)")):
+        print(f"\n{label}")
+        process = start_server(port, max_batch)
+        try:
+            run(f"http://127.0.0.1:{port}", args.requests, args.levels)
+        finally:
+            process.terminate()
+            process.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# Benchmark: hybrid recommendation latency, concurrent sources vs the sum of the sources
+# Run from the repository root with: python -m benchmarks.hybrid
+import time
+
+import numpy as np
+
+from benchmarks.common import load_ratings, time_call
+from models.collaborative_filtering import CollaborativeFilteringModel
+from models.content_based import ContentBasedModel
+from models.hybrid import CollaborativeSource, ContentSource, HybridRecommender
+
+def main(n_users=200, top_n=10):
+    user_ratings = load_ratings()
+    cf_model = CollaborativeFilteringModel().build(user_ratings)
+    sources = [CollaborativeSource(cf_model), ContentSource(ContentBasedModel().build(), user_ratings)]
+    hybrid = HybridRecommender(sources, rated_index=cf_model.rated_index)
+    user_ids = np.unique(user_ratings['userId'])[:n_users].tolist()
+
+    # Per-source cost of one request: candidate generation plus re-scoring a union of the same size
+    print(f"{'stage':<45} {'ms/user':>8}")
+    source_total = 0.0
+    for source in sources:
+        candidates_time, _ = time_call(lambda: [source.candidates(u, hybrid.candidates) for u in user_ids], repeat=1)
+        union = source.candidates(user_ids[0], hybrid.candidates)[0]
+        score_time, _ = time_call(lambda: [source.score(u, union) for u in user_ids], repeat=1)
+        per_user = (candidates_time + score_time) / len(user_ids) * 1e3
+        source_total += per_user
+        print(f"{source.name + ' (candidates + score)':<45} {per_user:>8.3f}")
+    print(f"{'sum of sources':<45} {source_total:>8.3f}")
+
+    start = time.perf_counter()
+    for user_id in user_ids:
+        hybrid.recommend(user_id, top_n)
+    print(f"{'hybrid.recommend (concurrent sources)':<45} {(time.perf_counter() - start) / len(user_ids) * 1e3:>8.3f}")
+
+if __name__ == "__main__":
+    main()
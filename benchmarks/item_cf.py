@@ -0,0 +1,40 @@
+# Benchmark: item-item CF similarity build and all-user full-catalog scoring at several dataset scales
+# Run from the repository root with: python -m benchmarks.item_cf
+#
+# The 1M and 10M sets are upscaled copies of the sample (new users over the same catalog), so the
+# similarity matrix stays the same while the products grow with the number of ratings.
+import os
+import time
+
+from benchmarks.common import load_ratings, scale_ratings
+from utils.collaborative_filtering import ItemItemCF, item_similarity
+from utils.item_similarity import create_X
+
+def main(scales=(None, 1_000_000, 10_000_000), top_n=10):
+    sample = load_ratings()
+    jobs = sorted({1, os.cpu_count() or 1})
+    print(f"{'ratings':>10} {'users':>7} {'n_jobs':>6} {'create_X s':>10} {'similarity s':>12} "
+          f"{'score all s':>11} {'users/s':>10} {'M pairs/s':>10}")
+    for n_ratings in scales:
+        ratings = scale_ratings(sample, n_ratings)
+        start = time.perf_counter()
+        X, user_encoder, movie_encoder, _, _ = create_X(ratings)
+        create_time = time.perf_counter() - start
+        del ratings
+        for n_jobs in jobs:
+            model = ItemItemCF(n_jobs=n_jobs)
+            start = time.perf_counter()
+            model.similarity = item_similarity(X, model.k, model.metric, n_jobs=n_jobs)
+            similarity_time = time.perf_counter() - start
+            model.ratings = X.T.tocsr().astype('float32')
+            model.user_encoder, model.movie_encoder = user_encoder, movie_encoder
+
+            start = time.perf_counter()
+            model.recommend_all(top_n)
+            score_time = time.perf_counter() - start
+            n_users, n_movies = X.shape[1], X.shape[0]
+            print(f"{X.nnz:>10} {n_users:>7} {n_jobs:>6} {create_time:>10.2f} {similarity_time:>12.2f} "
+                  f"{score_time:>11.2f} {n_users / score_time:>10.0f} {n_users * n_movies / score_time / 1e6:>10.1f}")
+
+if __name__ == "__main__":
+    main()
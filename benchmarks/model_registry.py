@@ -0,0 +1,114 @@
+# Benchmark: loading a registry version (memory-mapped arrays) vs unpickling the surprise model, and hot swaps
+# Run from the repository root with: python -m benchmarks.model_registry
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.common import load_ratings, scale_ratings, time_call
+from models.collaborative_filtering import CollaborativeFilteringModel, SVDScorer, train_collaborative_filtering_model
+from utils.model_registry import ModelRegistry, ServingHandle
+from utils.rated_items import RatedItemsIndex
+
+def _size_mb(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 2**20
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names) / 2**20
+
+def _cf_model(ratings):
+    # The factors do not need to be trained well for load timings
+    algo = train_collaborative_filtering_model(ratings, test_size=None, n_epochs=1)
+    cf_model = CollaborativeFilteringModel()
+    cf_model.scorer = SVDScorer.from_model(algo)
+    cf_model.rated_index = RatedItemsIndex.from_ratings(ratings)
+    return algo, cf_model
+
+def load_times(ratings, directory):
+    algo, cf_model = _cf_model(ratings)
+
+    pickle_path = os.path.join(directory, f'svd-{len(ratings)}.pkl')
+    with open(pickle_path, 'wb') as f:
+        pickle.dump(algo, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def unpickle():
+        with open(pickle_path, 'rb') as f:
+            return pickle.load(f)
+    unpickle_time, _ = time_call(unpickle, repeat=3)
+
+    registry = ModelRegistry(os.path.join(directory, 'registry'))
+    name = f'cf-{len(ratings)}'
+    version = registry.publish(name, cf_model)
+    load_time, _ = time_call(lambda: registry.load(name), repeat=3)
+    user_id = int(ratings['userId'].iloc[0])
+    first_time, _ = time_call(lambda: registry.load(name)[1].recommend(user_id), repeat=3)
+    return {'n_ratings': len(ratings), 'pickle_mb': _size_mb(pickle_path), 'unpickle_ms': unpickle_time * 1e3,
+            'registry_mb': _size_mb(registry._path(name, version)), 'load_ms': load_time * 1e3,
+            'load_and_recommend_ms': first_time * 1e3}
+
+def swap_under_load(ratings, directory, n_swaps=5, n_threads=4):
+    """
+    Latency of recommend() calls on worker threads while the main thread publishes and swaps versions.
+    """
+    _, cf_model = _cf_model(ratings)
+    registry = ModelRegistry(os.path.join(directory, 'swap'))
+    registry.publish('cf', cf_model)
+    handle = ServingHandle(registry, 'cf')
+    user_ids = np.unique(ratings['userId'])[:200].tolist()
+
+    def run(stop, latencies, errors):
+        i = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                handle.recommend(user_ids[i % len(user_ids)])
+            except Exception as error:
+                errors.append(error)
+            latencies.append((start, time.perf_counter() - start))
+            i += 1
+
+    stop, latencies, errors = threading.Event(), [], []
+    threads = [threading.Thread(target=run, args=(stop, latencies, errors)) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+    swap_windows = []
+    for _ in range(n_swaps):
+        registry.publish('cf', cf_model)
+        start = time.perf_counter()
+        handle.swap()
+        swap_windows.append((start, time.perf_counter()))
+        time.sleep(0.2)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    during = np.array([seconds for start, seconds in latencies
+                       if any(begin <= start <= end for begin, end in swap_windows)])
+    steady = np.array([seconds for start, seconds in latencies
+                       if not any(begin <= start <= end for begin, end in swap_windows)])
+    swap_ms = np.mean([end - begin for begin, end in swap_windows]) * 1e3
+    return {'version': handle.version, 'calls': len(latencies), 'errors': len(errors), 'swap_ms': swap_ms,
+            'steady_p50_ms': np.percentile(steady, 50) * 1e3, 'steady_p99_ms': np.percentile(steady, 99) * 1e3,
+            'during_swap_max_ms': during.max() * 1e3 if len(during) else 0.0}
+
+def main(scales=(None, 1_000_000)):
+    sample = load_ratings()
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'ratings':>9} {'pickle MB':>10} {'unpickle ms':>12} {'registry MB':>12} {'load ms':>8} "
+              f"{'load+recommend ms':>18}")
+        for n_ratings in scales:
+            result = load_times(scale_ratings(sample, n_ratings), directory)
+            print(f"{result['n_ratings']:>9} {result['pickle_mb']:>10.1f} {result['unpickle_ms']:>12.1f} "
+                  f"{result['registry_mb']:>12.1f} {result['load_ms']:>8.1f} {result['load_and_recommend_ms']:>18.1f}")
+
+        result = swap_under_load(sample, directory)
+        print(f"hot swap: {result['swap_ms']:.1f} ms per swap, now at version {result['version']}; "
+              f"{result['calls']} calls, {result['errors']} errors; recommend p50 {result['steady_p50_ms']:.2f} ms, "
+              f"p99 {result['steady_p99_ms']:.2f} ms, slowest call started during a swap "
+              f"{result['during_swap_max_ms']:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Benchmark: per-user pairwise NeuMF scoring vs tiled batch inference with precomputed embeddings
+# Run from the repository root with: python -m benchmarks.neumf_inference
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import load_ratings, time_call, upscale_ratings
+from models.deep_learning import NeuMFScorer
+from utils.id_encoder import IdEncoder
+from utils.rated_items import RatedItemsIndex
+from utils.topn_table import TopNTable, build_top_n_table
+
+def random_weights(n_users, n_movies, embedding_size=32, seed=0):
+    # Random NeuMF weights with the shapes of build_neumf_model()
+    rng = np.random.default_rng(seed)
+    embedding = lambda n: rng.normal(0, 0.1, (n, embedding_size)).astype(np.float32)
+    kernel = rng.normal(0, 0.5, (3 * embedding_size, 1)).astype(np.float32)
+    return (embedding(n_users), embedding(n_movies), embedding(n_users), embedding(n_movies), kernel,
+            np.array([3.5], dtype=np.float32))
+
+def pairwise_top_n(weights, user_code, rated, top_n):
+    # What the old recommend() did per user: evaluate the graph for
+    # (user, movie) pairs built with np.full, then argsort every score
+    user_mlp, movie_mlp, user_mf, movie_mf, kernel, bias = weights
+    n_movies = len(movie_mlp)
+    users = np.full(n_movies, user_code)
+    concat = np.concatenate([user_mlp[users], movie_mlp, user_mf[users] * movie_mf], axis=1)
+    scores = np.maximum(concat @ kernel[:, 0] + bias[0], 0)
+    scores[rated] = -np.inf
+    return np.argsort(-scores, kind='stable')[:top_n]
+
+def main(factors=(1, 10), top_n=10, sample_users=100):
+    base = load_ratings()
+    for factor in factors:
+        ratings = base if factor == 1 else upscale_ratings(base, factor)
+        user_encoder = IdEncoder().fit(ratings['userId'].values)
+        movie_encoder = IdEncoder().fit(ratings['movieId'].values)
+        rated_index = RatedItemsIndex.from_ratings(ratings)
+        n_users, n_movies = len(user_encoder), len(movie_encoder)
+        weights = random_weights(n_users, n_movies)
+        scorer = NeuMFScorer(*weights)
+        print(f"\n{factor}x: {n_users} users x {n_movies} movies")
+
+        # Per-user pairwise path on a sample of users, extrapolated to pairs/s
+        sample = np.arange(min(sample_users, n_users))
+        masks = rated_index.mask(user_encoder.inverse_transform(sample).tolist(), movie_encoder.classes_)
+        start = time.perf_counter()
+        expected = [pairwise_top_n(weights, code, masks[i], top_n) for i, code in enumerate(sample)]
+        pairwise_rate = len(sample) * n_movies / (time.perf_counter() - start)
+        print(f"{'pairwise, per user':<28} {pairwise_rate / 1e6:>8.1f} M pairs/s")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for budget in (16, 64, 256):
+                seconds, table = time_call(build_top_n_table, tmp, scorer.score, user_encoder, movie_encoder,
+                                           top_n, rated_index, budget, repeat=1)
+                print(f"{f'tiled, {budget} MB budget':<28} {n_users * n_movies / seconds / 1e6:>8.1f} M pairs/s "
+                      f"({seconds:.2f}s for all users)")
+
+            table = TopNTable.load(tmp)
+            assert all(np.array_equal(table.items[code], expected[code]) for code in sample)
+            ids = user_encoder.classes_[np.random.default_rng(0).integers(0, n_users, 10000)]
+            lookup_time, _ = time_call(lambda: [table.lookup(user_id) for user_id in ids])
+            print(f"table lookup: {lookup_time / len(ids) * 1e6:.1f} us per user")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Benchmark: TensorFlow-free NumPy NeuMF inference vs Keras predict (startup, RSS, parity, pairs/s)
+# Run from the repository root with: python -m benchmarks.numpy_inference
+#
+# Startup and RSS are measured in fresh interpreters. The Keras rows need TensorFlow and are
+# reported as skipped without it; the NumPy rows are then checked against a float64 reference
+# of the same forward pass.
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import load_ratings, time_call
+from benchmarks.neumf_inference import random_weights
+from models.numpy_inference import NEUMF_ARRAYS, check_parity, load_inference, save_arrays, to_keras
+
+NUMPY_STARTUP = """
+import resource, time
+start = time.perf_counter()
+from models.numpy_inference import load_inference
+model = load_inference({path!r})
+model.predict([0], [0]); model.score([0])
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+"""
+
+KERAS_STARTUP = """
+import resource, time
+start = time.perf_counter()
+from models.numpy_inference import load_inference, to_keras
+model = to_keras(load_inference({path!r}))
+model.predict([[0], [0]], verbose=0)
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+"""
+
+def startup(script):
+    # (seconds to first prediction, peak RSS in MB) of a fresh interpreter, or the error
+    completed = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True)
+    if completed.returncode:
+        return completed.stderr.strip().splitlines()[-1]
+    seconds, rss = completed.stdout.split()[-2:]
+    return float(seconds), float(rss)
+
+def main(n_pairs=1_000_000, n_users=1000):
+    ratings = load_ratings()
+    n_all_users, n_movies = ratings['userId'].nunique(), ratings['movieId'].nunique()
+    with tempfile.TemporaryDirectory() as path:
+        save_arrays(dict(zip(NEUMF_ARRAYS, random_weights(n_all_users, n_movies))), path, 'neumf')
+        model = load_inference(path)
+
+        for label, script in (('numpy', NUMPY_STARTUP), ('keras', KERAS_STARTUP)):
+            result = startup(script.format(path=path))
+            if isinstance(result, str):
+                print(f"{label:<6} startup: skipped ({result})")
+            else:
+                print(f"{label:<6} startup: {result[0]:.3f}s to first prediction, peak RSS {result[1]:.0f} MB")
+
+        # Parity: float32 NumPy paths against a float64 evaluation of the concatenated graph
+        rng = np.random.default_rng(0)
+        users, movies = rng.integers(0, n_all_users, n_pairs), rng.integers(0, n_movies, n_pairs)
+        arrays = [np.asarray(array, dtype=np.float64) for array in random_weights(n_all_users, n_movies)]
+        user_mlp, movie_mlp, user_mf, movie_mf, kernel, bias = arrays
+        reference = np.maximum(np.concatenate([user_mlp[users], movie_mlp[movies], user_mf[users] * movie_mf[movies]],
+                                              axis=1) @ kernel[:, 0] + bias[0], 0)
+        pairs = model.predict(users, movies)
+        codes = np.arange(min(n_users, n_all_users))
+        full = model.score(codes)
+        scored = users < len(codes)
+        print(f"parity vs float64 graph: predict max |diff| {np.max(np.abs(pairs - reference)):.2e}, score max |diff| "
+              f"{np.max(np.abs(full[users[scored], movies[scored]] - reference[scored])):.2e}")
+
+        predict_time, _ = time_call(model.predict, users, movies, repeat=3)
+        score_time, _ = time_call(model.score, codes, repeat=3)
+        print(f"numpy predict (pairs):       {n_pairs / predict_time / 1e6:>8.2f} M pairs/s")
+        print(f"numpy score (full catalog):  {len(codes) * n_movies / score_time / 1e6:>8.2f} M pairs/s")
+
+        try:
+            keras = to_keras(model)
+        except ImportError:
+            print("keras predict: skipped (TensorFlow is not installed)")
+            return
+        print(f"parity vs Keras: max |diff| {check_parity(keras, model):.2e}")
+        start = time.perf_counter()
+        keras.predict([users, movies], batch_size=8192, verbose=0)
+        print(f"keras predict (pairs):       {n_pairs / (time.perf_counter() - start) / 1e6:>8.2f} M pairs/s")
+        start = time.perf_counter()
+        keras.predict([users[:1], movies[:1]], verbose=0)
+        print(f"keras predict (1 pair):      {(time.perf_counter() - start) * 1e3:>8.2f} ms, "
+              f"numpy {time_call(model.predict, users[:1], movies[:1])[0] * 1e3:.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# Benchmark: online SVD updates vs frozen factors vs full retraining on a timestamp-ordered replay
+# Run from the repository root with: python -m benchmarks.online_svd
+import time
+
+import numpy as np
+
+from benchmarks.common import load_ratings
+from models.collaborative_filtering import SVDScorer, train_collaborative_filtering_model
+from models.online_svd import OnlineSVD
+
+def rmse(scorer, chunk):
+    errors = scorer.predict(chunk['userId'].tolist(), chunk['movieId'].values) - chunk['rating'].values
+    return float(np.sqrt(np.mean(errors ** 2)))
+
+def main(initial_share=0.5, n_chunks=5, seed=0):
+    # Train on the oldest ratings, then replay the rest in timestamp order. Every
+    # chunk is first scored (prequential RMSE), then fed to the models.
+    ratings = load_ratings().sort_values('timestamp', kind='stable').reset_index(drop=True)
+    split = int(len(ratings) * initial_share)
+    base, replay = ratings.iloc[:split], ratings.iloc[split:]
+    chunks = np.array_split(np.arange(len(replay)), n_chunks)
+    svd_params = {'random_state': seed}
+
+    frozen = SVDScorer.from_model(train_collaborative_filtering_model(base, test_size=None, **svd_params))
+    online = OnlineSVD.build(base, svd_params=svd_params)
+    retrained = frozen
+
+    print(f"initial fit on {len(base)} ratings, replaying {len(replay)} in {n_chunks} chunks")
+    print(f"{'chunk':>5} {'frozen':>8} {'online':>8} {'retrain':>8} {'retrain (s)':>12}")
+    latencies = []
+    for n, rows in enumerate(chunks, start=1):
+        chunk = replay.iloc[rows]
+        print(f"{n:>5} {rmse(frozen, chunk):>8.4f} {rmse(online.scorer, chunk):>8.4f} {rmse(retrained, chunk):>8.4f}",
+              end='')
+        for user_id, movie_id, rating in zip(chunk['userId'].tolist(), chunk['movieId'].tolist(),
+                                             chunk['rating'].tolist()):
+            start = time.perf_counter()
+            online.add_rating(user_id, movie_id, rating)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        seen = ratings.iloc[:split + rows[-1] + 1]
+        retrained = SVDScorer.from_model(train_collaborative_filtering_model(seen, test_size=None, **svd_params))
+        print(f" {time.perf_counter() - start:>12.2f}")
+
+    latencies = np.array(latencies) * 1e6
+    print(f"online update latency: p50 {np.percentile(latencies, 50):.0f} us, p99 {np.percentile(latencies, 99):.0f} us, "
+          f"{len(latencies) / latencies.sum() * 1e6:.0f} ratings/s")
+    print(f"folded-in users {len(online._user_history)}, movies {len(online._movie_history)}")
+
+if __name__ == "__main__":
+    main()
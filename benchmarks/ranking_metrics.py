@@ -0,0 +1,37 @@
+# Benchmark: per-user set loops vs vectorized ranking_metrics()
+# Run from the repository root with: python -m benchmarks.ranking_metrics
+import numpy as np
+
+from benchmarks.common import time_call
+from utils.evaluation_metrics import (calculate_precision_at_k, calculate_recall_at_k, ranking_metrics,
+                                      truth_matrix)
+
+def synthetic_evaluation(n_users, n_items=10000, k=100, relevant_per_user=20, seed=42):
+    # Random top-K lists and ground truth biased towards the head of the catalog
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_items + 1)
+    popularity /= popularity.sum()
+    top_k = np.stack([rng.choice(n_items, size=k, replace=False, p=popularity) for _ in range(n_users)])
+    users = np.repeat(np.arange(n_users), relevant_per_user)
+    items = rng.choice(n_items, size=len(users), p=popularity)
+    return top_k, truth_matrix(users, items, n_users, n_items)
+
+def loop_metrics(top_k, truth, ks):
+    # The existing per-user implementation, fed with lists of dicts
+    predictions = [{'actual': truth.indices[truth.indptr[u]:truth.indptr[u + 1]].tolist(),
+                    'predicted': top_k[u].tolist()} for u in range(top_k.shape[0])]
+    return {k: (calculate_precision_at_k(predictions, k), calculate_recall_at_k(predictions, k)) for k in ks}
+
+def main(n_users=(1000, 10000, 50000), ks=(5, 10, 20, 50, 100)):
+    print(f"{'users':>7} {'loops (s)':>10} {'vectorized (s)':>15} {'speed-up':>9}")
+    for n in n_users:
+        top_k, truth = synthetic_evaluation(n)
+        loop_time, expected = time_call(loop_metrics, top_k, truth, ks, repeat=1)
+        vector_time, result = time_call(ranking_metrics, top_k, truth, ks)
+        for k, (precision, recall) in expected.items():
+            assert np.isclose(result[f'precision@{k}'], precision) and np.isclose(result[f'recall@{k}'], recall)
+        print(f"{n:>7} {loop_time:>10.3f} {vector_time:>15.3f} {loop_time / vector_time:>8.1f}x")
+    print({name: round(value, 4) for name, value in result.items() if name.endswith('@10')})
+
+if __name__ == "__main__":
+    main()
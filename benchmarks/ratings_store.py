@@ -0,0 +1,68 @@
+# Benchmark: pd.read_csv vs the memory-mapped binary ratings store
+# Run from the repository root with: python -m benchmarks.ratings_store
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import config
+from benchmarks.common import load_ratings, upscale_ratings
+from utils.ratings_store import ingest
+
+# Each loader runs in a fresh interpreter so RSS reflects only that loader
+SCRIPT = '''
+import json, time
+import numpy as np, pandas as pd, psutil
+from utils.ratings_store import RatingsStore
+process = psutil.Process()
+rss_before = process.memory_info().rss
+start = time.perf_counter()
+if {mode!r} == 'csv':
+    ratings = pd.read_csv({csv!r})
+    total = float(ratings['rating'].sum())
+elif {mode!r} == 'store':
+    store = RatingsStore({store!r})
+    total = float(store.rating.sum(dtype=np.float64))
+else:
+    ratings = RatingsStore({store!r}).to_frame()
+    total = float(ratings['rating'].sum())
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'rss_mb': (process.memory_info().rss - rss_before) / 2**20}}))
+'''
+
+MODES = {
+    'csv': 'pd.read_csv',
+    'store': 'memmap columns',
+    'frame': 'memmap + to_frame()',
+}
+
+def measure(mode, csv_path, store_path):
+    code = SCRIPT.format(mode=mode, csv=csv_path, store=store_path)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=config.BASE_DIR, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(factors=(1, 10)):
+    user_ratings = load_ratings()
+    with tempfile.TemporaryDirectory() as tmp:
+        for factor in factors:
+            csv_path = config.USER_RATINGS_PATH
+            if factor > 1:
+                csv_path = os.path.join(tmp, f'ratings_x{factor}.csv')
+                upscale_ratings(user_ratings, factor).to_csv(csv_path, index=False)
+            store_path = os.path.join(tmp, f'store_x{factor}')
+
+            start = time.perf_counter()
+            ingest(store_path, ratings_path=csv_path, chunksize=250_000)
+            ingest_time = time.perf_counter() - start
+            size_mb = os.path.getsize(csv_path) / 2**20
+            print(f"\n{factor}x ratings ({size_mb:.1f} MB CSV), one-time ingest {ingest_time:.2f}s")
+            print(f"{'loader':<22} {'load (ms)':>10} {'RSS (MB)':>9}")
+            for mode, label in MODES.items():
+                result = measure(mode, csv_path, store_path)
+                print(f"{label:<22} {result['seconds'] * 1e3:>10.1f} {result['rss_mb']:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Benchmark: Zipf-distributed replay of user requests with and without RecommendationCache
+# Run from the repository root with: python -m benchmarks.recommendation_cache
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import load_ratings
+from models.collaborative_filtering import CollaborativeFilteringModel
+from utils.recommendation_cache import CachedRecommender, RecommendationCache
+
+def zipf_replay(user_ratings, n_requests, exponent=1.1, seed=0):
+    # User ids ranked by activity; request rank r with probability ~ 1 / r^exponent
+    ranked = user_ratings['userId'].value_counts().index.to_numpy()
+    weights = 1.0 / np.arange(1, len(ranked) + 1) ** exponent
+    rng = np.random.default_rng(seed)
+    return ranked[rng.choice(len(ranked), size=n_requests, p=weights / weights.sum())]
+
+def replay(recommender, requests, ratings_every=0, movie_ids=None):
+    # Serve every request; optionally a rating arrives every `ratings_every` requests
+    start = time.perf_counter()
+    for i, user_id in enumerate(requests.tolist()):
+        recommender.recommend(user_id, 10)
+        if ratings_every and i % ratings_every == 0:
+            recommender.add_rating(user_id, int(movie_ids[i % len(movie_ids)]))
+    return time.perf_counter() - start
+
+def main(n_requests=20000):
+    user_ratings = load_ratings()
+    model = CollaborativeFilteringModel().build(user_ratings)
+    requests = zipf_replay(user_ratings, n_requests)
+    movie_ids = user_ratings['movieId'].unique()
+    print(f"{n_requests} requests over {len(np.unique(requests))} distinct users (Zipf s=1.1)")
+
+    uncached = replay(model, requests)
+    print(f"{'no cache':<34} {n_requests / uncached:>9.0f} req/s")
+
+    header = f"{'':<34} {'req/s':>9} {'hit rate':>9} {'evictions':>10} {'invalidated':>12}"
+    print(header)
+    for max_entries, ratings_every in ((50, 0), (200, 0), (1000, 0), (200, 100), (1000, 100)):
+        cache = RecommendationCache(max_entries=max_entries)
+        cached = CachedRecommender(CollaborativeFilteringModel().build(user_ratings) if ratings_every else model,
+                                   cache, name='svd')
+        seconds = replay(cached, requests, ratings_every, movie_ids)
+        stats = cache.stats()
+        label = f"LRU {max_entries}" + (f", rating every {ratings_every}" if ratings_every else "")
+        print(f"{label:<34} {n_requests / seconds:>9.0f} {stats['hit_rate']:>9.1%} "
+              f"{stats['evictions']:>10} {stats['invalidations']:>12}")
+
+    # Disk level: a second process-local cache warms up from the SQLite file
+    with tempfile.TemporaryDirectory() as tmp:
+        disk_path = os.path.join(tmp, 'cache.sqlite')
+        replay(CachedRecommender(model, RecommendationCache(max_entries=50, disk_path=disk_path), name='svd'), requests)
+        cache = RecommendationCache(max_entries=50, disk_path=disk_path)
+        seconds = replay(CachedRecommender(model, cache, name='svd'), requests)
+        stats = cache.stats()
+        print(f"{'LRU 50 + disk, after restart':<34} {n_requests / seconds:>9.0f} {stats['hit_rate']:>9.1%} "
+              f"{stats['evictions']:>10} {stats['invalidations']:>12}  (disk hits {stats['disk_hits']})")
+
+if __name__ == "__main__":
+    main()
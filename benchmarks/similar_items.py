@@ -0,0 +1,52 @@
+# Benchmark: recall@10 and queries/second of the similar-items index backends
+# Run from the repository root with: python -m benchmarks.similar_items
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import load_ratings, time_call
+from utils.item_similarity import create_X, find_similar_movies
+from utils.similar_items import SimilarItemsIndex
+
+def recall_at_k(approx, exact):
+    # Fraction of the exact neighbours found by the approximate search
+    hits = sum(len(set(a[a >= 0]) & set(e[e >= 0])) for a, e in zip(approx, exact))
+    return hits / max(1, int((exact >= 0).sum()))
+
+def main(k=10, n_queries=2000):
+    user_ratings = load_ratings()
+    X, user_mapper, movie_mapper, user_inv_mapper, movie_inv_mapper = create_X(user_ratings)
+    queries = np.random.default_rng(0).choice(X.shape[0], min(n_queries, X.shape[0]), replace=False)
+
+    # Baseline: the original per-query NearestNeighbors refit
+    sample = [movie_inv_mapper[i] for i in queries[:20]]
+    start = time.perf_counter()
+    for movie_id in sample:
+        find_similar_movies(movie_id, X, k, movie_mapper, movie_inv_mapper)
+    refit_qps = len(sample) / (time.perf_counter() - start)
+    print(f"NearestNeighbors refit per query: {refit_qps:.1f} queries/s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exact = SimilarItemsIndex.build(X, backend='exact')
+        exact.save(f'{tmp}/exact')
+        exact = SimilarItemsIndex.load(f'{tmp}/exact')
+        exact_time, (reference, _) = time_call(exact.query, queries, k)
+        print(f"{'backend':<8} {'nprobe':>6} {'recall@10':>10} {'queries/s':>10}")
+        print(f"{'exact':<8} {'-':>6} {1.0:>10.3f} {len(queries) / exact_time:>10.0f}")
+
+        build_start = time.perf_counter()
+        ivf = SimilarItemsIndex.build(X, backend='ivf')
+        build_time = time.perf_counter() - build_start
+        ivf.save(f'{tmp}/ivf')
+        ivf = SimilarItemsIndex.load(f'{tmp}/ivf')
+        n_lists = len(ivf.list_indptr) - 1
+        for nprobe in (1, 2, 4, 8, 16, 32):
+            if nprobe > n_lists:
+                break
+            ivf_time, (neighbours, _) = time_call(ivf.query, queries, k, nprobe)
+            print(f"{'ivf':<8} {nprobe:>6} {recall_at_k(neighbours, reference):>10.3f} {len(queries) / ivf_time:>10.0f}")
+        print(f"ivf build: {build_time:.2f}s for {n_lists} lists")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# Benchmark suite: every recommender hot path at several dataset scales, compared against a baseline
+# Run from the repository root with: python -m benchmarks.suite [--scales sample 1m 10m] [--save-baseline]
+#
+# Each (case, scale) records the best wall time, throughput, peak traced memory and the memory blocks
+# one call leaves allocated (retained_blocks). tracemalloc only sees live blocks, so the number of
+# allocations a call makes is not measured. Results are written as JSON; with a baseline present, any
+# case slower (or using more memory) than the baseline by more than --threshold is reported and the
+# exit status is 1.
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+import config
+from benchmarks.common import load_ratings, scale_ratings, time_call, trace_allocations
+
+SCALES = {'sample': None, '1m': 1_000_000, '10m': 10_000_000}
+
+def _top_movies(ratings, n):
+    return ratings['movieId'].value_counts().index[:n].tolist()
+
+def _top_users(ratings, n):
+    return ratings['userId'].value_counts().index[:n].tolist()
+
+def create_x_case(ratings):
+    from utils.item_similarity import create_X
+
+    return lambda: create_X(ratings), len(ratings), 'ratings'
+
+def find_similar_movies_case(ratings, n_queries=20):
+    from utils.item_similarity import create_X, find_similar_movies
+
+    X, user_mapper, movie_mapper, user_inv_mapper, movie_inv_mapper = create_X(ratings)
+    movie_ids = _top_movies(ratings, n_queries)
+
+    def run():
+        return [find_similar_movies(movie_id, X, 10, movie_mapper, movie_inv_mapper) for movie_id in movie_ids]
+    return run, len(movie_ids), 'queries'
+
+def svd_train_case(ratings):
+    from models.collaborative_filtering import train_collaborative_filtering_model
+
+    return lambda: train_collaborative_filtering_model(ratings, test_size=None), len(ratings), 'ratings'
+
+def cf_recommend_case(ratings, n_users=200):
+    from models.collaborative_filtering import (SVDScorer, get_collaborative_filtering_recommendations,
+                                                train_collaborative_filtering_model)
+    from utils.rated_items import RatedItemsIndex
+
+    # Recommendation cost does not depend on how well the factors are trained
+    scorer = SVDScorer.from_model(train_collaborative_filtering_model(ratings, test_size=None, n_epochs=1))
+    rated_index = RatedItemsIndex.from_ratings(ratings)
+    user_ids = _top_users(ratings, n_users)
+
+    def run():
+        return [get_collaborative_filtering_recommendations(scorer, user_id, rated_index=rated_index)
+                for user_id in user_ids]
+    return run, len(user_ids), 'users'
+
+def item_cf_build_case(ratings):
+    from utils.collaborative_filtering import ItemItemCF
+
+    return lambda: ItemItemCF().build(ratings), len(ratings), 'ratings'
+
+def item_cf_recommend_case(ratings):
+    from utils.collaborative_filtering import ItemItemCF
+
+    # Full-catalog scoring and top-N of every user
+    model = ItemItemCF().build(ratings)
+    return model.recommend_all, model.ratings.shape[0], 'users'
+
+def content_build_case(ratings):
+    from models.content_based import ContentBasedModel
+    from utils.data_preprocessing import load_movie_data
+
+    movie_data = load_movie_data()
+    return lambda: ContentBasedModel().build(movie_data), len(movie_data), 'movies'
+
+def content_recommend_case(ratings, n_queries=200):
+    from models.content_based import ContentBasedModel, content_based_recommendations
+
+    model = ContentBasedModel().build()
+    titles = model.movie_data['title'].iloc[:n_queries].tolist()
+
+    def run():
+        return [content_based_recommendations(title, model.similarity_store, model.movie_data,
+                                              title_index=model.title_index) for title in titles]
+    return run, len(titles), 'queries'
+
+def neumf_fit_case(ratings):
+    from models.deep_learning import DeepLearningModel
+
+    # One epoch over the in-memory ratings (needs TensorFlow)
+    return lambda: DeepLearningModel(epochs=1, batch_size=1024).build(ratings), len(ratings), 'ratings'
+
+def neumf_score_case(ratings, n_users=1000, embedding_size=32):
+    from models.deep_learning import NeuMFScorer
+
+    # NumPy inference path of the Keras model, with random weights of the right shapes
+    rng = np.random.default_rng(0)
+    n_all_users, n_movies = ratings['userId'].nunique(), ratings['movieId'].nunique()
+    scorer = NeuMFScorer(rng.random((n_all_users, embedding_size)), rng.random((n_movies, embedding_size)),
+                         rng.random((n_all_users, embedding_size)), rng.random((n_movies, embedding_size)),
+                         rng.random(3 * embedding_size), rng.random(1))
+    user_codes = np.arange(min(n_users, n_all_users))
+    return lambda: scorer.score(user_codes), len(user_codes) * n_movies, 'pairs'
+
+# name: (setup(ratings) -> (run, n_items, unit), largest scale it runs at, timing repeats)
+# The surprise and content cases stop early: surprise's trainset does not fit 10M ratings in a few GB,
+# and the content model depends on the movie catalog, not on the number of ratings.
+CASES = {
+    'create_X': (create_x_case, '10m', 3),
+    'find_similar_movies': (find_similar_movies_case, '10m', 1),
+    'svd_train': (svd_train_case, '1m', 1),
+    'cf_recommend': (cf_recommend_case, '1m', 3),
+    'item_cf_build': (item_cf_build_case, '10m', 1),
+    'item_cf_recommend': (item_cf_recommend_case, '10m', 1),
+    'content_build': (content_build_case, 'sample', 3),
+    'content_recommend': (content_recommend_case, 'sample', 3),
+    'neumf_fit': (neumf_fit_case, '1m', 1),
+    'neumf_score': (neumf_score_case, '10m', 3),
+}
+
+def run_case(name, ratings):
+    setup, _, repeat = CASES[name]
+    run, n_items, unit = setup(ratings)
+    seconds, _ = time_call(run, repeat=repeat)
+    peak, retained_blocks, _ = trace_allocations(run)
+    return {'seconds': seconds, 'throughput': n_items / seconds, 'unit': f'{unit}/s',
+            'peak_mb': peak / 2**20, 'retained_blocks': retained_blocks}
+
+def run_suite(scales, cases):
+    """
+    Runs the selected cases at every selected scale they support.
+
+    Returns:
+        list of result dicts (case, scale, n_ratings and the measurements, or
+        'skipped' with the reason when a case cannot run here)
+    """
+    sample = load_ratings()
+    results = []
+    print("retained blocks: memory blocks one call leaves allocated (not the number of allocations it makes)")
+    for scale in scales:
+        ratings = scale_ratings(sample, SCALES[scale])
+        for name in cases:
+            if list(SCALES).index(scale) > list(SCALES).index(CASES[name][1]):
+                continue
+            result = {'case': name, 'scale': scale, 'n_ratings': len(ratings)}
+            try:
+                result.update(run_case(name, ratings))
+            except ImportError as error:
+                result['skipped'] = str(error)
+            results.append(result)
+            print(format_result(result), flush=True)
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Flags the results that regressed against a baseline run.
+
+    A case regresses when its wall time or its peak memory exceeds the
+    baseline value by more than `threshold` (0.2 = 20%).
+
+    Returns:
+        list of (case, scale, metric, baseline value, new value)
+    """
+    previous = {(r['case'], r['scale']): r for r in baseline['results'] if 'skipped' not in r}
+    regressions = []
+    for result in results:
+        reference = previous.get((result['case'], result['scale']))
+        if reference is None or 'skipped' in result:
+            continue
+        for metric in ('seconds', 'peak_mb'):
+            # Ignore noise on tiny values (sub-millisecond timings, sub-megabyte peaks)
+            floor = 1e-3 if metric == 'seconds' else 1.0
+            if result[metric] > max(reference[metric], floor) * (1 + threshold):
+                regressions.append((result['case'], result['scale'], metric, reference[metric], result[metric]))
+    return regressions
+
+def format_result(result):
+    label = f"{result['case']:<20} {result['scale']:>6}"
+    if 'skipped' in result:
+        return f"{label}  skipped: {result['skipped']}"
+    return (f"{label} {result['seconds']:>10.4f}s {result['throughput']:>12.0f} {result['unit']:<10} "
+            f"{result['peak_mb']:>9.1f} MB {result['retained_blocks']:>9} retained blocks")
+
+def format_change(before, after):
+    # Relative change, or the absolute one when the baseline value is 0
+    return f"{after / before - 1:+.0%}" if before else f"{after - before:+.4f}"
+
+def environment():
+    # Enough context to tell whether two result files are comparable
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommender hot paths")
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['sample', '1m'])
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--output', default=os.path.join(config.BENCHMARK_RESULTS_DIR, 'latest.json'))
+    parser.add_argument('--baseline', default=config.BENCHMARK_BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=config.BENCHMARK_REGRESSION_THRESHOLD,
+                        help="allowed slowdown / memory growth before a case counts as a regression")
+    parser.add_argument('--save-baseline', action='store_true', help="also write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.scales, args.cases)
+    report = {'environment': environment(), 'results': results}
+    paths = [args.output] + ([args.baseline] if args.save_baseline else [])
+    for path in paths:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"Results written to {', '.join(paths)}")
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    for case, scale, metric, before, after in regressions:
+        print(f"REGRESSION {case} @ {scale}: {metric} {before:.4f} -> {after:.4f} ({format_change(before, after)})")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} of the baseline")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
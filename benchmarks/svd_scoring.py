@@ -0,0 +1,39 @@
+# Benchmark: per-item SVD predictions vs the batch SVDScorer
+# Run from the repository root with: python -m benchmarks.svd_scoring
+import numpy as np
+
+from benchmarks.common import load_ratings, time_call
+from models.collaborative_filtering import SVDScorer, train_collaborative_filtering_model
+from utils.rated_items import RatedItemsIndex
+
+def recommend_per_item(model, user_ids, movie_ids, rated_index, top_n=10):
+    # Reference path: one model.predict call per unrated movie, then a full sort
+    results = []
+    for user_id in user_ids:
+        predictions = [
+            model.predict(user_id, movie_id) for movie_id in movie_ids
+            if not rated_index.has_rated(user_id, movie_id)
+        ]
+        predictions.sort(key=lambda x: x.est, reverse=True)
+        results.append([prediction.iid for prediction in predictions[:top_n]])
+    return results
+
+def main():
+    user_ratings = load_ratings()
+    model = train_collaborative_filtering_model(user_ratings)
+    scorer = SVDScorer.from_model(model)
+    rated_index = RatedItemsIndex.from_ratings(user_ratings)
+    all_users = np.unique(user_ratings['userId'])
+
+    print(f"{'users':>6} {'per-item (s)':>13} {'batch (s)':>10} {'speed-up':>9} {'same ranking':>13}")
+    for n_users in (1, 100, len(all_users)):
+        user_ids = all_users[:n_users].tolist()
+        per_item_time, expected = time_call(
+            recommend_per_item, model, user_ids, scorer.movie_ids.tolist(), rated_index, repeat=1
+        )
+        batch_time, (movie_ids, _) = time_call(scorer.recommend, user_ids, 10, rated_index)
+        same = all(list(row) == ref for row, ref in zip(movie_ids.tolist(), expected))
+        print(f"{n_users:>6} {per_item_time:>13.3f} {batch_time:>10.4f} {per_item_time / batch_time:>8.0f}x {str(same):>13}")
+
+if __name__ == "__main__":
+    main()
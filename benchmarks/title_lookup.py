@@ -0,0 +1,57 @@
+# Benchmark: title resolution, full-column scan vs the trigram TitleIndex (exact and misspelled queries)
+# Run from the repository root with: python -m benchmarks.title_lookup
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import time_call
+from utils.data_preprocessing import load_movie_data
+from utils.title_index import TitleIndex, split_year
+
+def misspell(title, rng):
+    # Drop the year and apply one random edit (delete, swap, replace or insert) to the name
+    name = list(split_year(title)[0].lower())
+    i = rng.randrange(len(name))
+    edit = rng.choice(('delete', 'swap', 'replace', 'insert'))
+    if edit == 'delete' and len(name) > 3:
+        del name[i]
+    elif edit == 'swap' and i + 1 < len(name):
+        name[i], name[i + 1] = name[i + 1], name[i]
+    elif edit == 'insert':
+        name.insert(i, rng.choice('abcdefghijklmnopqrstuvwxyz'))
+    else:
+        name[i] = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    return ''.join(name)
+
+def main(n_queries=1000):
+    movie_data = load_movie_data()
+    titles = movie_data['title'].tolist()
+    rng = random.Random(0)
+    sample = rng.sample(range(len(titles)), n_queries)
+
+    build_time, index = time_call(TitleIndex.build, movie_data['title'], repeat=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        index.save(tmp)
+        load_time, index = time_call(TitleIndex.load, tmp, repeat=1)
+    print(f"build {build_time:.3f}s, load {load_time * 1e3:.1f} ms for {len(titles)} titles")
+
+    print(f"{'lookup':<32} {'ms/query':>9} {'found':>7}")
+    start = time.perf_counter()
+    found = sum(movie_data.index[movie_data['title'] == titles[i]].tolist()[0] == i for i in sample)
+    print(f"{'column scan (exact title)':<32} {(time.perf_counter() - start) / n_queries * 1e3:>9.3f} "
+          f"{found / n_queries:>7.1%}")
+
+    for label, queries in (('TitleIndex (exact title)', [titles[i] for i in sample]),
+                           ('TitleIndex (one typo, no year)', [misspell(titles[i], rng) for i in sample])):
+        start = time.perf_counter()
+        positions = [index.lookup(query) for query in queries]
+        elapsed = time.perf_counter() - start
+        # A misspelled remake title may resolve to another movie with the same name
+        found = np.mean([p is not None and split_year(titles[p])[0] == split_year(titles[i])[0]
+                         for p, i in zip(positions, sample)])
+        print(f"{label:<32} {elapsed / n_queries * 1e3:>9.3f} {found:>7.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Benchmark: trending model history replay (events/s), incremental updates and top-N queries
+# Run from the repository root with: python -m benchmarks.trending
+import time
+
+import numpy as np
+
+from benchmarks.common import load_ratings, scale_ratings, time_call
+from models.trending import TrendingModel
+from utils.data_preprocessing import load_movie_data
+
+def main(scales=(None, 1_000_000, 10_000_000), n_updates=100_000, n_queries=1000):
+    sample = load_ratings()
+    movie_data = load_movie_data()
+
+    print(f"{'replay':<12} {'seconds':>8} {'events/s':>14}")
+    for n_ratings in scales:
+        ratings = scale_ratings(sample, n_ratings)
+        model = TrendingModel().build(ratings, movie_data)
+        stats = model.replay_stats
+        print(f"{len(ratings):<12} {stats['seconds']:>8.3f} {stats['events_per_second']:>14,.0f}")
+        del ratings
+
+    # Incremental path: the second half of the sample replayed one rating at a time in timestamp order
+    ordered = sample.sort_values('timestamp', kind='stable')
+    half = len(ordered) // 2
+    model = TrendingModel().build(ordered.iloc[:half], movie_data)
+    rest = list(zip(ordered['movieId'].values[half:].tolist(), ordered['rating'].values[half:].tolist(),
+                    ordered['timestamp'].values[half:].tolist()))
+    rest = (rest * (-(-n_updates // len(rest))))[:n_updates]
+    start = time.perf_counter()
+    for movie_id, rating, timestamp in rest:
+        model.add_rating(movie_id, rating, timestamp)
+    seconds = time.perf_counter() - start
+    print(f"add_rating: {len(rest) / seconds:,.0f} events/s")
+
+    # The incremental sums match a full replay of the same history
+    full = TrendingModel().build(ordered, movie_data)
+    check = TrendingModel().build(ordered.iloc[:half], movie_data)
+    for movie_id, rating, timestamp in rest[:len(ordered) - half]:
+        check.add_rating(movie_id, rating, timestamp)
+    scale = np.exp(check.decay * (check.reference - full.reference))
+    print(f"max relative difference vs full replay: "
+          f"{np.max(np.abs(check.counts * scale - full.counts) / np.maximum(full.counts, 1e-12)):.2e}")
+
+    genres = full.genres
+    for label, query in (('overall', lambda i: full.trending(10)),
+                         ('genre', lambda i: full.trending(10, genre=genres[i % len(genres)])),
+                         ('genre by rating', lambda i: full.trending(10, genre=genres[i % len(genres)], by='rating'))):
+        query_time, _ = time_call(lambda: [query(i) for i in range(n_queries)], repeat=3)
+        print(f"trending {label:<16} {query_time / n_queries * 1e6:>8.1f} us/query")
+
+if __name__ == "__main__":
+    main()
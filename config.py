@@ -1,14 +1,55 @@
 # Store configuration settings such as file paths, model hyperparameters, etc.
+import os
+
 # File paths
-MOVIE_DATA_PATH = 'C:\ProjectRecommendationSystems\MoviePlatform\data/movie_data.csv'
-USER_RATINGS_PATH = 'C:\ProjectRecommendationSystems\MoviePlatform\data/user_ratings.csv'
-USER_PROFILES_PATH = 'C:\ProjectRecommendationSystems\MoviePlatform\data/user_profiles.csv'
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+MOVIE_DATA_PATH = os.path.join(DATA_DIR, 'movie_data.csv')
+USER_RATINGS_PATH = os.path.join(DATA_DIR, 'user_ratings.csv')
+USER_PROFILES_PATH = os.path.join(DATA_DIR, 'user_profiles.csv')
+# Binary columnar copy of the CSVs written by utils/ratings_store.py
+RATINGS_STORE_PATH = os.path.join(DATA_DIR, 'ratings_store')
 
 # Model hyperparameters
 COLLABORATIVE_FILTERING_NUM_NEIGHBORS = 10
 COLLABORATIVE_FILTERING_SIMILARITY_METRIC = 'cosine'
 COLLABORATIVE_FILTERING_THRESHOLD = 4.0
 
+# Hyperparameter search (hyperparameter_tuning.py)
+TUNING_DIR = os.path.join(DATA_DIR, 'tuning')
+TUNING_NUM_FOLDS = 5
+TUNING_SVD_PARAM_GRID = {
+    'n_factors': [50, 100],
+    'n_epochs': [10, 20, 30],
+    'lr_all': [0.002, 0.005, 0.01],
+    'reg_all': [0.02, 0.05, 0.1],
+}
+TUNING_KNN_PARAM_GRID = {
+    'k': [COLLABORATIVE_FILTERING_NUM_NEIGHBORS, 20, 40, 80],
+    'sim_name': [COLLABORATIVE_FILTERING_SIMILARITY_METRIC, 'msd', 'pearson'],
+}
+
+# Offline evaluation (utils/evaluation.py)
+EVALUATION_SPLITS_DIR = os.path.join(DATA_DIR, 'splits')
+EVALUATION_K = [5, 10]
+
+# Benchmark suite (benchmarks/suite.py)
+BENCHMARK_RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks', 'results')
+BENCHMARK_BASELINE_PATH = os.path.join(BENCHMARK_RESULTS_DIR, 'baseline.json')
+BENCHMARK_REGRESSION_THRESHOLD = 0.2
+
+# Hybrid recommender (models/hybrid.py); tuned weights are saved to HYBRID_WEIGHTS_PATH
+HYBRID_CANDIDATES = 100
+HYBRID_WEIGHTS = {'collaborative_filtering': 0.5, 'content_based': 0.2, 'deep_learning': 0.3}
+HYBRID_WEIGHTS_PATH = os.path.join(DATA_DIR, 'hybrid_weights.json')
+
+# Trending (models/trending.py): a rating's weight halves every TRENDING_HALF_LIFE_DAYS
+TRENDING_HALF_LIFE_DAYS = 30
+
+# Model registry (utils/model_registry.py): versioned model directories and how often servers check LATEST
+MODEL_REGISTRY_DIR = os.path.join(DATA_DIR, 'registry')
+MODEL_REGISTRY_POLL_SECONDS = 5.0
+
 CONTENT_BASED_FEATURES = ['genres', 'actors', 'directors']
 CONTENT_BASED_VECTOR_SIZE = 100
 
@@ -18,3 +59,11 @@ WEB_SERVER_PORT = 5000
 
 # Other configuration settings
 DEBUG_MODE = True
+
+# Instrumentation (utils/instrumentation.py): 'off', 'basic' or 'verbose'
+# The verbose tier times inner steps of every call; it has its own switch so DEBUG_MODE does not pay for it
+INSTRUMENTATION_VERBOSE = False
+INSTRUMENTATION_LEVEL = 'verbose' if INSTRUMENTATION_VERBOSE else 'basic'
+INSTRUMENTATION_SLOW_SECONDS = None  # e.g. 0.5 profiles requests slower than 500 ms
+INSTRUMENTATION_PROFILE_DIR = os.path.join(DATA_DIR, 'profiles')
+INSTRUMENTATION_EXPORT_PATH = os.path.join(DATA_DIR, 'metrics.prom')
@@ -1,43 +1,234 @@
 # hyperparameter_tuning.py
-from sklearn import datasets
-from sklearn.model_selection import train_test_split
-from sklearn.svm import SVC
-from sklearn.model_selection import GridSearchCV
-
-# Load a sample dataset (e.g., the Iris dataset)
-data = datasets.load_iris()
-X = data.data
-y = data.target
-
-# Split the dataset into training and testing sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Define the hyperparameters and their possible values for tuning
-param_grid = {
-    'C': [0.1, 1, 10],
-    'kernel': ['linear', 'rbf', 'poly'],
-    'gamma': ['scale', 'auto', 0.1, 1]
+# Cross-validated hyperparameter search for the collaborative filtering models.
+# Run from the repository root with: python hyperparameter_tuning.py [--models svd knn]
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import config
+from utils.ratings_store import RatingsStore
+
+# Model name -> parameter grid searched for it
+PARAM_GRIDS = {
+    'svd': config.TUNING_SVD_PARAM_GRID,
+    'knn': config.TUNING_KNN_PARAM_GRID,
 }
 
-# Create an SVM classifier
-svm = SVC()
+def expand_grid(grid):
+    # Every combination of the grid values as a list of dicts
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def make_folds(store, n_folds, seed=42, cache_dir=config.TUNING_DIR):
+    """
+    Assigns every rating of the store to one of `n_folds` folds.
+
+    The assignment is saved as an int8 .npy file next to the trial cache, so
+    workers memory-map it (and the ratings store columns) instead of getting
+    pickled DataFrames, and resumed searches reuse the same splits.
+
+    Returns:
+        path of the fold assignment file
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'folds_{n_folds}_{seed}_{len(store)}.npy')
+    if not os.path.exists(path):
+        rng = np.random.default_rng(seed)
+        folds = (rng.permutation(len(store)) % n_folds).astype(np.int8)
+        # Write under a temporary name so an interrupted run never leaves a partial file
+        np.save(path + '.tmp.npy', folds)
+        os.replace(path + '.tmp.npy', path)
+    return path
+
+def _build_algorithm(model_name, params):
+    from surprise import SVD, KNNWithMeans
+
+    if model_name == 'svd':
+        return SVD(random_state=0, **params)
+    if model_name == 'knn':
+        return KNNWithMeans(k=params['k'], sim_options={'name': params['sim_name'], 'user_based': True},
+                            verbose=False)
+    raise ValueError(f"Unknown model {model_name!r}")
+
+def run_trial(store_path, folds_path, model_name, params, fold):
+    """
+    Trains one configuration on all folds but `fold` and scores it on `fold`.
+
+    Runs in a worker process: the ratings and the fold assignment are
+    memory-mapped from disk, only the trial description is pickled.
+
+    Returns:
+        dict with the test RMSE and the wall time of the trial
+    """
+    import pandas as pd
+    from surprise import Dataset, Reader, accuracy
+
+    start = time.perf_counter()
+    store = RatingsStore(store_path)
+    folds = np.load(folds_path, mmap_mode='r')
+    test = folds == fold
+
+    # Encoded ids serve as the raw ids of the surprise trainset
+    train_frame = pd.DataFrame({
+        'user': store.user_code[~test],
+        'item': store.movie_code[~test],
+        'rating': store.rating[~test],
+    })
+    reader = Reader(rating_scale=(float(store.rating.min()), float(store.rating.max())))
+    trainset = Dataset.load_from_df(train_frame, reader).build_full_trainset()
+    testset = list(zip(store.user_code[test].tolist(), store.movie_code[test].tolist(), store.rating[test].tolist()))
+
+    algorithm = _build_algorithm(model_name, params)
+    algorithm.fit(trainset)
+    rmse = accuracy.rmse(algorithm.test(testset), verbose=False)
+    return {'rmse': float(rmse), 'seconds': time.perf_counter() - start}
+
+class TrialCache:
+    """
+    Append-only JSON-lines file of completed trials.
+
+    Every finished trial is written immediately, so an interrupted search
+    picks up where it stopped. Trials are keyed by model, parameters, fold
+    and the data/split they ran on.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.results = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    # Skip a line cut short by an interrupted write
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.results[record['key']] = record
+
+    @staticmethod
+    def key(model_name, params, fold, split_id):
+        payload = json.dumps([model_name, params, fold, split_id], sort_keys=True)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def get(self, key):
+        return self.results.get(key)
+
+    def add(self, key, record):
+        record = dict(record, key=key)
+        self.results[key] = record
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+def successive_halving(n_folds, eta=3):
+    """
+    Budget schedule of successive halving with folds as the budget.
+
+    Yields the number of folds of every rung: all configurations run on one
+    fold, the best 1/eta continue on eta folds, and so on until every
+    survivor is scored on all folds.
+    """
+    budget = 1
+    while True:
+        yield min(budget, n_folds)
+        if budget >= n_folds:
+            return
+        budget *= eta
+
+def search(model_names=('svd', 'knn'), n_folds=config.TUNING_NUM_FOLDS, n_workers=None, halving=True,
+           eta=3, seed=42, store_path=config.RATINGS_STORE_PATH, cache_dir=config.TUNING_DIR):
+    """
+    Cross-validated search over the parameter grids of config.py.
+
+    Args:
+        model_names: models to tune ('svd', 'knn')
+        n_folds: number of cross-validation folds
+        n_workers: worker processes (defaults to the CPU count)
+        halving: drop the worst configurations after each rung of folds
+        eta: fraction (1/eta) of configurations kept per rung
+        seed: seed of the fold assignment
+        store_path: ratings store to tune on
+        cache_dir: directory of the fold file and the trial cache
+
+    Returns:
+        leaderboard: list of dicts, configurations scored on the most folds first,
+            then by mean RMSE
+    """
+    store = RatingsStore.open(store_path)
+    folds_path = make_folds(store, n_folds, seed, cache_dir)
+    cache = TrialCache(os.path.join(cache_dir, 'trials.jsonl'))
+    with open(os.path.join(store_path, 'meta.json')) as f:
+        split_id = [json.load(f)['sources'], n_folds, seed]
+
+    configs = [(name, params) for name in model_names for params in expand_grid(PARAM_GRIDS[name])]
+    all_configs = list(configs)
 
-# Create a GridSearchCV object with cross-validation
-grid_search = GridSearchCV(svm, param_grid, cv=5, n_jobs=-1)
+    def trials_of(candidate, n):
+        # Cached trials of a configuration on its first n folds (None when missing)
+        return [cache.get(TrialCache.key(candidate[0], candidate[1], fold, split_id)) for fold in range(n)]
 
-# Fit the GridSearchCV to find the best hyperparameters
-grid_search.fit(X_train, y_train)
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        rungs = successive_halving(n_folds, eta) if halving else [n_folds]
+        for budget in rungs:
+            # Submit the folds this rung adds for every surviving configuration
+            pending = {}
+            for name, params in configs:
+                for fold in range(budget):
+                    key = TrialCache.key(name, params, fold, split_id)
+                    if cache.get(key) is None and key not in pending.values():
+                        pending[pool.submit(run_trial, store_path, folds_path, name, params, fold)] = key
+            # Cache trials as they finish so an interrupted search loses as little as possible
+            for future in as_completed(pending):
+                cache.add(pending[future], future.result())
 
-# Get the best hyperparameters and the corresponding model
-best_params = grid_search.best_params_
-best_model = grid_search.best_estimator_
+            configs.sort(key=lambda candidate: _mean_rmse(trials_of(candidate, budget)))
+            print(f"rung with {budget} fold(s): {len(configs)} configurations, "
+                  f"best RMSE {_mean_rmse(trials_of(configs[0], budget)):.4f}")
+            if halving and budget < n_folds:
+                configs = configs[:max(1, math.ceil(len(configs) / eta))]
 
-# Print the best hyperparameters
-print("Best Hyperparameters:", best_params)
+    # Leaderboard of every configuration, ranked on the folds it reached
+    leaderboard = []
+    for candidate in all_configs:
+        trials = trials_of(candidate, n_folds)
+        trials = trials[:trials.index(None)] if None in trials else trials
+        rmses = [trial['rmse'] for trial in trials]
+        leaderboard.append({
+            'model': candidate[0],
+            'params': candidate[1],
+            'folds': len(trials),
+            'rmse': float(np.mean(rmses)),
+            'rmse_std': float(np.std(rmses)),
+            'seconds_per_trial': float(np.mean([trial['seconds'] for trial in trials])),
+        })
+    # Configurations scored on more folds (the survivors of halving) rank first
+    leaderboard.sort(key=lambda entry: (-entry['folds'], entry['rmse']))
+    return leaderboard
 
-# Evaluate the best model on the test set
-accuracy = best_model.score(X_test, y_test)
-print("Test Accuracy:", accuracy)
+def _mean_rmse(trials):
+    return float(np.mean([trial['rmse'] for trial in trials]))
 
+def print_leaderboard(leaderboard, top=20):
+    print(f"{'rank':>4} {'model':<5} {'RMSE':>7} {'± std':>7} {'folds':>5} {'s/trial':>8}  params")
+    for rank, entry in enumerate(leaderboard[:top], start=1):
+        print(f"{rank:>4} {entry['model']:<5} {entry['rmse']:>7.4f} {entry['rmse_std']:>7.4f} "
+              f"{entry['folds']:>5} {entry['seconds_per_trial']:>8.2f}  {entry['params']}")
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the collaborative filtering models")
+    parser.add_argument('--models', nargs='+', default=list(PARAM_GRIDS), choices=list(PARAM_GRIDS))
+    parser.add_argument('--folds', type=int, default=config.TUNING_NUM_FOLDS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-halving', action='store_true', help="score every configuration on every fold")
+    args = parser.parse_args()
 
+    leaderboard = search(args.models, args.folds, args.workers, halving=not args.no_halving)
+    print_leaderboard(leaderboard)
+    with open(os.path.join(config.TUNING_DIR, 'leaderboard.json'), 'w') as f:
+        json.dump(leaderboard, f, indent=2)
@@ -1,13 +1,19 @@
 # addition load_data if how we can create this function to load CSV files into DataFrames
-import pandas as pd
+from utils.instrumentation import timed
+from utils.ratings_store import RatingsStore
 
+@timed('load.data')
 def load_data():
     try:
+        # Open the binary copy of movie_data.csv and user_ratings.csv
+        # (ingested once, memory-mapped afterwards)
+        store = RatingsStore.open()
+
         # Load the movie dataset (movie_data.csv)
-        movie_data = pd.read_csv('C:\ProjectRecommendationSystems\MoviePlatform\data/movie_data.csv')
+        movie_data = store.movies()
 
         # Load the user ratings dataset (user_ratings.csv)
-        user_ratings = pd.read_csv('C:\ProjectRecommendationSystems\MoviePlatform\data/user_ratings.csv')
+        user_ratings = store.to_frame()
 
         return movie_data, user_ratings
     except FileNotFoundError as e:
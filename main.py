@@ -1,26 +1,19 @@
-from models.collaborative_filtering import train_collaborative_filtering_model, get_collaborative_filtering_recommendations
-from utils.data_preprocessing import load_data  # Implement this function to load our data
-from utils.evaluation_metrics import calculate_rmse  # Implement this function for evaluation
-from user_interface import create_user_interface  # Implement this function for user interaction
+import argparse
 
-def main():
-    # Load your data (movie_data.csv, user_ratings.csv, etc.)
-    movie_data, user_ratings = load_data()
-
-    # Train your recommendation models (collaborative, content-based, deep learning, etc.)
-    collaborative_model = train_collaborative_filtering_model(user_ratings)
-    # content_based_model = ...  # If we have a content-based model, train it here
-    # deep_learning_model = ...  # If we have a deep learning model, train it here
+import config
+from utils.evaluation import RECOMMENDERS, SPLIT_KINDS, evaluate, format_report
 
-    # Create a user interface for interaction
-    create_user_interface(collaborative_model)  # We can pass other models if needed
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the recommenders on a cached train/test split")
+    parser.add_argument('--split', choices=SPLIT_KINDS, default='random')
+    parser.add_argument('--models', nargs='+', choices=sorted(RECOMMENDERS), help="default: every registered model")
+    parser.add_argument('--k', type=int, nargs='+', default=config.EVALUATION_K)
+    parser.add_argument('--jobs', type=int, help="worker processes (default: one per model, at most one per CPU)")
+    args = parser.parse_args()
 
-    # If we want to evaluate your models, we can do so here
-    # For example, calculate RMSE for collaborative filtering
-    predictions = get_collaborative_filtering_recommendations(collaborative_model, user_ratings)
-    actual_ratings = user_ratings['rating'].values
-    rmse = calculate_rmse(predictions, actual_ratings)
-    print(f"RMSE for Collaborative Filtering: {rmse}")
+    # Every model trains on the same split in its own process; the table shows cost next to accuracy
+    results = evaluate(args.models, split=args.split, ks=args.k, n_jobs=args.jobs)
+    print(format_report(results, args.k))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,212 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+import config
+from utils.data_preprocessing import load_user_ratings
+from utils.id_encoder import IdEncoder
+from utils.instrumentation import timed
+from utils.item_similarity import create_X
+from utils.ranking import top_n as select_top_n
+
+USER_ITEM_MATRIX_PATH = os.path.join(config.DATA_DIR, 'user_item_matrix.npz')
+
+def load_user_item_matrix(path=USER_ITEM_MATRIX_PATH):
+    # The saved matrix has the create_X layout (movies x users); ALS wants users x movies
+    return sp.load_npz(path).T.tocsr()
+
+class ImplicitALS:
+    """
+    Alternating least squares for implicit feedback (Hu, Koren & Volinsky).
+
+    Every interaction r becomes a preference of 1 with confidence
+    1 + alpha * r. Each half-step solves the weighted ridge problem of every
+    user (then every item) with a few conjugate-gradient steps warm-started
+    from the previous factors, as the `implicit` package does. The CG runs
+    on blocks of rows at once: the per-row products with Y^T C_u Y are two
+    sparse-dense products, so there is no Python loop over rows, and blocks
+    are spread over a thread pool. Factors are float32, C-contiguous.
+    """
+
+    def __init__(self, factors=100, regularization=0.01, alpha=1.0, iterations=15, cg_steps=3, block_size=1024,
+                 n_threads=None, random_state=0):
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.cg_steps = cg_steps
+        self.block_size = block_size
+        self.n_threads = n_threads or os.cpu_count() or 1
+        self.random_state = random_state
+        self.user_factors = None
+        self.item_factors = None
+
+    @timed('train.als')
+    def fit(self, user_items, callback=None):
+        """
+        Trains the factors.
+
+        Args:
+            user_items: sparse users x items matrix of interaction strengths
+                (e.g. load_user_item_matrix() or create_X(df)[0].T)
+            callback: optional callable(iteration, seconds) run after each iteration
+
+        Returns:
+            self
+        """
+        user_items = sp.csr_matrix(user_items, dtype=np.float32)
+        user_items.sum_duplicates()
+        item_users = user_items.T.tocsr()
+        n_users, n_items = user_items.shape
+
+        rng = np.random.default_rng(self.random_state)
+        scale = np.float32(0.01)
+        if self.user_factors is None or self.user_factors.shape != (n_users, self.factors):
+            self.user_factors = np.ascontiguousarray(rng.random((n_users, self.factors), dtype=np.float32) * scale)
+        if self.item_factors is None or self.item_factors.shape != (n_items, self.factors):
+            self.item_factors = np.ascontiguousarray(rng.random((n_items, self.factors), dtype=np.float32) * scale)
+
+        with ThreadPoolExecutor(max_workers=self.n_threads) as pool:
+            for iteration in range(self.iterations):
+                start = time.perf_counter()
+                self._half_step(user_items, self.user_factors, self.item_factors, pool)
+                self._half_step(item_users, self.item_factors, self.user_factors, pool)
+                if callback is not None:
+                    callback(iteration, time.perf_counter() - start)
+        return self
+
+    def _half_step(self, interactions, X, Y, pool):
+        # Update every row of X (in place) given the fixed factors Y
+        YtY = Y.T @ Y + np.float32(self.regularization) * np.eye(self.factors, dtype=np.float32)
+        blocks = range(0, X.shape[0], self.block_size)
+        list(pool.map(lambda start: self._cg_block(interactions, X, Y, YtY, start), blocks))
+
+    def _cg_block(self, interactions, X, Y, YtY, start):
+        stop = min(start + self.block_size, X.shape[0])
+        block = interactions[start:stop]
+        if block.nnz == 0:
+            X[start:stop] = 0
+            return
+        confidence = np.float32(self.alpha) * block.data          # c - 1 for every interaction
+        rows = np.repeat(np.arange(stop - start), np.diff(block.indptr))
+        Y_nnz = Y[block.indices]
+
+        def A(vectors):
+            # (Y^T Y + reg I) v + Y^T (C_u - I) Y v, for every row at once
+            dots = np.einsum('ij,ij->i', Y_nnz, vectors[rows])
+            weighted = sp.csr_matrix((confidence * dots, block.indices, block.indptr), shape=block.shape)
+            return vectors @ YtY + weighted @ Y
+
+        # b = Y^T C_u p_u; p_u is 1 on interactions, 0 elsewhere
+        b = sp.csr_matrix((confidence + 1, block.indices, block.indptr), shape=block.shape) @ Y
+        x = X[start:stop]
+        r = b - A(x)
+        p = r.copy()
+        rsold = np.einsum('ij,ij->i', r, r)
+        for _ in range(self.cg_steps):
+            active = rsold > 1e-20
+            if not active.any():
+                break
+            Ap = A(p)
+            step = np.where(active, rsold / np.maximum(np.einsum('ij,ij->i', p, Ap), 1e-20), 0).astype(np.float32)
+            x += step[:, None] * p
+            r -= step[:, None] * Ap
+            rsnew = np.einsum('ij,ij->i', r, r)
+            p = r + np.where(active, rsnew / np.maximum(rsold, 1e-20), 0).astype(np.float32)[:, None] * p
+            rsold = rsnew
+        X[start:stop] = x
+
+    def recommend(self, user_indices, user_items=None, top_n=10):
+        """
+        Scores all items for a batch of users.
+
+        Args:
+            user_indices: rows of the users in the training matrix
+            user_items: optional users x items matrix whose entries are excluded
+            top_n: items per user
+
+        Returns:
+            item indices (padded with -1) and scores, both (len(user_indices), top_n)
+        """
+        user_indices = np.atleast_1d(user_indices)
+        scores = self.user_factors[user_indices] @ self.item_factors.T
+        if user_items is not None:
+            seen = sp.csr_matrix(user_items)[user_indices]
+            scores[np.repeat(np.arange(len(user_indices)), np.diff(seen.indptr)), seen.indices] = -np.inf
+        return select_top_n(scores, top_n)
+
+    def similar_items(self, item_indices, top_n=10):
+        # Cosine neighbours in factor space, excluding the item itself
+        item_indices = np.atleast_1d(item_indices)
+        norms = np.linalg.norm(self.item_factors, axis=1)
+        norms[norms == 0] = 1
+        normalized = self.item_factors / norms[:, None]
+        scores = normalized[item_indices] @ normalized.T
+        scores[np.arange(len(item_indices)), item_indices] = -np.inf
+        return select_top_n(scores, top_n)
+
+class ALSModel:
+    """
+    Implicit-feedback recommender with the build/save/load lifecycle of the
+    other models, mapping raw user/movie ids through IdEncoders.
+    """
+
+    def __init__(self, **als_params):
+        self.als = ImplicitALS(**als_params)
+        self.user_encoder = None
+        self.movie_encoder = None
+        self.user_items = None
+
+    def build(self, user_ratings=None):
+        if user_ratings is None:
+            user_ratings = load_user_ratings()
+        X, self.user_encoder, self.movie_encoder, _, _ = create_X(user_ratings)
+        self.user_items = X.T.tocsr().astype(np.float32)
+        self.als.fit(self.user_items)
+        return self
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'user_factors.npy'), self.als.user_factors)
+        np.save(os.path.join(path, 'item_factors.npy'), self.als.item_factors)
+        self.user_encoder.save(os.path.join(path, 'user_ids.npy'))
+        self.movie_encoder.save(os.path.join(path, 'movie_ids.npy'))
+        sp.save_npz(os.path.join(path, 'user_items.npz'), self.user_items)
+        params = {name: getattr(self.als, name) for name in ('factors', 'regularization', 'alpha', 'iterations',
+                                                             'cg_steps')}
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(params, f)
+
+    def load(self, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.als = ImplicitALS(**json.load(f))
+        self.als.user_factors = np.load(os.path.join(path, 'user_factors.npy'), mmap_mode='r')
+        self.als.item_factors = np.load(os.path.join(path, 'item_factors.npy'), mmap_mode='r')
+        self.user_encoder = IdEncoder.load(os.path.join(path, 'user_ids.npy'))
+        self.movie_encoder = IdEncoder.load(os.path.join(path, 'movie_ids.npy'))
+        self.user_items = sp.load_npz(os.path.join(path, 'user_items.npz'))
+        return self
+
+    def recommend(self, user_id, top_n=10):
+        # Top N movie ids the user has not interacted with
+        items, _ = self.als.recommend([self.user_encoder[user_id]], self.user_items, top_n)
+        return self.movie_encoder.inverse_transform(items[0][items[0] >= 0]).tolist()
+
+    # Name used by utils.user_interface.UserInterface
+    get_recommendations = recommend
+
+    def similar_movies(self, movie_id, top_n=10):
+        items, _ = self.als.similar_items([self.movie_encoder[movie_id]], top_n)
+        return self.movie_encoder.inverse_transform(items[0][items[0] >= 0]).tolist()
+
+# Example usage: fit on the ratings (user_ratings.csv) and show movies similar to Forrest Gump
+if __name__ == "__main__":
+    from utils.data_preprocessing import load_movie_data
+
+    model = ALSModel(factors=50).build()
+    movies = load_movie_data().set_index('movieId')['title']
+    print([movies[movie_id] for movie_id in model.similar_movies(356)])
@@ -0,0 +1,267 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.data_preprocessing import load_movie_data, load_user_profiles, load_user_ratings
+from utils.instrumentation import timed
+from utils.ranking import top_n as select_top_n
+from utils.title_index import split_year
+
+# Demographic segment levels, most specific first; () is the global segment every user belongs to
+SEGMENT_LEVELS = (('gender', 'age', 'occupation'), ('gender', 'age'), ('age',), ('gender',), ())
+
+def movie_buckets(movie_data):
+    """
+    Genre and decade bucket of every movie (the notebook part2 features).
+
+    Returns:
+        names: bucket names, e.g. 'genre:Comedy', 'decade:1990'
+        membership: bool array (len(names), len(movie_data))
+    """
+    genres = movie_data['genres'].str.split('|')
+    decades = movie_data['title'].map(lambda title: split_year(title)[1] // 10 * 10)
+    names = [f'genre:{genre}' for genre in sorted({g for gs in genres for g in gs} - {'(no genres listed)'})]
+    names += [f'decade:{decade}' for decade in sorted(set(decades) - {0})]
+    membership = np.zeros((len(names), len(movie_data)), dtype=bool)
+    rows = {name: row for row, name in enumerate(names)}
+    for position, (movie_genres, decade) in enumerate(zip(genres, decades)):
+        for name in [f'genre:{genre}' for genre in movie_genres] + [f'decade:{decade}']:
+            if name in rows:
+                membership[rows[name], position] = True
+    return names, membership
+
+class ColdStartRecommender:
+    """
+    Popularity tables per demographic segment and genre/decade bucket.
+
+    Users are grouped into segments from user_profiles.csv at every level of
+    SEGMENT_LEVELS. Each segment keeps rating counts and sums per movie; its
+    movies are ranked by the Bayesian average (sum + prior x global mean) /
+    (count + prior), and the top `table_size` are stored for the whole
+    catalog and for every genre and decade bucket. A recommendation is one
+    table lookup: the most specific segment of the user with at least
+    `min_users` raters, backing off to broader segments and finally to
+    everyone. New ratings update the counts immediately; the tables of the
+    touched segments are re-ranked every `refresh_every` ratings (or on
+    refresh()).
+    """
+
+    def __init__(self, table_size=100, min_users=5, prior=10.0, refresh_every=1000):
+        self.table_size = table_size
+        self.min_users = min_users
+        self.prior = prior
+        self.refresh_every = refresh_every
+        self._pending = 0
+        self._dirty = set()
+
+    @timed('train.cold_start')
+    def build(self, user_ratings=None, user_profiles=None, movie_data=None):
+        if user_ratings is None:
+            user_ratings = load_user_ratings()
+        if user_profiles is None:
+            user_profiles = load_user_profiles()
+        if movie_data is None:
+            movie_data = load_movie_data()
+
+        self.movie_ids = movie_data['movieId'].values
+        self._movie_positions = pd.Index(self.movie_ids)
+        self.bucket_names, self.bucket_membership = movie_buckets(movie_data)
+        self._bucket_rows = {name: row + 1 for row, name in enumerate(self.bucket_names)}
+
+        # Segment ids of every profiled user at every level (-1: attribute missing)
+        self.segments = {}
+        self.user_segments = {}
+        for profile in (user_profiles.to_dict('records') if user_profiles is not None else []):
+            self.user_segments[profile['user_id']] = self._segment_ids(profile, create=True)
+        self._segment_ids({}, create=True)
+        n_segments = len(self.segments)
+
+        self.counts = np.zeros((n_segments, len(self.movie_ids)), dtype=np.float32)
+        self.sums = np.zeros((n_segments, len(self.movie_ids)), dtype=np.float32)
+        self.raters = np.zeros(n_segments, dtype=np.int64)
+        self._seen_users = set()
+        ratings = user_ratings[['userId', 'movieId', 'rating']]
+        positions = self._movie_positions.get_indexer(ratings['movieId'].values)
+        known = positions >= 0
+        users, positions, values = ratings['userId'].values[known], positions[known], ratings['rating'].values[known]
+
+        # One scatter-add per level: every rating counts once for its user's segment at that level
+        global_segment = self.segments[()]
+        for level in range(len(SEGMENT_LEVELS)):
+            segment_of = {user_id: ids[level] for user_id, ids in self.user_segments.items()}
+            rows = np.array([segment_of.get(user_id, global_segment if level == len(SEGMENT_LEVELS) - 1 else -1)
+                             for user_id in users.tolist()], dtype=np.int64)
+            keep = rows >= 0
+            np.add.at(self.counts, (rows[keep], positions[keep]), 1)
+            np.add.at(self.sums, (rows[keep], positions[keep]), values[keep])
+        for user_id in np.unique(users).tolist():
+            self._add_rater(user_id)
+
+        self.global_mean = float(values.mean()) if len(values) else 0.0
+        self.tables = np.full((n_segments, len(self.bucket_names) + 1, self.table_size), -1, dtype=np.int32)
+        self._dirty = set(range(n_segments))
+        self.refresh()
+        return self
+
+    def _segment_ids(self, demographics, create=False):
+        # Segment id per level for a demographics dict; -1 where an attribute is missing or the segment unknown
+        ids = []
+        for level in SEGMENT_LEVELS:
+            values = tuple(demographics.get(attribute) for attribute in level)
+            if any(value is None or value != value for value in values):
+                ids.append(-1)
+                continue
+            key = tuple(zip(level, values))
+            if create and key not in self.segments:
+                self.segments[key] = len(self.segments)
+            ids.append(self.segments.get(key, -1))
+        return ids
+
+    def _user_segment_ids(self, user_id):
+        ids = self.user_segments.get(user_id)
+        return ids if ids is not None else [-1] * (len(SEGMENT_LEVELS) - 1) + [self.segments[()]]
+
+    def _add_rater(self, user_id):
+        if user_id not in self._seen_users:
+            self._seen_users.add(user_id)
+            for segment in self._user_segment_ids(user_id):
+                if segment >= 0:
+                    self.raters[segment] += 1
+
+    def refresh(self):
+        """
+        Re-ranks the tables of every segment touched since the last refresh.
+        """
+        dirty = np.array(sorted(self._dirty), dtype=np.int64)
+        self._dirty, self._pending = set(), 0
+        if not len(dirty):
+            return
+        masks = np.vstack([np.ones((1, len(self.movie_ids)), dtype=bool), self.bucket_membership])
+        for segment in dirty.tolist():
+            # Only movies rated in the segment can rank; small segments touch a few hundred columns
+            rated = np.flatnonzero(self.counts[segment])
+            counts, sums = self.counts[segment, rated], self.sums[segment, rated]
+            scores = (sums + self.prior * self.global_mean) / (counts + self.prior)
+            # Whole catalog plus every bucket in one top-N over a (buckets x rated movies) matrix
+            columns, _ = select_top_n(np.where(masks[:, rated], scores, -np.inf), self.table_size)
+            self.tables[segment] = np.append(rated, -1)[columns]
+
+    def add_user(self, user_id, demographics):
+        # Register the profile of a new user, e.g. {'gender': 'F', 'age': 25, 'occupation': 4}
+        self.user_segments[user_id] = self._segment_ids(demographics)
+
+    def add_rating(self, user_id, movie_id, rating):
+        """
+        Counts a new rating in every segment of the user.
+        """
+        position = self._movie_positions.get_indexer([movie_id])[0]
+        if position < 0:
+            return
+        self._add_rater(user_id)
+        for segment in self._user_segment_ids(user_id):
+            if segment >= 0:
+                self.counts[segment, position] += 1
+                self.sums[segment, position] += rating
+                self._dirty.add(int(segment))
+        self._pending += 1
+        if self._pending >= self.refresh_every:
+            self.refresh()
+
+    def segment(self, user_id=None, demographics=None):
+        # Most specific segment with enough raters for a known user or a demographics dict
+        ids = self._segment_ids(demographics) if demographics is not None else self._user_segment_ids(user_id)
+        for segment in ids:
+            if segment >= 0 and self.raters[segment] >= self.min_users:
+                return segment
+        return self.segments[()]
+
+    def recommend(self, user_id=None, top_n=10, genre=None, decade=None, demographics=None, exclude=()):
+        """
+        Most popular movies for the user's segment.
+
+        Args:
+            user_id: user whose profile selects the segment (unknown users get the global table)
+            top_n: number of movies
+            genre: optional genre filter, e.g. 'Comedy'
+            decade: optional decade filter, e.g. 1990 (genre wins when both are given)
+            demographics: dict with gender / age / occupation for users without a profile
+            exclude: movie ids to leave out (e.g. already rated); the segment is
+                ranked past its stored table, then topped up from the global
+                ranking, until `top_n` movies remain
+
+        Returns:
+            list of movie ids
+        """
+        bucket = 0
+        if genre is not None or decade is not None:
+            name = f'genre:{genre}' if genre is not None else f'decade:{decade}'
+            if name not in self._bucket_rows:
+                raise ValueError(f"Unknown bucket {name!r}")
+            bucket = self._bucket_rows[name]
+        exclude = np.asarray(list(exclude), dtype=self.movie_ids.dtype)
+        segment = self.segment(user_id, demographics)
+        movie_ids = self._top(segment, bucket, top_n, exclude)
+        if len(movie_ids) < top_n and segment != self.segments[()]:
+            # The segment has rated too few movies: fill up from everyone's ranking
+            extra = self._top(self.segments[()], bucket, top_n + len(movie_ids), exclude)
+            movie_ids = np.concatenate([movie_ids, extra[~np.isin(extra, movie_ids)]])
+        return movie_ids[:top_n].tolist()
+
+    def _top(self, segment, bucket, top_n, exclude):
+        # Top N unexcluded movie ids of one table; past the stored table_size the segment is ranked in full
+        positions = self.tables[segment, bucket]
+        positions = positions[positions >= 0]
+        movie_ids = self.movie_ids[positions]
+        movie_ids = movie_ids[~np.isin(movie_ids, exclude)]
+        if len(movie_ids) >= top_n or len(positions) < self.table_size:
+            return movie_ids[:top_n]
+        rated = np.flatnonzero(self.counts[segment])
+        if bucket:
+            rated = rated[self.bucket_membership[bucket - 1, rated]]
+        rated = rated[~np.isin(self.movie_ids[rated], exclude)]
+        counts, sums = self.counts[segment, rated], self.sums[segment, rated]
+        scores = (sums + self.prior * self.global_mean) / (counts + self.prior)
+        columns, _ = select_top_n(scores, top_n)
+        return self.movie_ids[rated[columns[columns >= 0]]]
+
+    # Name used by utils.user_interface.UserInterface
+    get_recommendations = recommend
+
+    def save(self, path):
+        if self._dirty:
+            self.refresh()
+        os.makedirs(path, exist_ok=True)
+        for name in ('movie_ids', 'bucket_membership', 'counts', 'sums', 'raters', 'tables'):
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        meta = {
+            'table_size': self.table_size, 'min_users': self.min_users, 'prior': self.prior,
+            'refresh_every': self.refresh_every, 'global_mean': self.global_mean, 'bucket_names': self.bucket_names,
+            'segments': [[list(pair) for pair in key] for key in self.segments],
+            'user_segments': {str(user_id): ids for user_id, ids in self.user_segments.items()},
+            'seen_users': sorted(int(user_id) for user_id in self._seen_users),
+        }
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, default=lambda value: value.item())
+
+    def load(self, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        for name in ('table_size', 'min_users', 'prior', 'refresh_every', 'global_mean', 'bucket_names'):
+            setattr(self, name, meta[name])
+        for name in ('movie_ids', 'bucket_membership', 'counts', 'sums', 'raters', 'tables'):
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy')))
+        self._movie_positions = pd.Index(self.movie_ids)
+        self._bucket_rows = {name: row + 1 for row, name in enumerate(self.bucket_names)}
+        self.segments = {tuple(tuple(pair) for pair in key): segment for segment, key in enumerate(meta['segments'])}
+        self.user_segments = {int(user_id): ids for user_id, ids in meta['user_segments'].items()}
+        self._seen_users = set(meta['seen_users'])
+        self._dirty, self._pending = set(), 0
+        return self
+
+# Example usage: top comedies for a 25-34 year old woman without any ratings
+if __name__ == "__main__":
+    model = ColdStartRecommender().build()
+    movies = load_movie_data().set_index('movieId')['title']
+    print([movies[movie_id] for movie_id in model.recommend(demographics={'gender': 'F', 'age': 25}, genre='Comedy')])
@@ -1,41 +1,339 @@
 # Collaborative filtering model
-from surprise import Dataset, Reader, SVD
-from surprise.model_selection import train_test_split
+import json
+import os
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from utils.data_preprocessing import load_user_ratings
+from utils.instrumentation import VERBOSE, stage, timed
+from utils.ranking import top_n as select_top_n
+from utils.rated_items import RatedItemsIndex
+
+@timed('train.svd')
+def train_collaborative_filtering_model(user_ratings, test_size=0.2, **svd_params):
+    """
+    Fits surprise's SVD on the ratings.
+
+    Args:
+        user_ratings: ratings dataframe (userId, movieId, rating)
+        test_size: share of ratings held out of training; None trains on all of them
+        **svd_params: passed to surprise.SVD (n_factors, n_epochs, lr_all, ...)
+
+    Returns:
+        fitted surprise SVD model
+    """
+    # surprise is only needed for training, import it on first use
+    from surprise import Dataset, Reader, SVD
+    from surprise.model_selection import train_test_split
 
-def train_collaborative_filtering_model(user_ratings):
     # Load data and create a Surprise dataset
     reader = Reader(rating_scale=(1, 5))
     data = Dataset.load_from_df(user_ratings[['userId', 'movieId', 'rating']], reader)
 
     # Split data into training and testing sets
-    trainset, testset = train_test_split(data, test_size=0.2)
+    if test_size:
+        trainset, testset = train_test_split(data, test_size=test_size)
+    else:
+        trainset = data.build_full_trainset()
 
     # Initialize and train the SVD algorithm (or another collaborative filtering model)
-    algo = SVD()
+    algo = SVD(**svd_params)
     algo.fit(trainset)
 
     return algo
 
-def get_collaborative_filtering_recommendations(model, user_id, top_n=10):
-    # Generate recommendations using the trained model
-    # We can use the model to predict ratings for items not rated by the user
-    # and recommend items with the highest predicted ratings.
-    # Here's a simplified example using Surprise's built-in functions:
+class SVDScorer:
+    """
+    Scores users against the whole catalog with the factors of a fitted SVD.
+
+    The factors are copied out of the surprise model once, so scoring a batch
+    of users is a single matrix product instead of one `model.predict` call
+    per (user, movie) pair. Estimates follow `SVD.predict`: unknown users or
+    movies fall back to the biases and the global mean, and the result is
+    clipped to the rating scale.
+    """
+
+    def __init__(self, user_ids, pu, bu, movie_ids, qi, bi, global_mean, rating_scale=(1, 5),
+                 biased=True, known_items=None, trainset_index=None):
+        """
+        Args:
+            user_ids: raw user id of every row of pu/bu
+            pu, bu: user factors and biases
+            movie_ids: raw movie id of every row of qi/bi (the catalog)
+            qi, bi: item factors and biases
+            global_mean: mean rating of the training data
+            rating_scale: (low, high) bounds the estimates are clipped to
+            biased: whether the SVD was fitted with biases
+            known_items: which catalog movies were seen in training
+            trainset_index: RatedItemsIndex of the training ratings
+        """
+        self.user_ids = np.asarray(user_ids)
+        self.pu = np.asarray(pu, dtype=np.float64)
+        self.bu = np.asarray(bu, dtype=np.float64)
+        self.movie_ids = np.asarray(movie_ids)
+        self.qi = np.asarray(qi, dtype=np.float64)
+        self.bi = np.asarray(bi, dtype=np.float64)
+        self.global_mean = float(global_mean)
+        self.rating_scale = tuple(rating_scale)
+        self.biased = bool(biased)
+        self.known_items = np.ones(len(self.movie_ids), dtype=bool) if known_items is None else np.asarray(known_items)
+        self._user_inner = {user_id: row for row, user_id in enumerate(self.user_ids.tolist())}
+        self._movie_positions = pd.Index(self.movie_ids)
+        self._trainset_index = trainset_index
+        self._trainset = None
+
+    @classmethod
+    def from_model(cls, model, movie_ids=None):
+        """
+        Copies the factors out of a fitted surprise SVD model.
+
+        Args:
+            model: fitted surprise SVD model
+            movie_ids: raw movie ids forming the catalog (defaults to every
+                movie in the model's trainset)
+
+        Returns:
+            SVDScorer
+        """
+        trainset = model.trainset
+        biased = bool(model.biased)
+        if movie_ids is None:
+            movie_ids = [trainset.to_raw_iid(i) for i in trainset.all_items()]
+        movie_ids = np.asarray(movie_ids)
+
+        # Align item factors with the catalog; unknown movies keep zeros
+        qi = np.zeros((len(movie_ids), model.qi.shape[1]))
+        bi = np.zeros(len(movie_ids))
+        known_items = np.zeros(len(movie_ids), dtype=bool)
+        for pos, movie_id in enumerate(movie_ids):
+            inner = _inner_iid(trainset, movie_id)
+            if inner < 0:
+                continue
+            qi[pos] = model.qi[inner]
+            bi[pos] = model.bi[inner] if biased else 0.0
+            known_items[pos] = True
+
+        user_ids = [trainset.to_raw_uid(u) for u in trainset.all_users()]
+        bu = model.bu if biased else np.zeros(len(model.pu))
+        scorer = cls(user_ids, model.pu, bu, movie_ids, qi, bi, trainset.global_mean,
+                     trainset.rating_scale, biased, known_items)
+        scorer._trainset = trainset
+        return scorer
+
+    def score(self, user_ids):
+        """
+        Predicts ratings for every catalog movie for a batch of users.
+
+        Args:
+            user_ids: iterable of raw user ids
+
+        Returns:
+            scores: array of shape (len(user_ids), len(movie_ids))
+        """
+        inner = np.array([self._user_inner.get(u, -1) for u in user_ids], dtype=np.int64)
+        known_users = inner >= 0
+        safe = np.where(known_users, inner, 0)
+
+        pu = self.pu[safe] * known_users[:, None]
+        scores = pu @ self.qi.T
+        if self.biased:
+            scores += self.global_mean
+            scores += (self.bu[safe] * known_users)[:, None]
+            scores += self.bi[None, :]
+        else:
+            # Unbiased SVD cannot predict unknown pairs, surprise falls back to the mean
+            both = known_users[:, None] & self.known_items[None, :]
+            scores = np.where(both, scores, self.global_mean)
+
+        low, high = self.rating_scale
+        return np.clip(scores, low, high, out=scores)
+
+    def predict(self, user_ids, movie_ids):
+        """
+        Predicts the ratings of (user, movie) pairs, like SVD.predict.
+
+        Args:
+            user_ids: raw user id of every pair
+            movie_ids: raw movie id of every pair
+
+        Returns:
+            estimates: array of len(user_ids) predicted ratings
+        """
+        users = np.array([self._user_inner.get(u, -1) for u in user_ids], dtype=np.int64)
+        items = self._movie_positions.get_indexer(np.asarray(movie_ids))
+        known_users = users >= 0
+        known_items = items >= 0
+        known_items[known_items] = self.known_items[items[known_items]]
+        safe_users, safe_items = np.where(known_users, users, 0), np.where(items >= 0, items, 0)
 
-    # Create a list of movie IDs that the user has not rated
-    unrated_movie_ids = [movie_id for movie_id in range(num_movies) if not user_has_rated_movie(user_id, movie_id, user_ratings)]
+        both = known_users & known_items
+        estimates = np.full(len(users), self.global_mean)
+        dots = np.einsum('ij,ij->i', self.pu[safe_users], self.qi[safe_items])
+        if self.biased:
+            estimates += np.where(known_users, self.bu[safe_users], 0.0)
+            estimates += np.where(known_items, self.bi[safe_items], 0.0)
+            estimates += np.where(both, dots, 0.0)
+        else:
+            estimates = np.where(both, dots, estimates)
 
-    # Predict ratings for unrated movies
-    predictions = [model.predict(user_id, movie_id) for movie_id in unrated_movie_ids]
+        low, high = self.rating_scale
+        return np.clip(estimates, low, high)
 
-    # Sort predictions by predicted rating in descending order
-    predictions.sort(key=lambda x: x.est, reverse=True)
+    def rated_mask(self, user_ids, rated_index=None):
+        """
+        Marks the catalog movies each user has already rated.
 
-    # Get the top N recommended movie IDs
-    top_movie_ids = [prediction.iid for prediction in predictions[:top_n]]
+        Args:
+            user_ids: iterable of raw user ids
+            rated_index: RatedItemsIndex with the rating history (defaults to
+                the ratings the model was trained on)
 
-    return top_movie_ids
+        Returns:
+            mask: boolean array of shape (len(user_ids), len(movie_ids))
+        """
+        if rated_index is None:
+            rated_index = self.trainset_index()
+        return rated_index.mask(user_ids, self._movie_positions)
 
-def user_has_rated_movie(user_id, movie_id, user_ratings):
+    def trainset_index(self):
+        # Index of the ratings seen during training, built on first use
+        if self._trainset_index is None:
+            if self._trainset is None:
+                raise ValueError("No training ratings available, pass a rated_index")
+            trainset = self._trainset
+            pairs = [(trainset.to_raw_uid(u), trainset.to_raw_iid(i)) for u, i, _ in trainset.all_ratings()]
+            user_ids, movie_ids = zip(*pairs) if pairs else ((), ())
+            self._trainset_index = RatedItemsIndex.from_pairs(user_ids, movie_ids)
+        return self._trainset_index
+
+    def recommend(self, user_ids, top_n=10, rated_index=None):
+        """
+        Finds the top N unrated movies for a batch of users.
+
+        Args:
+            user_ids: iterable of raw user ids
+            top_n: number of movies to recommend per user
+            rated_index: RatedItemsIndex used to exclude already rated movies
+
+        Returns:
+            movie_ids: array of shape (len(user_ids), top_n) with raw movie ids,
+                padded with -1 when a user has fewer candidates
+            scores: matching array of predicted ratings
+        """
+        user_ids = list(user_ids)
+        with stage('recommend.svd.score', VERBOSE):
+            scores = self.score(user_ids)
+        with stage('recommend.svd.mask_rated', VERBOSE):
+            scores[self.rated_mask(user_ids, rated_index)] = -np.inf
+
+        with stage('recommend.svd.top_n', VERBOSE):
+            positions, top_scores = select_top_n(scores, top_n)
+        movie_ids = np.where(positions >= 0, self.movie_ids[positions], -1)
+        return movie_ids, top_scores
+
+class CollaborativeFilteringModel:
+    """
+    SVD recommender with an explicit build/save/load lifecycle.
+
+    build() trains surprise's SVD on the ratings, save() writes the factors
+    and the rated-items index as .npy files, and load() restores them without
+    importing surprise at all.
+    """
+
+    def __init__(self, cold_start=None):
+        self.scorer = None
+        self.rated_index = None
+        # Optional models.cold_start.ColdStartRecommender answering for users the SVD has never seen
+        self.cold_start = cold_start
+
+    def build(self, user_ratings=None):
+        # Train the SVD on the full rating history (holdout splits belong to utils.evaluation) and keep its factors
+        if user_ratings is None:
+            user_ratings = load_user_ratings()
+        self.scorer = SVDScorer.from_model(train_collaborative_filtering_model(user_ratings, test_size=None))
+        self.rated_index = RatedItemsIndex.from_ratings(user_ratings)
+        return self
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        scorer = self.scorer
+        self.rated_index.compact()
+        arrays = {
+            'user_ids': scorer.user_ids, 'pu': scorer.pu, 'bu': scorer.bu,
+            'movie_ids': scorer.movie_ids, 'qi': scorer.qi, 'bi': scorer.bi, 'known_items': scorer.known_items,
+            'rated_user_ids': self.rated_index.user_ids, 'rated_indptr': self.rated_index.indptr,
+            'rated_indices': self.rated_index.indices,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f'{name}.npy'), array)
+        meta = {'global_mean': scorer.global_mean, 'rating_scale': list(scorer.rating_scale), 'biased': scorer.biased}
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    def load(self, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        # Memory-mapped: loading reads the metadata only, pages come in as they are scored
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in (
+            'user_ids', 'pu', 'bu', 'movie_ids', 'qi', 'bi', 'known_items',
+            'rated_user_ids', 'rated_indptr', 'rated_indices')}
+        self.rated_index = RatedItemsIndex(arrays['rated_user_ids'], arrays['rated_indptr'], arrays['rated_indices'])
+        self.scorer = SVDScorer(
+            arrays['user_ids'], arrays['pu'], arrays['bu'], arrays['movie_ids'], arrays['qi'], arrays['bi'],
+            meta['global_mean'], meta['rating_scale'], meta['biased'], arrays['known_items'],
+        )
+        return self
+
+    def recommend(self, user_id, top_n=10):
+        # Top N unrated movie ids for one user
+        if self.cold_start is not None and user_id not in self.scorer._user_inner:
+            return self.cold_start.recommend(user_id, top_n, exclude=self.rated_index.rated_items(user_id))
+        movie_ids, _ = self.scorer.recommend([user_id], top_n=top_n, rated_index=self.rated_index)
+        return [movie_id for movie_id in movie_ids[0].tolist() if movie_id != -1]
+
+    # Name used by utils.user_interface.UserInterface
+    get_recommendations = recommend
+
+# SVDScorer of each surprise model passed to get_collaborative_filtering_recommendations, built once per model
+_scorers = weakref.WeakKeyDictionary()
+
+def _scorer_for(model):
+    if isinstance(model, SVDScorer):
+        return model
+    try:
+        scorer = _scorers.get(model)
+    except TypeError:
+        # Not weak-referenceable, build a scorer per call
+        return SVDScorer.from_model(model)
+    if scorer is None:
+        scorer = _scorers[model] = SVDScorer.from_model(model)
+    return scorer
+
+def get_collaborative_filtering_recommendations(model, user_id, top_n=10, rated_index=None, cache=None):
+    # Generate recommendations using the trained model
+    # The fitted factors are scored against the whole catalog in one matrix
+    # product and movies the user has already rated are masked out.
+    def compute():
+        scorer = _scorer_for(model)
+        movie_ids, _ = scorer.recommend([user_id], top_n=top_n, rated_index=rated_index)
+
+        # Get the top N recommended movie IDs
+        return [movie_id for movie_id in movie_ids[0].tolist() if movie_id != -1]
+
+    # Serve repeated requests from a utils.recommendation_cache.RecommendationCache
+    if cache is not None:
+        return cache.get_or_compute('collaborative_filtering', user_id, top_n, compute)
+    return compute()
+
+def user_has_rated_movie(user_id, movie_id, rated_index):
     # Helper function to check if a user has rated a specific movie
-    return not user_ratings[(user_ratings['userId'] == user_id) & (user_ratings['movieId'] == movie_id)].empty
+    return rated_index.has_rated(user_id, movie_id)
+
+def _inner_iid(trainset, movie_id):
+    # Surprise raises for unknown raw ids, map those to an invalid inner id
+    try:
+        return trainset.to_inner_iid(movie_id)
+    except ValueError:
+        return -1
@@ -1,76 +1,183 @@
 # content_based.py
 
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import linear_kernel
-
-# Load the movie dataset (movie_data.csv)
-movie_data = pd.read_csv('C:\ProjectRecommendationSystems\MoviePlatform\data/movie_data.csv')
-
-# Create a TF-IDF vectorizer to convert movie genres into numerical features
-tfidf_vectorizer = TfidfVectorizer(stop_words='english')
-movie_genres_matrix = tfidf_vectorizer.fit_transform(movie_data['genres'])
-
-# Calculate the cosine similarity between movies based on their genres
-cosine_sim = linear_kernel(movie_genres_matrix, movie_genres_matrix)
-
-# Create a function to recommend movies based on user preferences
-def content_based_recommendations(movie_title, cosine_sim=cosine_sim, movie_data=movie_data, top_n=10):
-    # Find the index of the movie with the given title
-    movie_idx = movie_data.index[movie_data['title'] == movie_title].tolist()[0]
-
-    # Calculate the cosine similarity scores for all movies
-    sim_scores = list(enumerate(cosine_sim[movie_idx]))
-
-    # Sort the movies based on similarity scores
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-
-    # Get the top N most similar movies
-    sim_scores = sim_scores[1:top_n+1]
-
-    # Get the movie indices
-    movie_indices = [i[0] for i in sim_scores]
+import os
 
-    # Return the top N similar movies
-    return movie_data['title'].iloc[movie_indices]
-
-
-# Content-based filtering model (if used)
-# Implement our content-based filtering model here if needed
+import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import linear_kernel
-
-# Load the movie dataset (movie_data.csv)
-movie_data = pd.read_csv('C:\ProjectRecommendationSystems\MoviePlatform\data/movie_data.csv')
 
-# Create a TF-IDF vectorizer to convert movie genres into numerical features
-tfidf_vectorizer = TfidfVectorizer(stop_words='english')
-movie_genres_matrix = tfidf_vectorizer.fit_transform(movie_data['genres'])
-
-# Calculate the cosine similarity between movies based on their genres
-cosine_sim = linear_kernel(movie_genres_matrix, movie_genres_matrix)
+from utils.data_preprocessing import load_movie_data
+from utils.instrumentation import VERBOSE, stage, timed
+from utils.ranking import top_n as select_top_n
+from utils.title_index import TitleIndex
+
+class ContentSimilarityStore:
+    """
+    Top-K most similar movies of every movie, computed block by block.
+
+    Instead of the dense N x N similarity matrix only the K best neighbours of
+    each movie are kept, as an int32 index array and a float32 score array of
+    shape (N, K) sorted by decreasing similarity. Rows are computed in blocks
+    of `block_size` movies so peak memory stays at block_size x N, and blocks
+    are spread over `n_jobs` worker processes.
+    """
+
+    def __init__(self, neighbours, scores):
+        self.neighbours = neighbours
+        self.scores = scores
+
+    @classmethod
+    def build(cls, features, k=50, block_size=512, n_jobs=-1):
+        """
+        Computes the top-K cosine neighbours of every row of a feature matrix.
+
+        Args:
+            features: L2-normalised (sparse) feature matrix, one row per movie
+            k: number of neighbours kept per movie
+            block_size: rows scored at once by a worker
+            n_jobs: number of worker processes (-1 uses every core)
+
+        Returns:
+            ContentSimilarityStore
+        """
+        from joblib import Parallel, delayed
+
+        n_movies = features.shape[0]
+        k = min(k, n_movies - 1)
+        blocks = [(start, min(start + block_size, n_movies)) for start in range(0, n_movies, block_size)]
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(_top_k_block)(features, start, stop, k) for start, stop in blocks
+        )
+        neighbours = np.vstack([block_neighbours for block_neighbours, _ in results])
+        scores = np.vstack([block_scores for _, block_scores in results])
+        return cls(neighbours, scores)
+
+    def most_similar(self, movie_idx, top_n=10):
+        """
+        Returns the row positions and scores of the movies most similar to one movie.
+
+        Only the K best neighbours are stored, so a `top_n` above K returns
+        those K movies.
+        """
+        return self.neighbours[movie_idx, :top_n], self.scores[movie_idx, :top_n]
+
+def _top_k_block(features, start, stop, k):
+    # Score one block of movies against all movies and keep the best k
+    from sklearn.metrics.pairwise import linear_kernel
+
+    sims = linear_kernel(features[start:stop], features).astype(np.float32)
+    sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # a movie is not its own neighbour
+    neighbours, scores = select_top_n(sims, k)
+    return neighbours.astype(np.int32), scores.astype(np.float32)
+
+class ContentBasedModel:
+    """
+    Genre-based recommender with an explicit build/save/load lifecycle.
+
+    Nothing is read or computed at import time: build() fits the TF-IDF genre
+    features and the similarity store, save()/load() persist the store and the
+    movie table so serving never needs scikit-learn.
+    """
+
+    def __init__(self, k=50):
+        self.k = k
+        self.movie_data = None
+        self.similarity_store = None
+        self.title_index = None
+
+    @timed('train.content_based')
+    def build(self, movie_data=None):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        # Load the movie dataset (movie_data.csv)
+        if movie_data is None:
+            movie_data = load_movie_data()
+        self.movie_data = movie_data.reset_index(drop=True)
+
+        # Create a TF-IDF vectorizer to convert movie genres into numerical features
+        tfidf_vectorizer = TfidfVectorizer(stop_words='english')
+        movie_genres_matrix = tfidf_vectorizer.fit_transform(self.movie_data['genres'])
+
+        # Keep the top-K cosine neighbours of every movie based on their genres
+        self.similarity_store = ContentSimilarityStore.build(movie_genres_matrix, k=self.k)
+
+        # Typo-tolerant title -> row lookup for the query movie
+        self.title_index = TitleIndex.build(self.movie_data['title'])
+        return self
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'neighbours.npy'), self.similarity_store.neighbours)
+        np.save(os.path.join(path, 'scores.npy'), self.similarity_store.scores)
+        self.movie_data.to_csv(os.path.join(path, 'movies.csv'), index=False)
+        self.title_index.save(os.path.join(path, 'title_index'))
+
+    def load(self, path):
+        self.movie_data = pd.read_csv(os.path.join(path, 'movies.csv'))
+        self.similarity_store = ContentSimilarityStore(
+            np.load(os.path.join(path, 'neighbours.npy'), mmap_mode='r'),
+            np.load(os.path.join(path, 'scores.npy'), mmap_mode='r'),
+        )
+        self.k = self.similarity_store.neighbours.shape[1]
+        # Models saved before the title index existed get one built from the movie table
+        title_index_path = os.path.join(path, 'title_index')
+        self.title_index = TitleIndex.load(title_index_path) if os.path.isdir(title_index_path) \
+            else TitleIndex.build(self.movie_data['title'])
+        return self
+
+    def recommend(self, movie_title, top_n=10):
+        # Titles of the top N movies most similar to the given movie
+        return content_based_recommendations(movie_title, self.similarity_store, self.movie_data, top_n,
+                                             title_index=self.title_index)
+
+_default_model = None
+# (movie table, TitleIndex) of the last table queried without an index, so it is built once per table
+_adhoc_title_index = None
+
+def get_default_model():
+    # Model built from the bundled movie data on first use
+    global _default_model
+    if _default_model is None:
+        _default_model = ContentBasedModel().build()
+    return _default_model
+
+def _title_index_for(movie_data):
+    global _adhoc_title_index
+    if _adhoc_title_index is None or _adhoc_title_index[0] is not movie_data:
+        _adhoc_title_index = (movie_data, TitleIndex.build(movie_data['title']))
+    return _adhoc_title_index[1]
 
 # Create a function to recommend movies based on user preferences
-def content_based_recommendations(movie_title, cosine_sim=cosine_sim, movie_data=movie_data, top_n=10):
-    # Find the index of the movie with the given title
-    movie_idx = movie_data.index[movie_data['title'] == movie_title].tolist()[0]
-
-    # Calculate the cosine similarity scores for all movies
-    sim_scores = list(enumerate(cosine_sim[movie_idx]))
-
-    # Sort the movies based on similarity scores
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-
-    # Get the top N most similar movies
-    sim_scores = sim_scores[1:top_n+1]
-
-    # Get the movie indices
-    movie_indices = [i[0] for i in sim_scores]
+def content_based_recommendations(movie_title, similarity_store=None, movie_data=None, top_n=10, cache=None,
+                                  title_index=None):
+    # Serve repeated requests from a utils.recommendation_cache.RecommendationCache
+    if cache is not None:
+        return cache.get_or_compute('content_based', movie_title, top_n, lambda: content_based_recommendations(
+            movie_title, similarity_store, movie_data, top_n, title_index=title_index))
+
+    if similarity_store is None or movie_data is None:
+        model = get_default_model()
+        similarity_store, movie_data, title_index = model.similarity_store, model.movie_data, model.title_index
+
+    # Find the index of the movie with the given title; the TitleIndex also
+    # resolves typos, "The Matrix" vs "Matrix, The (1999)" and missing years
+    with stage('recommend.content_based.title_lookup', VERBOSE):
+        if title_index is None:
+            # No index for this movie table: exact match first, an index built once per table for anything else
+            matches = np.flatnonzero(movie_data['title'].values == movie_title)
+            movie_idx = matches[0] if len(matches) else _title_index_for(movie_data).lookup(movie_title)
+        else:
+            movie_idx = title_index.lookup(movie_title)
+    if movie_idx is None:
+        raise ValueError(f"No movie title matches {movie_title!r}")
+
+    # Get the top N most similar movies (already sorted by similarity; at most the K neighbours kept)
+    with stage('recommend.content_based.neighbours', VERBOSE):
+        movie_indices, _ = similarity_store.most_similar(movie_idx, top_n)
 
     # Return the top N similar movies
     return movie_data['title'].iloc[movie_indices]
 
 # Example usage: Get recommendations for a specific movie
-recommendations = content_based_recommendations("Toy Story (1995)")
-print(recommendations)
+if __name__ == "__main__":
+    recommendations = content_based_recommendations("Toy Story (1995)")
+    print(recommendations)
@@ -1,83 +1,270 @@
+import json
+import os
+
 import numpy as np
-import pandas as pd
-import tensorflow as tf
-from tensorflow import keras
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-
-# Load the movie dataset (movie_data.csv) and user ratings dataset (user_ratings.csv)
-movie_data = pd.read_csv('C:\ProjectRecommendationSystems\MoviePlatform\data/movie_data.csv')
-user_ratings = pd.read_csv('C:\ProjectRecommendationSystems\MoviePlatform\data/user_ratings.csv')
-
-# Preprocess the data
-user_encoder = LabelEncoder()
-movie_encoder = LabelEncoder()
-
-user_ids = user_encoder.fit_transform(user_ratings['userId'])
-movie_ids = movie_encoder.fit_transform(user_ratings['movieId'])
-ratings = user_ratings['rating'].values
-
-num_users = len(user_encoder.classes_)
-num_movies = len(movie_encoder.classes_)
-
-# Split the data into training and testing sets
-X_train_user, X_test_user, X_train_movie, X_test_movie, y_train, y_test = train_test_split(
-    user_ids, movie_ids, user_ids, test_size=0.2, random_state=42
-)
-
-# Define the embedding size for users and movies
-embedding_size = 32
-
-# Create the neural collaborative filtering model (NeuMF)
-user_input = keras.layers.Input(shape=(1,))
-movie_input = keras.layers.Input(shape=(1,))
-
-user_embedding_mlp = keras.layers.Embedding(
-    num_users, embedding_size, input_length=1, name="user_embedding_mlp"
-)(user_input)
-movie_embedding_mlp = keras.layers.Embedding(
-    num_movies, embedding_size, input_length=1, name="movie_embedding_mlp"
-)(movie_input)
-
-user_embedding_mf = keras.layers.Embedding(
-    num_users, embedding_size, input_length=1, name="user_embedding_mf"
-)(user_input)
-movie_embedding_mf = keras.layers.Embedding(
-    num_movies, embedding_size, input_length=1, name="movie_embedding_mf"
-)(movie_input)
-
-mlp_vector = keras.layers.concatenate([user_embedding_mlp, movie_embedding_mlp])
-mf_vector = keras.layers.multiply([user_embedding_mf, movie_embedding_mf])
-
-mlp_vector = keras.layers.Flatten()(mlp_vector)
-mf_vector = keras.layers.Flatten()(mf_vector)
-
-concat_vector = keras.layers.concatenate([mlp_vector, mf_vector])
-output = keras.layers.Dense(1, activation="relu")(concat_vector)
-
-model = keras.models.Model(inputs=[user_input, movie_input], outputs=output)
-model.compile(optimizer="adam", loss="mean_squared_error")
-
-# Train the model
-model.fit(
-    x=[X_train_user, X_train_movie],  # Use the correct variables
-    y=y_train,
-    batch_size=64,
-    epochs=10,
-    validation_data=([X_test_user, X_test_movie], y_test),  # Use the correct variables
-)
-
-# Make recommendations using the trained model
-user_id = 1  # Replace with the desired user ID
-user_indices = np.full(num_movies, user_id)
-
-movie_scores = model.predict([user_indices, np.arange(num_movies)])
-top_movie_indices = np.argsort(movie_scores.flatten())[::-1]
-
-# Get the top N recommended movies
-top_n = 10
-top_movie_ids = movie_encoder.inverse_transform(top_movie_indices[:top_n])
-
-# Print the top recommended movies
-recommended_movies = movie_data[movie_data['movieId'].isin(top_movie_ids)]['title']
-print(recommended_movies)
+
+from utils.data_preprocessing import load_movie_data
+from utils.id_encoder import IdEncoder
+from utils.instrumentation import timed
+from utils.input_pipeline import make_ratings_dataset
+from utils.ranking import top_n as select_top_n
+from utils.rated_items import RatedItemsIndex
+from utils.ratings_store import RatingsStore
+from utils.topn_table import build_top_n_table
+
+def build_neumf_model(num_users, num_movies, embedding_size=32):
+    """
+    Creates the neural collaborative filtering model (NeuMF).
+
+    Args:
+        num_users: number of encoded users
+        num_movies: number of encoded movies
+        embedding_size: size of every embedding
+
+    Returns:
+        compiled keras Model taking [user_indices, movie_indices]
+    """
+    from tensorflow import keras
+
+    user_input = keras.layers.Input(shape=(1,))
+    movie_input = keras.layers.Input(shape=(1,))
+
+    user_embedding_mlp = keras.layers.Embedding(num_users, embedding_size, name="user_embedding_mlp")(user_input)
+    movie_embedding_mlp = keras.layers.Embedding(num_movies, embedding_size, name="movie_embedding_mlp")(movie_input)
+
+    user_embedding_mf = keras.layers.Embedding(num_users, embedding_size, name="user_embedding_mf")(user_input)
+    movie_embedding_mf = keras.layers.Embedding(num_movies, embedding_size, name="movie_embedding_mf")(movie_input)
+
+    mlp_vector = keras.layers.concatenate([user_embedding_mlp, movie_embedding_mlp])
+    mf_vector = keras.layers.multiply([user_embedding_mf, movie_embedding_mf])
+
+    mlp_vector = keras.layers.Flatten()(mlp_vector)
+    mf_vector = keras.layers.Flatten()(mf_vector)
+
+    concat_vector = keras.layers.concatenate([mlp_vector, mf_vector])
+    output = keras.layers.Dense(1, activation="relu", name="prediction")(concat_vector)
+
+    model = keras.models.Model(inputs=[user_input, movie_input], outputs=output)
+    model.compile(optimizer="adam", loss="mean_squared_error")
+    return model
+
+class NeuMFScorer:
+    """
+    NumPy scorer for the NeuMF graph of build_neumf_model().
+
+    The output layer is relu(w . [u_mlp, m_mlp, u_mf * m_mf] + b), which
+    splits into a per-user term, a per-movie term and a dot product of the
+    MF embeddings with the MF part of w folded into the user side. Those are
+    precomputed once, so scoring a users x movies tile is one matrix product
+    instead of building and evaluating the graph for every pair.
+    """
+
+    def __init__(self, user_mlp, movie_mlp, user_mf, movie_mf, kernel, bias):
+        embedding_size = user_mlp.shape[1]
+        kernel = np.asarray(kernel, dtype=np.float32).reshape(-1)
+        w_user = kernel[:embedding_size]
+        w_movie = kernel[embedding_size:2 * embedding_size]
+        w_mf = kernel[2 * embedding_size:]
+        self.user_term = (np.asarray(user_mlp, dtype=np.float32) @ w_user + np.float32(np.ravel(bias)[0]))
+        self.movie_term = np.asarray(movie_mlp, dtype=np.float32) @ w_movie
+        self.user_mf = np.asarray(user_mf, dtype=np.float32) * w_mf
+        self.movie_mf = np.ascontiguousarray(movie_mf, dtype=np.float32)
+
+    @classmethod
+    def from_keras(cls, model):
+        # Weights of the named layers created by build_neumf_model()
+        def weights(name):
+            return model.get_layer(name).get_weights()
+        kernel, bias = weights("prediction")
+        return cls(weights("user_embedding_mlp")[0], weights("movie_embedding_mlp")[0],
+                   weights("user_embedding_mf")[0], weights("movie_embedding_mf")[0], kernel, bias)
+
+    def score(self, user_codes, movie_codes=None):
+        """
+        Predicted ratings of every (user, movie) pair.
+
+        Args:
+            user_codes: encoded users (rows)
+            movie_codes: encoded movies (columns), all movies when None
+
+        Returns:
+            float32 array of shape (len(user_codes), len(movie_codes))
+        """
+        movie_mf, movie_term = self.movie_mf, self.movie_term
+        if movie_codes is not None:
+            movie_mf, movie_term = movie_mf[movie_codes], movie_term[movie_codes]
+        scores = self.user_mf[user_codes] @ movie_mf.T
+        scores += self.user_term[user_codes][:, None]
+        scores += movie_term
+        return np.maximum(scores, 0, out=scores)
+
+class DeepLearningModel:
+    """
+    NeuMF recommender with an explicit build/save/load lifecycle.
+
+    TensorFlow and scikit-learn are only imported by build() and load(), so
+    importing this module is cheap. build(stream=True) streams the ratings
+    from disk with tf.data instead of holding them in memory. Users and
+    movies are encoded with the IdEncoders of the ratings store (or the ones
+    passed to build()), so the embedding rows share the id space of the
+    other models.
+    """
+
+    def __init__(self, embedding_size=32, epochs=10, batch_size=64):
+        self.embedding_size = embedding_size
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.model = None
+        self.user_encoder = None
+        self.movie_encoder = None
+        self.rated_index = None
+        self._scorer = None
+
+    @timed('train.neumf')
+    def build(self, user_ratings=None, user_encoder=None, movie_encoder=None, stream=False):
+        """
+        Trains the model.
+
+        The ratings (`user_ratings`, or the whole ratings store) are encoded
+        and fed to fit() as in-memory arrays. With `stream=True` and no
+        dataframe they are streamed from the CSV through utils.input_pipeline
+        instead (bounded memory, parallel parsing, prefetch), with the
+        encoders of the ratings store.
+        """
+        if user_ratings is None and stream:
+            store = RatingsStore.open()
+            self.user_encoder, self.movie_encoder = store.user_encoder(), store.movie_encoder()
+            train = make_ratings_dataset(self.user_encoder, self.movie_encoder, batch_size=self.batch_size)
+            validation = make_ratings_dataset(self.user_encoder, self.movie_encoder, batch_size=self.batch_size,
+                                              subset='validation')
+            self.model = build_neumf_model(len(self.user_encoder), len(self.movie_encoder), self.embedding_size)
+            self._scorer = None
+            self.model.fit(train, epochs=self.epochs, validation_data=validation)
+
+            # Index of the movies every user has already rated
+            self.rated_index = RatedItemsIndex.from_pairs(self.user_encoder.inverse_transform(store.user_code),
+                                                          self.movie_encoder.inverse_transform(store.movie_code))
+            return self
+
+        from sklearn.model_selection import train_test_split
+
+        if user_ratings is None:
+            store = RatingsStore.open()
+            user_ratings = store.to_frame()
+            user_encoder = user_encoder if user_encoder is not None else store.user_encoder()
+            movie_encoder = movie_encoder if movie_encoder is not None else store.movie_encoder()
+
+        # Preprocess the data
+        self.user_encoder = user_encoder if user_encoder is not None else IdEncoder()
+        self.movie_encoder = movie_encoder if movie_encoder is not None else IdEncoder()
+        user_ids = self.user_encoder.partial_fit(user_ratings['userId'].values)
+        movie_ids = self.movie_encoder.partial_fit(user_ratings['movieId'].values)
+        ratings = user_ratings['rating'].values
+
+        # Split the data into training and testing sets
+        X_train_user, X_test_user, X_train_movie, X_test_movie, y_train, y_test = train_test_split(
+            user_ids, movie_ids, ratings, test_size=0.2, random_state=42
+        )
+
+        # Train the model
+        self.model = build_neumf_model(len(self.user_encoder), len(self.movie_encoder), self.embedding_size)
+        self._scorer = None
+        self.model.fit(
+            x=[X_train_user, X_train_movie],
+            y=y_train,
+            batch_size=self.batch_size,
+            epochs=self.epochs,
+            validation_data=([X_test_user, X_test_movie], y_test),
+        )
+
+        # Index of the movies every user has already rated
+        self.rated_index = RatedItemsIndex.from_ratings(user_ratings)
+        return self
+
+    def save(self, path):
+        from models.numpy_inference import export_weights
+
+        os.makedirs(path, exist_ok=True)
+        self.model.save_weights(os.path.join(path, 'neumf.weights.h5'))
+        # Plain arrays for models.numpy_inference.NumpyNeuMFModel, which serves without TensorFlow
+        export_weights(self.model, os.path.join(path, 'numpy'))
+        self.user_encoder.save(os.path.join(path, 'user_encoder.npy'))
+        self.movie_encoder.save(os.path.join(path, 'movie_encoder.npy'))
+        self.rated_index.compact()
+        np.save(os.path.join(path, 'rated_user_ids.npy'), self.rated_index.user_ids)
+        np.save(os.path.join(path, 'rated_indptr.npy'), self.rated_index.indptr)
+        np.save(os.path.join(path, 'rated_indices.npy'), self.rated_index.indices)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'embedding_size': self.embedding_size}, f)
+
+    def load(self, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.embedding_size = json.load(f)['embedding_size']
+        self.user_encoder = IdEncoder.load(os.path.join(path, 'user_encoder.npy'))
+        self.movie_encoder = IdEncoder.load(os.path.join(path, 'movie_encoder.npy'))
+        self.rated_index = RatedItemsIndex(
+            np.load(os.path.join(path, 'rated_user_ids.npy'), mmap_mode='r'),
+            np.load(os.path.join(path, 'rated_indptr.npy'), mmap_mode='r'),
+            np.load(os.path.join(path, 'rated_indices.npy'), mmap_mode='r'),
+        )
+        self.model = build_neumf_model(len(self.user_encoder), len(self.movie_encoder), self.embedding_size)
+        self.model.load_weights(os.path.join(path, 'neumf.weights.h5'))
+        self._scorer = None
+        return self
+
+    def scorer(self):
+        # NumPy fast path over the current weights, rebuilt after build()/load()
+        if self._scorer is None:
+            self._scorer = NeuMFScorer.from_keras(self.model)
+        return self._scorer
+
+    def _predict_pairs(self, user_codes, movie_codes):
+        # Reference path: evaluate the Keras graph on every (user, movie) pair
+        users = np.repeat(user_codes, len(movie_codes))
+        movies = np.tile(movie_codes, len(user_codes))
+        scores = self.model.predict([users, movies], batch_size=max(self.batch_size, 8192), verbose=0)
+        return scores.reshape(len(user_codes), len(movie_codes))
+
+    def export_top_n(self, path, top_n=10, memory_budget_mb=256, fast=True):
+        """
+        Batch-scores all users x all movies and writes a TopNTable to `path`.
+
+        Args:
+            path: output directory
+            top_n: recommendations kept per user
+            memory_budget_mb: approximate memory of one score tile
+            fast: score with NeuMFScorer instead of model.predict
+
+        Returns:
+            TopNTable
+        """
+        score = self.scorer().score if fast else self._predict_pairs
+        return build_top_n_table(path, score, self.user_encoder, self.movie_encoder, top_n,
+                                 self.rated_index, memory_budget_mb)
+
+    def recommend(self, user_id, top_n=10):
+        # Make recommendations using the trained model
+        if user_id not in self.user_encoder:
+            raise ValueError(f"Unknown user id {user_id}")
+
+        movie_scores = self.scorer().score([self.user_encoder[user_id]])[0]
+        movie_scores[self.rated_index.mask([user_id], self.movie_encoder.classes_)[0]] = -np.inf
+        top_movie_indices, _ = select_top_n(movie_scores, top_n)
+
+        # Get the top N recommended movie ids
+        return self.movie_encoder.inverse_transform(top_movie_indices[top_movie_indices >= 0]).tolist()
+
+    # Name used by utils.user_interface.UserInterface
+    get_recommendations = recommend
+
+# Example usage: train the model and print recommendations for one user
+if __name__ == "__main__":
+    movie_data = load_movie_data()
+    dl_model = DeepLearningModel().build()
+
+    user_id = 1  # Replace with the desired user ID
+    top_movie_ids = dl_model.recommend(user_id, top_n=10)
+
+    # Print the top recommended movies
+    recommended_movies = movie_data[movie_data['movieId'].isin(top_movie_ids)]['title']
+    print(recommended_movies)
@@ -0,0 +1,306 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import config
+from utils.instrumentation import VERBOSE, stage, timed
+from utils.ranking import top_n as select_top_n
+
+class CollaborativeSource:
+    """
+    Candidates and scores from the SVD factors of a CollaborativeFilteringModel.
+    """
+
+    name = 'collaborative_filtering'
+
+    def __init__(self, model):
+        self.model = model
+
+    def candidates(self, user_id, m):
+        movie_ids, scores = self.model.scorer.recommend([user_id], m, self.model.rated_index)
+        keep = movie_ids[0] >= 0
+        return movie_ids[0][keep], scores[0][keep]
+
+    def score(self, user_id, movie_ids):
+        return self.model.scorer.predict([user_id] * len(movie_ids), movie_ids)
+
+class ContentSource:
+    """
+    Candidates from the content similarity store, seeded by a user's favourites.
+
+    A user's `n_seeds` highest rated movies (rated >= `min_rating`, most
+    recent first among equal ratings) vote for their stored neighbours; a
+    candidate scores the sum of similarity x seed rating over the seeds that
+    list it. Movies outside every seed's neighbour list score 0.
+    """
+
+    name = 'content_based'
+
+    def __init__(self, model, user_ratings, n_seeds=20, min_rating=config.COLLABORATIVE_FILTERING_THRESHOLD):
+        self.model = model
+        self.movie_ids = model.movie_data['movieId'].values
+        self.positions = pd.Index(self.movie_ids)
+
+        # Seed positions and weights of every user, grouped like a CSR matrix
+        liked = user_ratings[user_ratings['rating'] >= min_rating]
+        liked = liked.assign(position=self.positions.get_indexer(liked['movieId'].values))
+        liked = liked[liked['position'] >= 0]
+        sort_columns = ['userId', 'rating'] + (['timestamp'] if 'timestamp' in liked else [])
+        liked = liked.sort_values(sort_columns, ascending=[True] + [False] * (len(sort_columns) - 1), kind='stable')
+        liked = liked.groupby('userId', sort=False).head(n_seeds)
+        self.user_ids, starts = np.unique(liked['userId'].values, return_index=True)
+        self.indptr = np.append(starts, len(liked))
+        self.seed_positions = liked['position'].values
+        self.seed_weights = liked['rating'].values.astype(np.float32)
+
+    def _votes(self, user_id):
+        # Aggregated neighbour scores over the whole catalog (zeros for users without seeds)
+        votes = np.zeros(len(self.movie_ids), dtype=np.float32)
+        row = np.searchsorted(self.user_ids, user_id)
+        if row < len(self.user_ids) and self.user_ids[row] == user_id:
+            seeds = self.seed_positions[self.indptr[row]:self.indptr[row + 1]]
+            weights = self.seed_weights[self.indptr[row]:self.indptr[row + 1]]
+            store = self.model.similarity_store
+            np.add.at(votes, np.asarray(store.neighbours[seeds]).ravel(),
+                      (np.asarray(store.scores[seeds]) * weights[:, None]).ravel())
+            votes[seeds] = 0
+        return votes
+
+    def candidates(self, user_id, m):
+        votes = self._votes(user_id)
+        votes[votes <= 0] = -np.inf
+        positions, scores = select_top_n(votes, m)
+        keep = positions >= 0
+        return self.movie_ids[positions[keep]], scores[keep]
+
+    def score(self, user_id, movie_ids):
+        positions = self.positions.get_indexer(movie_ids)
+        return np.where(positions >= 0, self._votes(user_id)[np.maximum(positions, 0)], 0.0)
+
+class NeuMFSource:
+    """
+    Candidates and scores from a trained DeepLearningModel (NumPy scorer).
+    """
+
+    name = 'deep_learning'
+
+    def __init__(self, model):
+        self.model = model
+        self.scorer = model.scorer()
+
+    def candidates(self, user_id, m):
+        encoder = self.model.user_encoder
+        if user_id not in encoder:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self.scorer.score([encoder[user_id]])[0]
+        scores[self.model.rated_index.mask([user_id], self.model.movie_encoder.classes_)[0]] = -np.inf
+        positions, top_scores = select_top_n(scores, m)
+        keep = positions >= 0
+        return self.model.movie_encoder.inverse_transform(positions[keep]), top_scores[keep]
+
+    def score(self, user_id, movie_ids):
+        movie_codes = self.model.movie_encoder.transform(movie_ids)
+        scores = np.full(len(movie_codes), np.nan)
+        if user_id in self.model.user_encoder:
+            known = movie_codes >= 0
+            scores[known] = self.scorer.score([self.model.user_encoder[user_id]], movie_codes[known])[0]
+        return scores
+
+def load_weights(path=config.HYBRID_WEIGHTS_PATH):
+    # Blend weights written by tune_weights()/learn_weights(), else the config defaults
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return dict(config.HYBRID_WEIGHTS)
+
+def save_weights(weights, path=config.HYBRID_WEIGHTS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(weights, f, indent=2)
+
+class HybridRecommender:
+    """
+    Fuses the candidates of several recommenders in one ranking pass.
+
+    Every source proposes its top `candidates` movies for the user; the
+    sources run concurrently in a thread pool (their scoring is NumPy, which
+    releases the GIL), so latency follows the slowest source, not the sum.
+    The deduplicated union minus already rated movies is then re-scored by
+    every source, again concurrently. Each source's scores are standardised
+    over the union (missing scores count as the source's mean) and blended
+    as one (sources x candidates) matrix product with the weights.
+    """
+
+    def __init__(self, sources, weights=None, candidates=config.HYBRID_CANDIDATES, rated_index=None):
+        """
+        Args:
+            sources: CollaborativeSource / ContentSource / NeuMFSource instances
+                (anything with a name, candidates(user_id, m) and score(user_id, movie_ids))
+            weights: source name -> blend weight (default: load_weights())
+            candidates: candidates pulled from every source
+            rated_index: RatedItemsIndex of movies to exclude
+        """
+        self.sources = list(sources)
+        if not self.sources:
+            raise ValueError("HybridRecommender needs at least one source")
+        self.weights = dict(weights) if weights is not None else load_weights()
+        self.candidates = candidates
+        self.rated_index = rated_index
+        self._pool = ThreadPoolExecutor(max_workers=len(self.sources), thread_name_prefix='hybrid')
+
+    def _map(self, method, *args):
+        # Run one method of every source concurrently, timing each source as its own stage
+        def call(source):
+            with stage(f'recommend.hybrid.{method}.{source.name}', VERBOSE):
+                return getattr(source, method)(*args)
+        return list(self._pool.map(call, self.sources))
+
+    def features(self, user_id):
+        """
+        Candidate union of one user and the standardised score of every source.
+
+        Returns:
+            movie_ids: array of candidate movie ids
+            features: (len(sources), len(movie_ids)) float array
+        """
+        proposals = self._map('candidates', user_id, self.candidates)
+        movie_ids = np.unique(np.concatenate([ids for ids, _ in proposals] + [np.empty(0, dtype=np.int64)]))
+        if self.rated_index is not None and len(movie_ids):
+            movie_ids = movie_ids[~self.rated_index.mask([user_id], movie_ids)[0]]
+        if not len(movie_ids):
+            return movie_ids, np.zeros((len(self.sources), 0))
+
+        features = np.array(self._map('score', user_id, movie_ids), dtype=np.float64)
+        with stage('recommend.hybrid.normalize', VERBOSE):
+            present = ~np.isnan(features)
+            counts = np.maximum(present.sum(axis=1, keepdims=True), 1)
+            filled = np.where(present, features, 0)
+            mean = filled.sum(axis=1, keepdims=True) / counts
+            std = np.sqrt((((filled - mean) * present) ** 2).sum(axis=1, keepdims=True) / counts)
+            features = np.where(present, (filled - mean) / np.where(std > 0, std, 1), 0)
+        return movie_ids, features
+
+    def weight_vector(self, weights=None):
+        weights = self.weights if weights is None else weights
+        return np.array([weights.get(source.name, 0.0) for source in self.sources])
+
+    @timed('recommend.hybrid')
+    def recommend(self, user_id, top_n=10):
+        # Top N movie ids of the blended ranking
+        movie_ids, features = self.features(user_id)
+        blended = self.weight_vector() @ features
+        positions, _ = select_top_n(blended, top_n)
+        return movie_ids[positions[positions >= 0]].tolist()
+
+    # Name used by utils.user_interface.UserInterface
+    get_recommendations = recommend
+
+def _holdout_features(hybrid, holdout, threshold):
+    # Features and relevance labels of every holdout user with at least one relevant movie
+    relevant = holdout[holdout['rating'] >= threshold].groupby('userId')['movieId'].apply(np.asarray)
+    users = []
+    for user_id, movies in relevant.items():
+        movie_ids, features = hybrid.features(user_id)
+        if len(movie_ids):
+            users.append((features, np.isin(movie_ids, movies), len(movies)))
+    return users
+
+def _ndcg(users, weight_matrix, top_n):
+    # Mean NDCG@top_n of every row of weight_matrix (weights x sources) over the users
+    discounts = 1 / np.log2(np.arange(2, top_n + 2))
+    totals = np.zeros(len(weight_matrix))
+    for features, labels, n_relevant in users:
+        blended = weight_matrix @ features
+        positions, _ = select_top_n(blended, top_n)
+        gains = np.where(positions >= 0, labels[np.maximum(positions, 0)], False)
+        ideal = discounts[:min(n_relevant, top_n)].sum()
+        totals += (gains * discounts[:positions.shape[1]]).sum(axis=1) / ideal
+    return totals / max(len(users), 1)
+
+def tune_weights(hybrid, holdout, top_n=10, step=0.1, threshold=config.COLLABORATIVE_FILTERING_THRESHOLD):
+    """
+    Grid-searches the blend weights on held-out ratings.
+
+    Every weight vector on the simplex with the given step is evaluated at
+    once: the features of each user are computed a single time and each
+    candidate weighting is one row of a matrix product.
+
+    Args:
+        hybrid: HybridRecommender whose sources were trained without `holdout`
+        holdout: held-out ratings dataframe; movies rated >= threshold are relevant
+        top_n: ranking cut-off of the NDCG objective
+        step: grid resolution
+
+    Returns:
+        best weights (dict) and its NDCG@top_n
+    """
+    n_sources = len(hybrid.sources)
+    ticks = np.round(np.arange(0, 1 + step / 2, step), 6)
+    grid = np.array(np.meshgrid(*[ticks] * n_sources)).reshape(n_sources, -1).T
+    grid = grid[np.isclose(grid.sum(axis=1), 1)]
+    ndcg = _ndcg(_holdout_features(hybrid, holdout, threshold), grid, top_n)
+    best = grid[np.argmax(ndcg)]
+    return {source.name: float(weight) for source, weight in zip(hybrid.sources, best)}, float(ndcg.max())
+
+def learn_weights(hybrid, holdout, threshold=config.COLLABORATIVE_FILTERING_THRESHOLD):
+    """
+    Fits the blend weights with a logistic regression on held-out ratings.
+
+    Each candidate of each holdout user is one example (its source features)
+    labelled by whether the user rated it >= threshold. The coefficients are
+    the weights: ranking by the linear score is ranking by the probability.
+
+    Returns:
+        weights dict
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    users = _holdout_features(hybrid, holdout, threshold)
+    X = np.hstack([features for features, _, _ in users]).T
+    y = np.concatenate([labels for _, labels, _ in users])
+    classifier = LogisticRegression(class_weight='balanced', max_iter=1000).fit(X, y)
+    return {source.name: float(weight) for source, weight in zip(hybrid.sources, classifier.coef_[0])}
+
+# Example usage: tune the blend on a held-out split and compare it with every single source
+if __name__ == "__main__":
+    import argparse
+
+    from models.collaborative_filtering import CollaborativeFilteringModel
+    from models.content_based import ContentBasedModel
+    from utils.evaluation import cached_split
+    from utils.ratings_store import RatingsStore
+
+    parser = argparse.ArgumentParser(description="Tune the hybrid blend weights offline")
+    parser.add_argument('--split', default='leave_last_out')
+    parser.add_argument('--method', choices=('grid', 'learned'), default='grid')
+    parser.add_argument('--save', action='store_true', help=f"write the weights to {config.HYBRID_WEIGHTS_PATH}")
+    args = parser.parse_args()
+
+    store = RatingsStore.open()
+    frame = store.to_frame()
+    train_path, test_path = cached_split(store, args.split)
+    train, holdout = frame.iloc[np.load(train_path)], frame.iloc[np.load(test_path)]
+
+    cf_model = CollaborativeFilteringModel().build(train)
+    sources = [CollaborativeSource(cf_model), ContentSource(ContentBasedModel().build(), train)]
+    try:
+        from models.deep_learning import DeepLearningModel
+        sources.append(NeuMFSource(DeepLearningModel(epochs=3).build(train)))
+    except ImportError as error:
+        print(f"Skipping the deep learning source: {error}")
+    hybrid = HybridRecommender(sources, rated_index=cf_model.rated_index)
+
+    users = _holdout_features(hybrid, holdout, config.COLLABORATIVE_FILTERING_THRESHOLD)
+    for i, source in enumerate(sources):
+        print(f"{source.name:<25} NDCG@10 {_ndcg(users, np.eye(len(sources))[i:i + 1], 10)[0]:.4f}")
+    if args.method == 'grid':
+        weights, score = tune_weights(hybrid, holdout)
+    else:
+        weights = learn_weights(hybrid, holdout)
+        score = _ndcg(users, hybrid.weight_vector(weights)[None], 10)[0]
+    print(f"{'hybrid ' + str(weights):<25} NDCG@10 {score:.4f}")
+    if args.save:
+        save_weights(weights)
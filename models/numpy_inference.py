@@ -0,0 +1,268 @@
+import json
+import os
+
+import numpy as np
+
+from models.deep_learning import NeuMFScorer
+from utils.id_encoder import IdEncoder
+from utils.ranking import top_n as select_top_n
+from utils.rated_items import RatedItemsIndex
+
+# Arrays of an exported NeuMF model (build_neumf_model) and of a CFModel (CF_model.py)
+NEUMF_ARRAYS = ('user_mlp', 'movie_mlp', 'user_mf', 'movie_mf', 'kernel', 'bias')
+CF_ARRAYS = ('user_factors', 'item_factors')
+
+def keras_layer_weights(model):
+    """
+    Weights of every layer of a Keras model, nested models included.
+
+    Returns:
+        dict layer name -> list of numpy arrays, in layer order
+    """
+    weights = {}
+    for layer in model.layers:
+        if hasattr(layer, 'layers'):
+            weights.update(keras_layer_weights(layer))
+        elif layer.get_weights():
+            weights[layer.name] = [np.asarray(array) for array in layer.get_weights()]
+    return weights
+
+def hdf5_layer_weights(path):
+    """
+    Reads the layer weights of a Keras HDF5 file with h5py, without TensorFlow.
+
+    Both the Keras 2 layout (model.save / save_weights: one group per layer
+    listed in the `layer_names` attribute, variables in `weight_names`) and
+    the Keras 3 `.weights.h5` layout (`layers/<name>/vars/<i>`) are read.
+
+    Returns:
+        dict layer name -> list of numpy arrays, in layer order
+    """
+    import h5py
+
+    if not h5py.is_hdf5(path):
+        raise ValueError(f"{path} is not an HDF5 weights file")
+    weights = {}
+    with h5py.File(path, 'r') as f:
+        if 'layer_names' not in f.attrs and 'model_weights' not in f:
+            def visit(name, group):
+                if isinstance(group, h5py.Group) and len(group.get('vars', ())):
+                    variables = group['vars']
+                    weights[name.split('/')[-1]] = [np.asarray(variables[str(i)]) for i in range(len(variables))]
+            f.visititems(visit)
+            return weights
+        group = f['model_weights'] if 'model_weights' in f else f
+        for layer in group.attrs['layer_names']:
+            layer = layer.decode() if isinstance(layer, bytes) else layer
+            names = [name.decode() if isinstance(name, bytes) else name
+                     for name in group[layer].attrs.get('weight_names', [])]
+            if names:
+                weights[layer] = [np.asarray(group[layer][name]) for name in names]
+    return weights
+
+def neumf_arrays(weights):
+    # Named layers of build_neumf_model() -> NEUMF_ARRAYS
+    kernel, bias = weights['prediction']
+    return dict(zip(NEUMF_ARRAYS, (weights['user_embedding_mlp'][0], weights['movie_embedding_mlp'][0],
+                                   weights['user_embedding_mf'][0], weights['movie_embedding_mf'][0], kernel, bias)))
+
+def cf_arrays(weights):
+    # The two embeddings of a CFModel, users first (the order the layers are created in)
+    embeddings = [arrays[0] for arrays in weights.values() if len(arrays) == 1 and arrays[0].ndim == 2]
+    if len(embeddings) != 2:
+        raise ValueError(f"Expected the 2 embeddings of a CFModel, found {len(embeddings)}")
+    return dict(zip(CF_ARRAYS, embeddings))
+
+def export_weights(source, path):
+    """
+    Writes the weights of a NeuMF model or a CFModel as .npy arrays plus meta.json.
+
+    Args:
+        source: a Keras model, or the path of a Keras HDF5 weights file
+        path: output directory
+
+    Returns:
+        'neumf' or 'cf', the kind of model exported
+    """
+    weights = hdf5_layer_weights(source) if isinstance(source, (str, os.PathLike)) else keras_layer_weights(source)
+    kind = 'neumf' if 'prediction' in weights else 'cf'
+    save_arrays(neumf_arrays(weights) if kind == 'neumf' else cf_arrays(weights), path, kind)
+    return kind
+
+def save_arrays(arrays, path, kind):
+    # NEUMF_ARRAYS or CF_ARRAYS as float32 .npy files, in the layout load_inference() reads
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(array, dtype=np.float32))
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'kind': kind}, f)
+
+class NumpyNeuMF:
+    """
+    Forward pass of build_neumf_model() in NumPy.
+
+    predict() evaluates the graph as Keras does for a batch of (user, movie)
+    pairs: relu([u_mlp, m_mlp, u_mf * m_mf] . kernel + bias) in float32.
+    score() covers the full catalog through NeuMFScorer, which folds the same
+    output layer into one matrix product per users x movies tile.
+    """
+
+    def __init__(self, user_mlp, movie_mlp, user_mf, movie_mf, kernel, bias):
+        self.user_mlp, self.movie_mlp = user_mlp, movie_mlp
+        self.user_mf, self.movie_mf = user_mf, movie_mf
+        self.kernel = np.asarray(kernel, dtype=np.float32).reshape(-1)
+        self.bias = np.float32(np.ravel(bias)[0])
+        self._scorer = None
+
+    def predict(self, user_codes, movie_codes, batch_size=65536):
+        """
+        Predicted ratings of (user_codes[i], movie_codes[i]) pairs.
+
+        Returns:
+            float32 array of len(user_codes)
+        """
+        user_codes, movie_codes = np.asarray(user_codes), np.asarray(movie_codes)
+        size = self.user_mlp.shape[1]
+        w_user, w_movie, w_mf = self.kernel[:size], self.kernel[size:2 * size], self.kernel[2 * size:]
+        scores = np.empty(len(user_codes), dtype=np.float32)
+        for start in range(0, len(user_codes), batch_size):
+            users, movies = user_codes[start:start + batch_size], movie_codes[start:start + batch_size]
+            # The kernel applied to each part of the concatenation separately: no (batch, 3 x size) copy
+            out = self.user_mlp[users] @ w_user
+            out += self.movie_mlp[movies] @ w_movie
+            out += (self.user_mf[users] * self.movie_mf[movies]) @ w_mf
+            out += self.bias
+            scores[start:start + batch_size] = np.maximum(out, 0)
+        return scores
+
+    def scorer(self):
+        if self._scorer is None:
+            self._scorer = NeuMFScorer(self.user_mlp, self.movie_mlp, self.user_mf, self.movie_mf, self.kernel,
+                                       [self.bias])
+        return self._scorer
+
+    def score(self, user_codes, movie_codes=None):
+        # Users x movies score matrix (all movies when movie_codes is None)
+        return self.scorer().score(user_codes, movie_codes)
+
+def to_keras(inference):
+    # build_neumf_model() graph holding the weights of a NumpyNeuMF (for parity checks; needs TensorFlow)
+    from models.deep_learning import build_neumf_model
+
+    model = build_neumf_model(len(inference.user_mlp), len(inference.movie_mlp), inference.user_mlp.shape[1])
+    for layer, weights in (('user_embedding_mlp', inference.user_mlp), ('movie_embedding_mlp', inference.movie_mlp),
+                           ('user_embedding_mf', inference.user_mf), ('movie_embedding_mf', inference.movie_mf)):
+        model.get_layer(layer).set_weights([np.asarray(weights)])
+    model.get_layer('prediction').set_weights([inference.kernel.reshape(-1, 1), np.array([inference.bias])])
+    return model
+
+class NumpyCF:
+    """
+    Forward pass of CF_model.CFModel in NumPy: the dot product of the user
+    and item embeddings.
+    """
+
+    def __init__(self, user_factors, item_factors):
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+
+    @classmethod
+    def from_keras(cls, model):
+        return cls(**cf_arrays(keras_layer_weights(model)))
+
+    def predict(self, user_codes, item_codes):
+        return np.einsum('ij,ij->i', self.user_factors[user_codes], self.item_factors[item_codes])
+
+    def rate(self, user_id, item_id):
+        # Same as CFModel.rate, without a Keras predict call
+        return float(self.predict([user_id], [item_id])[0])
+
+    def score(self, user_codes, item_codes=None):
+        items = self.item_factors if item_codes is None else self.item_factors[item_codes]
+        return self.user_factors[user_codes] @ items.T
+
+def load_inference(path, mmap_mode='r'):
+    """
+    Loads a directory written by export_weights(), memory-mapping the arrays.
+
+    Returns:
+        NumpyNeuMF or NumpyCF
+    """
+    with open(os.path.join(path, 'meta.json')) as f:
+        kind = json.load(f)['kind']
+    cls, names = (NumpyNeuMF, NEUMF_ARRAYS) if kind == 'neumf' else (NumpyCF, CF_ARRAYS)
+    return cls(*[np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in names])
+
+def check_parity(keras_model, inference, n_pairs=10000, seed=0):
+    """
+    Largest absolute difference between Keras predict and the NumPy forward pass.
+
+    Random (user, item) pairs are scored by both; for NeuMF the full-catalog
+    score() of the first users is compared against predict() as well.
+    """
+    rng = np.random.default_rng(seed)
+    n_users, n_items = (len(inference.user_mlp), len(inference.movie_mlp)) if isinstance(inference, NumpyNeuMF) \
+        else (len(inference.user_factors), len(inference.item_factors))
+    users, items = rng.integers(0, n_users, n_pairs), rng.integers(0, n_items, n_pairs)
+    expected = keras_model.predict([users, items], batch_size=8192, verbose=0).reshape(-1)
+    difference = float(np.max(np.abs(inference.predict(users, items) - expected)))
+    if isinstance(inference, NumpyNeuMF):
+        codes = np.arange(min(10, n_users))
+        full = keras_model.predict([np.repeat(codes, n_items), np.tile(np.arange(n_items), len(codes))],
+                                   batch_size=8192, verbose=0).reshape(len(codes), n_items)
+        difference = max(difference, float(np.max(np.abs(inference.score(codes) - full))))
+    return difference
+
+class NumpyNeuMFModel:
+    """
+    TensorFlow-free counterpart of DeepLearningModel for serving.
+
+    load() reads a directory written by DeepLearningModel.save(): the NumPy
+    export in numpy/ (or, for older saves, the Keras weights file through
+    h5py), the id encoders and the rated-items index. It exposes the same
+    recommend() / scorer() / encoders, so it can stand in for the Keras
+    model in NeuMFSource, UserInterface or a registry ServingHandle.
+    """
+
+    def __init__(self):
+        self.inference = None
+        self.user_encoder = None
+        self.movie_encoder = None
+        self.rated_index = None
+
+    def load(self, path):
+        numpy_path = os.path.join(path, 'numpy')
+        if not os.path.isdir(numpy_path):
+            export_weights(os.path.join(path, 'neumf.weights.h5'), numpy_path)
+        self.inference = load_inference(numpy_path)
+        self.user_encoder = IdEncoder.load(os.path.join(path, 'user_encoder.npy'))
+        self.movie_encoder = IdEncoder.load(os.path.join(path, 'movie_encoder.npy'))
+        self.rated_index = RatedItemsIndex(
+            np.load(os.path.join(path, 'rated_user_ids.npy'), mmap_mode='r'),
+            np.load(os.path.join(path, 'rated_indptr.npy'), mmap_mode='r'),
+            np.load(os.path.join(path, 'rated_indices.npy'), mmap_mode='r'),
+        )
+        return self
+
+    def scorer(self):
+        return self.inference.scorer()
+
+    def recommend(self, user_id, top_n=10):
+        # Same ranking as DeepLearningModel.recommend
+        if user_id not in self.user_encoder:
+            raise ValueError(f"Unknown user id {user_id}")
+        movie_scores = self.scorer().score([self.user_encoder[user_id]])[0]
+        movie_scores[self.rated_index.mask([user_id], self.movie_encoder.classes_)[0]] = -np.inf
+        top_movie_indices, _ = select_top_n(movie_scores, top_n)
+        return self.movie_encoder.inverse_transform(top_movie_indices[top_movie_indices >= 0]).tolist()
+
+    # Name used by utils.user_interface.UserInterface
+    get_recommendations = recommend
+
+# Example usage: export a saved DeepLearningModel directory's weights and score a few pairs
+if __name__ == "__main__":
+    import sys
+
+    model = NumpyNeuMFModel().load(sys.argv[1])
+    print(model.inference.predict([0, 0, 1], [0, 1, 2]))
+    print(model.recommend(model.user_encoder.classes_[0]))
@@ -0,0 +1,267 @@
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from models.collaborative_filtering import SVDScorer, train_collaborative_filtering_model
+from utils.instrumentation import metrics
+
+logger = logging.getLogger('movieplatform.online_svd')
+
+class OnlineSVD:
+    """
+    SVD factors that keep learning from new ratings between full retrains.
+
+    add_rating() applies a few SGD steps (the update rule of surprise's SVD)
+    to the factors and biases of the rating's user and movie only. Users and
+    movies the model has never seen are folded in instead: their factors
+    and bias are solved by ridge regression against the frozen factors of
+    the other side, and re-solved on every new rating until they have
+    `fold_in_ratings` of them. Every rating is also logged, so retrain()
+    (or the background scheduler) can refit the SVD on the base ratings plus
+    the log and swap the fresh factors in.
+
+    The factors live in an SVDScorer (`self.scorer`), so batch scoring and
+    recommend() see updates immediately.
+    """
+
+    def __init__(self, scorer, lr=0.005, reg=0.02, n_steps=3, fold_in_reg=5.0, fold_in_ratings=20,
+                 rated_index=None, base_ratings=None, svd_params=None):
+        """
+        Args:
+            scorer: SVDScorer with the factors of a fitted SVD
+            lr, reg: SGD learning rate and regularization (surprise defaults)
+            n_steps: SGD steps per new rating
+            fold_in_reg: ridge regularization when folding in new users/movies
+            fold_in_ratings: ratings after which a folded-in user/movie switches to SGD
+            rated_index: optional RatedItemsIndex kept up to date with new ratings
+            base_ratings: ratings dataframe the scorer was trained on (needed by retrain())
+            svd_params: surprise.SVD parameters used by retrain()
+        """
+        self.scorer = scorer
+        self.lr = lr
+        self.reg = reg
+        self.n_steps = n_steps
+        self.fold_in_reg = fold_in_reg
+        self.fold_in_ratings = fold_in_ratings
+        self.rated_index = rated_index
+        self.base_ratings = base_ratings
+        self.svd_params = dict(svd_params or {})
+        self.version = 0
+        self._log = []
+        self._user_history = {}
+        self._movie_history = {}
+        self._lock = threading.RLock()
+        self._retrain_thread = None
+        self._stop = threading.Event()
+        self._reset_capacity()
+
+    @classmethod
+    def build(cls, user_ratings, rated_index=None, **kwargs):
+        # Full fit on all ratings, then online updates on top of it
+        svd_params = kwargs.pop('svd_params', None) or {}
+        model = train_collaborative_filtering_model(user_ratings, test_size=None, **svd_params)
+        return cls(SVDScorer.from_model(model), rated_index=rated_index, base_ratings=user_ratings,
+                   svd_params=svd_params, **kwargs)
+
+    def _reset_capacity(self):
+        # Factor arrays grow by doubling, the scorer sees views of the used rows
+        scorer = self.scorer
+        self._n_users, self._n_movies = len(scorer.user_ids), len(scorer.movie_ids)
+        self._pu, self._bu, self._user_ids = scorer.pu.copy(), scorer.bu.copy(), scorer.user_ids.copy()
+        self._qi, self._bi, self._movie_ids = scorer.qi.copy(), scorer.bi.copy(), scorer.movie_ids.copy()
+        self._known_items = scorer.known_items.copy()
+        self._movie_rows = {movie_id: row for row, movie_id in enumerate(self._movie_ids.tolist())}
+        self._publish()
+
+    def _publish(self):
+        scorer = self.scorer
+        scorer.pu, scorer.bu = self._pu[:self._n_users], self._bu[:self._n_users]
+        scorer.user_ids = self._user_ids[:self._n_users]
+        scorer.qi, scorer.bi = self._qi[:self._n_movies], self._bi[:self._n_movies]
+        scorer.movie_ids = self._movie_ids[:self._n_movies]
+        scorer.known_items = self._known_items[:self._n_movies]
+
+    @staticmethod
+    def _grow(array, size):
+        if size <= len(array):
+            return array
+        grown = np.zeros((max(size, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _add_user(self, user_id):
+        row = self._n_users
+        self._pu = self._grow(self._pu, row + 1)
+        self._bu = self._grow(self._bu, row + 1)
+        self._user_ids = self._grow(self._user_ids, row + 1)
+        self._user_ids[row] = user_id
+        self._n_users += 1
+        self.scorer._user_inner[user_id] = row
+        self._user_history[user_id] = []
+        return row
+
+    def _add_movie(self, movie_id):
+        row = self._n_movies
+        self._qi = self._grow(self._qi, row + 1)
+        self._bi = self._grow(self._bi, row + 1)
+        self._movie_ids = self._grow(self._movie_ids, row + 1)
+        self._known_items = self._grow(self._known_items, row + 1)
+        self._movie_ids[row] = movie_id
+        self._known_items[row] = True
+        self._n_movies += 1
+        self._movie_rows[movie_id] = row
+        # New catalog entries are rare, rebuilding the position index is fine
+        self.scorer._movie_positions = pd.Index(self._movie_ids[:self._n_movies])
+        self._movie_history[movie_id] = []
+        return row
+
+    def _fold_in(self, other_factors, other_biases, offsets):
+        # Ridge solution of rating - mean - other bias ~ factors . other + bias
+        biased = self.scorer.biased
+        X = np.hstack([other_factors, np.ones((len(offsets), 1))]) if biased else other_factors
+        y = offsets - (other_biases if biased else 0.0)
+        A = X.T @ X + self.fold_in_reg * np.eye(X.shape[1])
+        w = np.linalg.solve(A, X.T @ y)
+        return (w[:-1], w[-1]) if biased else (w, 0.0)
+
+    def add_rating(self, user_id, movie_id, rating):
+        """
+        Updates the model with one new rating.
+
+        Args:
+            user_id: raw user id (new users are folded in)
+            movie_id: raw movie id (new movies are folded in)
+            rating: the rating value
+        """
+        with self._lock:
+            self._log.append((user_id, movie_id, float(rating)))
+            self._apply(user_id, movie_id, float(rating))
+            if self.rated_index is not None:
+                self.rated_index.add(user_id, movie_id)
+
+    def _apply(self, user_id, movie_id, rating):
+        scorer = self.scorer
+        u = scorer._user_inner.get(user_id)
+        if u is None:
+            u = self._add_user(user_id)
+        i = self._movie_rows.get(movie_id)
+        if i is None:
+            i = self._add_movie(movie_id)
+        self._publish()
+
+        mean = scorer.global_mean
+        user_history = self._user_history.get(user_id)
+        movie_history = self._movie_history.get(movie_id)
+        folded = False
+        if user_history is not None and len(user_history) < self.fold_in_ratings:
+            user_history.append((i, rating))
+            rows = np.array([row for row, _ in user_history])
+            ratings = np.array([r for _, r in user_history])
+            self._pu[u], self._bu[u] = self._fold_in(self._qi[rows], self._bi[rows], ratings - mean)
+            folded = True
+        if movie_history is not None and len(movie_history) < self.fold_in_ratings:
+            movie_history.append((u, rating))
+            rows = np.array([row for row, _ in movie_history])
+            ratings = np.array([r for _, r in movie_history])
+            self._qi[i], self._bi[i] = self._fold_in(self._pu[rows], self._bu[rows], ratings - mean)
+            folded = True
+        if folded:
+            return
+
+        # SGD steps on the one rating, same update as surprise's SVD.fit
+        pu, qi = self._pu[u], self._qi[i]
+        lr, reg = self.lr, self.reg
+        for _ in range(self.n_steps):
+            dot = pu @ qi
+            if scorer.biased:
+                err = rating - (mean + self._bu[u] + self._bi[i] + dot)
+                self._bu[u] += lr * (err - reg * self._bu[u])
+                self._bi[i] += lr * (err - reg * self._bi[i])
+            else:
+                err = rating - dot
+            pu_old = pu.copy()
+            pu += lr * (err * qi - reg * pu)
+            qi += lr * (err * pu_old - reg * qi)
+
+    def recommend(self, user_id, top_n=10):
+        # Top N unrated movie ids for one user with the current factors
+        with self._lock:
+            movie_ids, _ = self.scorer.recommend([user_id], top_n=top_n, rated_index=self.rated_index)
+        return [movie_id for movie_id in movie_ids[0].tolist() if movie_id != -1]
+
+    # Name used by utils.user_interface.UserInterface
+    get_recommendations = recommend
+
+    def retrain(self):
+        """
+        Refits the SVD on the base ratings plus every logged rating.
+
+        Training runs without the lock, so add_rating() keeps working; ratings
+        that arrive during training are replayed onto the fresh factors
+        before they are swapped in.
+
+        Returns:
+            the new model version
+        """
+        if self.base_ratings is None:
+            raise ValueError("retrain() needs the base ratings the model was trained on")
+        with self._lock:
+            n_logged = len(self._log)
+            logged = pd.DataFrame(self._log, columns=['userId', 'movieId', 'rating'])
+        ratings = pd.concat([self.base_ratings[['userId', 'movieId', 'rating']], logged], ignore_index=True)
+        model = train_collaborative_filtering_model(ratings, test_size=None, **self.svd_params)
+        scorer = SVDScorer.from_model(model)
+
+        with self._lock:
+            self.scorer = scorer
+            self.base_ratings, self._log, late = ratings, [], self._log[n_logged:]
+            self._user_history, self._movie_history = {}, {}
+            self._reset_capacity()
+            for user_id, movie_id, rating in late:
+                self._log.append((user_id, movie_id, rating))
+                self._apply(user_id, movie_id, rating)
+            self.version += 1
+            return self.version
+
+    def start_background_retrain(self, every_ratings=None, interval=None, on_swap=None, retry_after=60.0):
+        """
+        Retrains in a daemon thread every `interval` seconds and/or once
+        `every_ratings` new ratings were logged.
+
+        Args:
+            every_ratings: retrain after this many new ratings
+            interval: retrain at least every `interval` seconds
+            on_swap: callable(version) run after new factors are swapped in,
+                e.g. RecommendationCache.set_model_version
+            retry_after: seconds to wait after a failed retrain or swap
+        """
+        def loop():
+            last, cooldown = 0.0, 0.0
+            while not self._stop.wait(1.0):
+                last += 1.0
+                cooldown -= 1.0
+                due = (every_ratings is not None and len(self._log) >= every_ratings) or \
+                      (interval is not None and last >= interval)
+                if due and cooldown <= 0:
+                    last = 0.0
+                    # A failure must not end the thread: keep serving the current factors and try again later
+                    try:
+                        version = self.retrain()
+                        if on_swap is not None:
+                            on_swap(version)
+                    except Exception:
+                        logger.exception("Background SVD retrain failed, retrying in %.0f s", retry_after)
+                        metrics.count('retrain.svd.errors')
+                        cooldown = retry_after
+
+        self._stop.clear()
+        self._retrain_thread = threading.Thread(target=loop, name='svd-retrain', daemon=True)
+        self._retrain_thread.start()
+
+    def stop_background_retrain(self):
+        self._stop.set()
+        if self._retrain_thread is not None:
+            self._retrain_thread.join()
+            self._retrain_thread = None
@@ -0,0 +1,180 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+from models.cold_start import movie_buckets
+from utils.data_preprocessing import load_movie_data, load_user_ratings
+from utils.instrumentation import timed
+from utils.ranking import top_n as select_top_n
+
+# Decayed sums are stored relative to a reference time; once the newest event is this many e-folds
+# past it, every array is rescaled so the weights stay far from float64 overflow
+_REBASE_EXPONENT = 30.0
+
+class TrendingModel:
+    """
+    Exponentially time-decayed popularity and mean rating per movie and per genre.
+
+    A rating at time t carries the weight 2 ** (-(now - t) / half_life). The
+    decayed count and rating sum of every movie live in fixed-size arrays
+    indexed by catalog position. Weights are stored as exp(decay x (t - ref))
+    for a reference time `ref`, so a new rating adds one term to its movie
+    and to each of its genres - O(1) per rating, no rescan of the history -
+    and moving the clock forward only changes the factor applied at query
+    time. A query ranks the arrays with argpartition, optionally masked to
+    one genre.
+    """
+
+    def __init__(self, half_life_days=config.TRENDING_HALF_LIFE_DAYS, prior=5.0):
+        self.half_life_days = half_life_days
+        self.decay = np.log(2) / (half_life_days * 86400)
+        self.prior = prior
+        self.replay_stats = None
+
+    @timed('train.trending')
+    def build(self, user_ratings=None, movie_data=None):
+        """
+        Replays the whole rating history in one vectorized pass.
+
+        Decayed sums do not depend on the order of the events, so the replay
+        is one weighted bincount per array; the clock is set to the newest
+        timestamp.
+
+        Args:
+            user_ratings: dataframe with movieId, rating and timestamp columns
+            movie_data: movie catalog (movieId, title, genres)
+        """
+        if user_ratings is None:
+            user_ratings = load_user_ratings()
+        if movie_data is None:
+            movie_data = load_movie_data()
+
+        self.movie_ids = movie_data['movieId'].values
+        self._movie_positions = pd.Index(self.movie_ids)
+        self._position_of = {movie_id: position for position, movie_id in enumerate(self.movie_ids.tolist())}
+        names, membership = movie_buckets(movie_data)
+        genre_rows = [row for row, name in enumerate(names) if name.startswith('genre:')]
+        self.genres = [names[row][len('genre:'):] for row in genre_rows]
+        self._genre_rows = {genre: row for row, genre in enumerate(self.genres)}
+        self.genre_membership = membership[genre_rows]
+        # Genres of every movie as CSR rows, for O(1) genre updates
+        genre_of, movie_of = np.nonzero(self.genre_membership)
+        order = np.argsort(movie_of, kind='stable')
+        self._movie_genres = genre_of[order]
+        self._movie_genres_indptr = np.zeros(len(self.movie_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(movie_of, minlength=len(self.movie_ids)), out=self._movie_genres_indptr[1:])
+
+        start = time.perf_counter()
+        positions = self._movie_positions.get_indexer(user_ratings['movieId'].values)
+        known = positions >= 0
+        positions = positions[known]
+        ratings = user_ratings['rating'].values[known].astype(np.float64)
+        timestamps = user_ratings['timestamp'].values[known].astype(np.float64)
+        self.now = self.reference = float(timestamps.max()) if len(timestamps) else time.time()
+        weights = np.exp(self.decay * (timestamps - self.reference))
+        n_movies = len(self.movie_ids)
+        self.counts = np.bincount(positions, weights=weights, minlength=n_movies)
+        self.sums = np.bincount(positions, weights=weights * ratings, minlength=n_movies)
+        self.genre_counts = self.genre_membership @ self.counts
+        self.genre_sums = self.genre_membership @ self.sums
+        self.total_count, self.total_sum = float(self.counts.sum()), float(self.sums.sum())
+        seconds = time.perf_counter() - start
+        self.replay_stats = {'events': int(known.sum()), 'seconds': seconds,
+                             'events_per_second': known.sum() / seconds if seconds else float('inf')}
+        return self
+
+    def add_rating(self, movie_id, rating, timestamp=None):
+        """
+        Adds one rating to its movie and genres in O(1).
+
+        Ratings older than the clock are fine; newer ones advance it.
+        """
+        position = self._position_of.get(movie_id)
+        if position is None:
+            return
+        timestamp = time.time() if timestamp is None else float(timestamp)
+        if self.decay * (timestamp - self.reference) > _REBASE_EXPONENT:
+            self._rebase(timestamp)
+        weight = np.exp(self.decay * (timestamp - self.reference))
+        self.counts[position] += weight
+        self.sums[position] += weight * rating
+        genres = self._movie_genres[self._movie_genres_indptr[position]:self._movie_genres_indptr[position + 1]]
+        self.genre_counts[genres] += weight
+        self.genre_sums[genres] += weight * rating
+        self.total_count += weight
+        self.total_sum += weight * rating
+        self.now = max(self.now, timestamp)
+
+    def _rebase(self, reference):
+        # Rescale every decayed sum to a later reference time (O(catalog), once per ~_REBASE_EXPONENT e-folds)
+        factor = np.exp(-self.decay * (reference - self.reference))
+        for name in ('counts', 'sums', 'genre_counts', 'genre_sums'):
+            getattr(self, name)[:] *= factor
+        self.total_count *= factor
+        self.total_sum *= factor
+        self.reference = reference
+
+    def _scale(self, now):
+        return np.exp(-self.decay * ((self.now if now is None else now) - self.reference))
+
+    def trending(self, top_n=10, genre=None, by='count', now=None):
+        """
+        Top movies by decayed popularity or decayed mean rating.
+
+        Args:
+            top_n: number of movies
+            genre: optional genre, e.g. 'Comedy'
+            by: 'count' (decayed number of ratings) or 'rating' (decayed mean
+                rating shrunk towards the overall mean with `prior` ratings)
+            now: time to decay to (defaults to the newest event)
+
+        Returns:
+            movie_ids: array of up to top_n movie ids
+            scores: matching decayed counts or mean ratings
+        """
+        scale = self._scale(now)
+        counts = self.counts * scale
+        if by == 'count':
+            scores = counts
+        elif by == 'rating':
+            mean = self.total_sum / self.total_count if self.total_count else 0.0
+            scores = (self.sums * scale + self.prior * mean) / (counts + self.prior)
+        else:
+            raise ValueError(f"Unknown ranking {by!r}")
+        scores = np.where(counts > 0, scores, -np.inf)
+        if genre is not None:
+            if genre not in self._genre_rows:
+                raise ValueError(f"Unknown genre {genre!r}")
+            scores = np.where(self.genre_membership[self._genre_rows[genre]], scores, -np.inf)
+        positions, values = select_top_n(scores, top_n)
+        keep = positions >= 0
+        return self.movie_ids[positions[keep]], values[keep]
+
+    def trending_genres(self, now=None):
+        # Decayed rating count and mean rating per genre, most active first
+        scale = self._scale(now)
+        counts = self.genre_counts * scale
+        frame = pd.DataFrame({'genre': self.genres, 'count': counts,
+                              'mean_rating': np.divide(self.genre_sums * scale, counts,
+                                                       out=np.zeros_like(counts), where=counts > 0)})
+        return frame.sort_values('count', ascending=False, ignore_index=True)
+
+    def recommend(self, user_id=None, top_n=10, genre=None):
+        # Trending movie ids; the same for every user
+        movie_ids, _ = self.trending(top_n, genre)
+        return movie_ids.tolist()
+
+    # Name used by utils.user_interface.UserInterface
+    get_recommendations = recommend
+
+# Example usage: what was trending when the rating history ends
+if __name__ == "__main__":
+    model = TrendingModel().build()
+    stats = model.replay_stats
+    print(f"Replayed {stats['events']} ratings in {stats['seconds']:.3f}s ({stats['events_per_second']:,.0f} events/s)")
+    titles = load_movie_data().set_index('movieId')['title']
+    print([titles[movie_id] for movie_id in model.trending(5)[0]])
+    print([titles[movie_id] for movie_id in model.trending(5, genre='Comedy', by='rating')[0]])
+    print(model.trending_genres().head())
@@ -0,0 +1,339 @@
+# server.py
+# Asyncio HTTP recommendation service.
+# Run from the repository root with: python server.py [--model-dir path | --registry]
+#
+#   GET  /recommend/{user_id}?top_n=10   top N unrated movies for a user (SVD)
+#   GET  /similar/{movie_id}?top_n=10    most similar movies (item-item cosine)
+#   POST /rate  {"user_id": 1, "movie_id": 2, "rating": 4.0}
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import config
+from models.collaborative_filtering import CollaborativeFilteringModel
+from utils.data_preprocessing import load_user_ratings
+from utils.id_encoder import IdEncoder
+from utils.instrumentation import metrics
+from utils.item_similarity import create_X
+from utils.model_registry import ModelRegistry, ServingHandle
+from utils.rated_items import RatedItemsIndex
+from utils.recommendation_cache import RecommendationCache
+from utils.similar_items import SimilarItemsIndex
+
+logger = logging.getLogger('movieplatform.server')
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+MAX_TOP_N = 100
+ROUTES = ('recommend', 'similar', 'rate')
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class MicroBatcher:
+    """
+    Groups concurrent requests into one vectorized call.
+
+    submit() queues one item and waits for its result. An idle batcher runs
+    the item right away, so a lone request pays no batching delay; while a
+    batch is being scored, new items queue up and leave together as the
+    next batch when it finishes (or as soon as `max_batch` are waiting).
+    Batches run as single `batch_fn(items)` calls in the executor, so the
+    event loop never blocks on scoring. batch_fn returns one result (or
+    exception) per item.
+    """
+
+    def __init__(self, batch_fn, executor, max_batch=64):
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.max_batch = max_batch
+        self._queue = []
+        self._in_flight = 0
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((item, future))
+        if self._in_flight == 0 or len(self._queue) >= self.max_batch:
+            self._flush()
+        return await future
+
+    def _flush(self):
+        batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+        if batch:
+            self._in_flight += 1
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        items = [item for item, _ in batch]
+        self.batches += 1
+        self.items += len(items)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self.executor, self.batch_fn, items)
+        except Exception as error:
+            results = [error] * len(batch)
+        finally:
+            self._in_flight -= 1
+            # Everything that queued up meanwhile leaves as the next batch
+            self._flush()
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+class RecommendationService:
+    """
+    Models loaded once at startup plus the request handlers.
+
+    Scoring runs in a thread pool (NumPy releases the GIL) behind one
+    MicroBatcher per endpoint. A lock keeps /rate updates of the rated-items
+    index from racing with batch scoring. With a registry handle the
+    collaborative filtering model is swapped in place whenever a new version
+    is promoted; each batch scores with the model it started with. Ratings
+    posted to /rate are also kept in `live_ratings` and replayed onto every
+    incoming model, so a swap never forgets them.
+    """
+
+    def __init__(self, cf_model, similar_index, cache=None, workers=4, max_batch=64):
+        self.cf_model = cf_model
+        self.similar_index = similar_index
+        self.similar_positions = IdEncoder(similar_index.item_ids)
+        self.cache = cache
+        self.live_ratings = RatedItemsIndex.from_pairs([], [])
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.recommend_batcher = MicroBatcher(self._recommend_batch, self.executor, max_batch)
+        self.similar_batcher = MicroBatcher(self._similar_batch, self.executor, max_batch)
+
+    @classmethod
+    def from_config(cls, model_dir=None, **kwargs):
+        # Load a saved collaborative filtering model, or train one on the bundled ratings
+        user_ratings = load_user_ratings()
+        cf_model = CollaborativeFilteringModel()
+        cf_model = cf_model.load(model_dir) if model_dir else cf_model.build(user_ratings)
+        X, _, movie_mapper, _, _ = create_X(user_ratings)
+        similar_index = SimilarItemsIndex.build(X, metric='cosine', item_ids=movie_mapper.classes_)
+        return cls(cf_model, similar_index, **kwargs)
+
+    @classmethod
+    def from_registry(cls, registry=None, name='collaborative_filtering', **kwargs):
+        # Serve the LATEST registry version of the collaborative filtering model; call service.handle.watch()
+        handle = ServingHandle(registry or ModelRegistry(), name)
+        X, _, movie_mapper, _, _ = create_X(load_user_ratings())
+        similar_index = SimilarItemsIndex.build(X, metric='cosine', item_ids=movie_mapper.classes_)
+        service = cls(handle.model, similar_index, **kwargs)
+        service.handle = handle
+        handle.on_swap = service.set_cf_model
+        if service.cache is not None:
+            service.cache.set_model_version('collaborative_filtering', handle.version)
+        return service
+
+    def set_cf_model(self, version, cf_model):
+        # Ratings posted since startup may be missing from the new model's history; replay them before it serves
+        with self.lock:
+            user_ids, movie_ids = self.live_ratings.pairs()
+            for user_id, movie_id in zip(user_ids.tolist(), movie_ids.tolist()):
+                cf_model.rated_index.add(user_id, movie_id)
+            # One reference assignment: batches already running keep the previous model
+            self.cf_model = cf_model
+        # Only now: a recommend() holding a token of the new version is scored by the new model
+        if self.cache is not None:
+            self.cache.set_model_version('collaborative_filtering', version)
+        logger.info("Serving collaborative_filtering version %s", version)
+
+    def _recommend_batch(self, items):
+        # One matrix product for every user of the batch, sliced to each request's top_n
+        user_ids = [user_id for user_id, _ in items]
+        # Profiled here rather than per request: the batch is what runs on a worker thread
+        cf_model = self.cf_model
+        with metrics.stage('request.batch.recommend', profile=True), self.lock:
+            movie_ids, scores = cf_model.scorer.recommend(
+                user_ids, max(top_n for _, top_n in items), cf_model.rated_index)
+        results = []
+        for row, (user_id, top_n) in enumerate(items):
+            keep = movie_ids[row, :top_n] >= 0
+            results.append({'user_id': user_id, 'movie_ids': movie_ids[row, :top_n][keep].tolist(),
+                            'scores': np.round(scores[row, :top_n][keep], 4).tolist()})
+        return results
+
+    def _similar_batch(self, items):
+        positions = self.similar_positions.transform([movie_id for movie_id, _ in items])
+        known = positions >= 0
+        with metrics.stage('request.batch.similar', profile=True):
+            neighbours, scores = self.similar_index.query(positions[known], max(top_n for _, top_n in items))
+        results, row = [], 0
+        for (movie_id, top_n), is_known in zip(items, known):
+            if not is_known:
+                results.append(HTTPError(404, f"Unknown movie id {movie_id}"))
+                continue
+            keep = neighbours[row, :top_n] >= 0
+            results.append({'movie_id': movie_id,
+                            'movie_ids': self.similar_index.item_ids[neighbours[row, :top_n][keep]].tolist(),
+                            'scores': np.round(scores[row, :top_n][keep], 4).tolist()})
+            row += 1
+        return results
+
+    async def recommend(self, user_id, top_n):
+        if self.cache is None:
+            return await self.recommend_batcher.submit((user_id, top_n))
+        # Taken before the await: a /rate or a model swap landing meanwhile keeps this result out of the cache
+        token = self.cache.token('collaborative_filtering', user_id)
+        hit, result = self.cache.get('collaborative_filtering', user_id, top_n)
+        if hit:
+            return result
+        result = await self.recommend_batcher.submit((user_id, top_n))
+        self.cache.put('collaborative_filtering', user_id, top_n, result, token)
+        return result
+
+    async def similar(self, movie_id, top_n):
+        return await self.similar_batcher.submit((movie_id, top_n))
+
+    async def rate(self, body):
+        try:
+            rating = json.loads(body or b'{}')
+            user_id, movie_id, value = int(rating['user_id']), int(rating['movie_id']), float(rating['rating'])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPError(400, "Expected JSON with user_id, movie_id and rating")
+
+        def record():
+            with self.lock:
+                self.live_ratings.add(user_id, movie_id)
+                self.cf_model.rated_index.add(user_id, movie_id)
+        await asyncio.get_running_loop().run_in_executor(self.executor, record)
+        if self.cache is not None:
+            self.cache.invalidate_subject(user_id)
+        return {'user_id': user_id, 'movie_id': movie_id, 'rating': value}
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+        query = parse_qs(url.query)
+        try:
+            top_n = int(query.get('top_n', ['10'])[0])
+        except ValueError:
+            raise HTTPError(400, "top_n must be an integer")
+        if not 1 <= top_n <= MAX_TOP_N:
+            raise HTTPError(400, f"top_n must be between 1 and {MAX_TOP_N}")
+
+        if len(parts) == 2 and parts[0] in ('recommend', 'similar'):
+            if method != 'GET':
+                raise HTTPError(405, f"Use GET for /{parts[0]}")
+            try:
+                subject = int(parts[1])
+            except ValueError:
+                raise HTTPError(400, f"Invalid id {parts[1]!r}")
+            handler = self.recommend if parts[0] == 'recommend' else self.similar
+            return await handler(subject, top_n)
+        if parts == ['rate']:
+            if method != 'POST':
+                raise HTTPError(405, "Use POST for /rate")
+            return await self.rate(body)
+        raise HTTPError(404, f"No route for {url.path}")
+
+    async def handle_connection(self, reader, writer):
+        # HTTP/1.1 with keep-alive; one request at a time per connection
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+
+                start = time.perf_counter()
+                # A fixed set of stage names: one histogram per client-chosen path would grow without bound
+                route = urlsplit(target).path.strip('/').split('/')[0]
+                route = route if route in ROUTES else 'unknown'
+                try:
+                    with metrics.stage(f'request.http.{route}'):
+                        status, payload = 200, await self.dispatch(method, target, body)
+                except HTTPError as error:
+                    status, payload = error.status, {'error': str(error)}
+                except Exception:
+                    logger.exception("Request %s %s failed", method, target)
+                    status, payload = 500, {'error': REASONS[500]}
+                metrics.count(f'http.status.{status}')
+                if config.DEBUG_MODE:
+                    logger.debug("%s %s -> %d in %.2f ms", method, target, status, (time.perf_counter() - start) * 1e3)
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"{version} {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    .encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def export_metrics(path, interval):
+    # Rewrite the metrics file periodically for a node-exporter textfile collector or a JSON scraper
+    while True:
+        await asyncio.sleep(interval)
+        metrics.export(path)
+
+async def serve(service, host=config.WEB_SERVER_HOST, port=config.WEB_SERVER_PORT, metrics_file=None,
+                metrics_interval=10.0):
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    logger.info("Serving on http://%s:%d", host, port)
+    if metrics_file:
+        asyncio.ensure_future(export_metrics(metrics_file, metrics_interval))
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Movie recommendation HTTP service")
+    parser.add_argument('--host', default=config.WEB_SERVER_HOST)
+    parser.add_argument('--port', type=int, default=config.WEB_SERVER_PORT)
+    parser.add_argument('--model-dir', help="directory written by CollaborativeFilteringModel.save()")
+    parser.add_argument('--registry', action='store_true',
+                        help="serve the LATEST collaborative_filtering model of the registry and hot-swap new versions")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-batch', type=int, default=64, help="1 disables micro-batching")
+    parser.add_argument('--cache-entries', type=int, default=0, help="in-process LRU size, 0 disables the cache")
+    parser.add_argument('--log-level', default='DEBUG' if config.DEBUG_MODE else 'INFO')
+    parser.add_argument('--metrics-file', help="export stage timings here every 10 s (.json or Prometheus text)")
+    parser.add_argument('--slow-request-ms', type=float,
+                        help="write a sampling profile of every request slower than this")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    if args.slow_request_ms:
+        metrics.configure(slow_threshold=args.slow_request_ms / 1e3)
+    cache = RecommendationCache(max_entries=args.cache_entries) if args.cache_entries else None
+    if args.registry:
+        service = RecommendationService.from_registry(cache=cache, workers=args.workers, max_batch=args.max_batch)
+        service.handle.watch()
+    else:
+        service = RecommendationService.from_config(args.model_dir, cache=cache, workers=args.workers,
+                                                    max_batch=args.max_batch)
+    # Stop the slow-request profiler's sampling thread on shutdown
+    with metrics.profiler or contextlib.nullcontext():
+        asyncio.run(serve(service, args.host, args.port, args.metrics_file))
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from utils.id_encoder import IdEncoder
+
+tf = pytest.importorskip('tensorflow')
+
+from models.deep_learning import build_neumf_model  # noqa: E402
+from utils.input_pipeline import make_ratings_dataset  # noqa: E402
+
+def write_ratings(path, n_ratings=40):
+    rng = np.random.default_rng(0)
+    lines = ["userId,movieId,rating,timestamp"]
+    lines += [f"{rng.integers(1, 6)},{rng.integers(1, 9) * 10},{rng.integers(1, 11) / 2},{964982703 + i}"
+              for i in range(n_ratings)]
+    # A user the encoder does not know: filtered inside the pipeline
+    lines.append("99,10,4.0,964982703")
+    path.write_text("\n".join(lines) + "\n")
+
+def test_streamed_batches_match_the_encoders(tmp_path):
+    csv = tmp_path / 'ratings.csv'
+    write_ratings(csv)
+    user_encoder, movie_encoder = IdEncoder(np.arange(1, 6)), IdEncoder(np.arange(1, 9) * 10)
+    dataset = make_ratings_dataset(user_encoder, movie_encoder, str(csv), batch_size=8, shuffle_buffer=0,
+                                   subset='all')
+
+    batches = list(dataset.as_numpy_iterator())
+    users = np.concatenate([user_codes for (user_codes, _), _ in batches])
+    movies = np.concatenate([movie_codes for (_, movie_codes), _ in batches])
+    assert users.shape == movies.shape == (40, 1)
+    assert users.min() >= 0 and users.max() < len(user_encoder)
+    assert movies.min() >= 0 and movies.max() < len(movie_encoder)
+
+def test_neumf_fits_one_epoch_on_a_streamed_csv(tmp_path):
+    csv = tmp_path / 'ratings.csv'
+    write_ratings(csv)
+    user_encoder, movie_encoder = IdEncoder(np.arange(1, 6)), IdEncoder(np.arange(1, 9) * 10)
+    train = make_ratings_dataset(user_encoder, movie_encoder, str(csv), batch_size=8, shuffle_buffer=16)
+    validation = make_ratings_dataset(user_encoder, movie_encoder, str(csv), batch_size=8, subset='validation')
+
+    model = build_neumf_model(len(user_encoder), len(movie_encoder), embedding_size=4)
+    history = model.fit(train, epochs=1, validation_data=validation, verbose=0)
+    assert np.isfinite(history.history['loss'][0])
+    assert np.isfinite(history.history['val_loss'][0])
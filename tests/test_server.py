@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from models.collaborative_filtering import CollaborativeFilteringModel, SVDScorer
+from server import RecommendationService
+from utils.rated_items import RatedItemsIndex
+from utils.recommendation_cache import RecommendationCache
+from utils.similar_items import SimilarItemsIndex
+
+MOVIE_IDS = np.array([10, 20, 30])
+
+def make_model(biases=(0.3, 0.2, 0.1)):
+    # One user, three movies ranked by their bias alone
+    model = CollaborativeFilteringModel()
+    model.scorer = SVDScorer([1], np.zeros((1, 1)), np.zeros(1), MOVIE_IDS, np.zeros((3, 1)), np.array(biases), 3.0)
+    model.rated_index = RatedItemsIndex.from_pairs([], [])
+    return model
+
+def make_service(model=None):
+    similar_index = SimilarItemsIndex.build(csr_matrix(np.eye(3)), item_ids=MOVIE_IDS)
+    return RecommendationService(model or make_model(), similar_index, cache=RecommendationCache(), workers=2)
+
+def gate_batches(service):
+    # Hold every scored batch until the returned event is set, like a slow batch the event loop keeps serving around
+    gate = asyncio.Event()
+    submit = service.recommend_batcher.submit
+
+    async def gated(item):
+        result = await submit(item)
+        await gate.wait()
+        return result
+    service.recommend_batcher.submit = gated
+    return gate
+
+def test_rate_during_recommend_is_not_cached():
+    async def scenario():
+        service = make_service()
+        gate = gate_batches(service)
+        pending = asyncio.ensure_future(service.recommend(1, 3))
+        await asyncio.sleep(0.05)
+        # The rating lands while the recommendation is in flight, then the stale list comes back
+        await service.rate(json.dumps({'user_id': 1, 'movie_id': 10, 'rating': 5}).encode())
+        gate.set()
+        stale = await pending
+        return service, stale, await service.recommend(1, 3)
+
+    service, stale, fresh = asyncio.run(scenario())
+    assert stale['movie_ids'] == [10, 20, 30]
+    assert fresh['movie_ids'] == [20, 30]
+    assert service.cache.stats()['stale_puts'] == 1
+
+def test_model_swap_during_recommend_is_not_cached():
+    async def scenario():
+        service = make_service()
+        gate = gate_batches(service)
+        pending = asyncio.ensure_future(service.recommend(1, 3))
+        await asyncio.sleep(0.05)
+        service.set_cf_model(2, make_model(biases=(0.1, 0.2, 0.3)))
+        gate.set()
+        await pending
+        return await service.recommend(1, 3)
+
+    assert asyncio.run(scenario())['movie_ids'] == [30, 20, 10]
+
+def test_ratings_survive_model_swap():
+    async def scenario():
+        service = make_service()
+        await service.rate(json.dumps({'user_id': 1, 'movie_id': 10, 'rating': 5}).encode())
+        service.set_cf_model(2, make_model())
+        return await service.recommend(1, 3)
+
+    assert asyncio.run(scenario())['movie_ids'] == [20, 30]
+
+def test_unknown_paths_share_one_stage():
+    from utils.instrumentation import metrics
+
+    async def scenario():
+        service = make_service()
+        server = await asyncio.start_server(service.handle_connection, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        statuses = []
+        for path in ('/recommend/1', '/no-such-route-a', '/no-such-route-b/1'):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f"GET {path} HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+            statuses.append(int((await reader.readline()).split()[1]))
+            writer.close()
+        server.close()
+        return statuses
+
+    assert asyncio.run(scenario()) == [200, 404, 404]
+    stages = [name for name in metrics.snapshot()['stages'] if name.startswith('request.http.')]
+    assert 'request.http.recommend' in stages and 'request.http.unknown' in stages
+    assert not any('no-such-route' in name for name in stages)
@@ -0,0 +1,15 @@
+from utils.title_index import TitleIndex
+
+TITLES = ['X-Men (2000)', 'Shawshank Redemption, The (1994)', 'Star Wars: Episode IV - A New Hope (1977)',
+          'Matrix, The (1999)']
+
+def test_short_queries_get_no_prefix_match():
+    index = TitleIndex.build(TITLES)
+    assert index.lookup('x') is None
+    assert index.lookup('sta') is None
+
+def test_prefix_queries_match_longer_titles():
+    index = TitleIndex.build(TITLES)
+    assert index.lookup('shawshank') == 1
+    assert index.lookup('star wars') == 2
+    assert index.lookup('the matrix') == 3
@@ -0,0 +1,11 @@
+# utils.py used to sit next to this package and was shadowed by it; its
+# functions now live in utils/item_similarity.py and are re-exported lazily
+# so that `from utils import create_X` keeps working without importing
+# scipy/sklearn for every utils submodule.
+_ITEM_SIMILARITY = ('create_X', 'find_similar_movies')
+
+def __getattr__(name):
+    if name in _ITEM_SIMILARITY:
+        from utils import item_similarity
+        return getattr(item_similarity, name)
+    raise AttributeError(f"module 'utils' has no attribute {name!r}")
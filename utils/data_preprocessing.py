@@ -1,18 +1,36 @@
-import pandas as pd
 import os  # Import the os module
 
-def load_movie_data(movie_data_path):
+import pandas as pd
+
+import config
+from utils.instrumentation import timed
+from utils.ratings_store import RatingsStore
+
+@timed('load.movie_data')
+def load_movie_data(movie_data_path=None):
+    # Read from the binary ratings store unless a CSV path is given
+    if movie_data_path is None:
+        return RatingsStore.open().movies()
     return pd.read_csv(movie_data_path)
 
-def load_user_ratings(user_ratings_path):
+@timed('load.user_ratings')
+def load_user_ratings(user_ratings_path=None):
+    # Memory-mapped binary store by default, an explicit CSV path is parsed as before
+    if user_ratings_path is None:
+        return RatingsStore.open().to_frame()
     return pd.read_csv(user_ratings_path)
 
-# More preprocessing functions as needed
+@timed('load.user_profiles')
+def load_user_profiles(user_profiles_path=config.USER_PROFILES_PATH):
+    # user_profiles.csv is tab separated with a leading index column
+    if not os.path.exists(user_profiles_path):
+        return None
+    return pd.read_csv(user_profiles_path, sep='\t', index_col=0)
 
-# Load movie data, user ratings, and user profiles if applicable
-movie_data = pd.read_csv('C:\ProjectRecommendationSystems\MoviePlatform\data/movie_data.csv')
-user_ratings = pd.read_csv('C:\ProjectRecommendationSystems\MoviePlatform\data/user_ratings.csv')
-user_profiles = pd.read_csv('C:\ProjectRecommendationSystems\MoviePlatform\data/user_profiles.csv') if 'user_profiles.csv' in os.listdir('C:\ProjectRecommendationSystems\MoviePlatform\data') else None
+def load_data():
+    # Load movie data and user ratings through the shared ratings store
+    return load_movie_data(), load_user_ratings()
 
+# More preprocessing functions as needed
 # Perform necessary data cleaning and preprocessing
-# Merge datasets, handle missing values, encode categorical features, etc.
\ No newline at end of file
+# Merge datasets, handle missing values, encode categorical features, etc.
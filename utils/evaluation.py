@@ -0,0 +1,293 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import resource
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import config
+from utils.evaluation_metrics import ranking_metrics, truth_matrix
+from utils.id_encoder import IdEncoder
+from utils.rated_items import RatedItemsIndex
+from utils.ratings_store import RatingsStore
+
+SPLIT_KINDS = ('random', 'leave_last_out', 'time_cutoff')
+
+def make_split(store, kind='random', test_size=0.2, seed=42, cutoff_quantile=0.8):
+    """
+    Splits the rows of the ratings store into train and test row indices.
+
+    - 'random': a seeded random `test_size` share of all ratings.
+    - 'leave_last_out': the latest rating (by timestamp) of every user with
+      at least two ratings.
+    - 'time_cutoff': every rating after the `cutoff_quantile` timestamp.
+
+    Returns:
+        train, test: sorted int64 arrays of store row indices
+    """
+    n = len(store)
+    if kind == 'random':
+        test = np.random.default_rng(seed).random(n) < test_size
+    elif kind == 'leave_last_out':
+        users = np.asarray(store.user_code)
+        # Stable sort by (user, timestamp): the last row of each user group is its latest rating
+        order = np.lexsort((np.arange(n), np.asarray(store.timestamp), users))
+        last = np.ones(n, dtype=bool)
+        last[:-1] = users[order][1:] != users[order][:-1]
+        counts = np.bincount(users, minlength=len(store.user_ids))
+        test = np.zeros(n, dtype=bool)
+        test[order[last]] = counts[users[order[last]]] > 1
+    elif kind == 'time_cutoff':
+        timestamps = np.asarray(store.timestamp)
+        test = timestamps > np.quantile(timestamps, cutoff_quantile)
+    else:
+        raise ValueError(f"Unknown split '{kind}', expected one of {SPLIT_KINDS}")
+    return np.flatnonzero(~test), np.flatnonzero(test)
+
+def cached_split(store, kind='random', splits_dir=config.EVALUATION_SPLITS_DIR, **params):
+    """
+    Returns the paths of a split's train/test index files, building them once.
+
+    Splits are keyed by their kind, parameters and the signature of the
+    source CSVs, so every run and every worker evaluates on the same rows.
+    """
+    with open(os.path.join(store.path, 'meta.json')) as f:
+        sources = json.load(f)['sources']
+    key = json.dumps([kind, sorted(params.items()), sorted(sources.items())])
+    name = f"{kind}_{hashlib.sha1(key.encode()).hexdigest()[:12]}"
+    paths = tuple(os.path.join(splits_dir, f'{name}_{part}.npy') for part in ('train', 'test'))
+    if not all(os.path.exists(path) for path in paths):
+        os.makedirs(splits_dir, exist_ok=True)
+        for path, rows in zip(paths, make_split(store, kind, **params)):
+            # Write under a temporary name so an interrupted run never leaves a partial split
+            np.save(path + '.tmp.npy', rows)
+            os.replace(path + '.tmp.npy', path)
+    return paths
+
+RECOMMENDERS = {}
+
+def register_recommender(name):
+    """
+    Class decorator adding a recommender to the evaluation registry.
+
+    A registered class is built without arguments and provides
+    fit(train_ratings, catalog), recommend(user_ids, top_n) returning a
+    (users x top_n) array of movie ids padded with -1, and optionally
+    predict(user_ids, movie_ids) for rating-prediction metrics.
+    """
+    def decorator(cls):
+        RECOMMENDERS[name] = cls
+        return cls
+    return decorator
+
+@register_recommender('popularity')
+class PopularityRecommender:
+    # Most-rated unseen movies for everyone; damped item means as rating predictions
+    damping = 5.0
+
+    def fit(self, train, catalog):
+        self.catalog = pd.Index(catalog)
+        self.rated_index = RatedItemsIndex.from_ratings(train)
+        items = self.catalog.get_indexer(train['movieId'].values)
+        self.global_mean = float(train['rating'].mean())
+        counts = np.bincount(items, minlength=len(catalog))
+        sums = np.bincount(items, weights=train['rating'].values, minlength=len(catalog))
+        self.item_means = (sums + self.damping * self.global_mean) / (counts + self.damping)
+        self.popularity = counts.astype(float)
+
+    def predict(self, user_ids, movie_ids):
+        items = self.catalog.get_indexer(movie_ids)
+        return np.where(items >= 0, self.item_means[np.maximum(items, 0)], self.global_mean)
+
+    def recommend(self, user_ids, top_n):
+        from utils.ranking import top_n as select_top_n
+
+        scores = np.tile(self.popularity, (len(user_ids), 1))
+        scores[self.rated_index.mask(user_ids, self.catalog)] = -np.inf
+        positions, _ = select_top_n(scores, top_n)
+        return np.where(positions >= 0, self.catalog.values[np.maximum(positions, 0)], -1)
+
+@register_recommender('svd')
+class SVDRecommender:
+    # surprise SVD trained on the whole train split with a fixed seed
+    def fit(self, train, catalog):
+        from models.collaborative_filtering import SVDScorer, train_collaborative_filtering_model
+
+        model = train_collaborative_filtering_model(train, test_size=None, random_state=0)
+        self.scorer = SVDScorer.from_model(model, movie_ids=catalog)
+        self.rated_index = RatedItemsIndex.from_ratings(train)
+
+    def predict(self, user_ids, movie_ids):
+        return self.scorer.predict(user_ids, movie_ids)
+
+    def recommend(self, user_ids, top_n):
+        movie_ids, _ = self.scorer.recommend(user_ids, top_n, self.rated_index)
+        return movie_ids
+
+@register_recommender('als')
+class ALSRecommender:
+    # Implicit-feedback ALS on the train interactions (ranking only)
+    def fit(self, train, catalog):
+        from models.als import ImplicitALS
+        from utils.item_similarity import create_X
+
+        self.catalog = np.asarray(catalog)
+        X, self.user_encoder, _, _, _ = create_X(train, movie_encoder=IdEncoder(self.catalog))
+        self.user_items = X.T.tocsr()
+        self.als = ImplicitALS(factors=32, iterations=15).fit(self.user_items)
+
+    def recommend(self, user_ids, top_n):
+        codes = self.user_encoder.transform(user_ids)
+        result = np.full((len(codes), top_n), -1, dtype=np.int64)
+        known = codes >= 0
+        positions, _ = self.als.recommend(codes[known], self.user_items, top_n)
+        result[known] = np.where(positions >= 0, self.catalog[np.maximum(positions, 0)], -1)
+        return result
+
+@register_recommender('neumf')
+class NeuMFRecommender:
+    # NeuMF trained for a few epochs on the train split (needs TensorFlow)
+    def fit(self, train, catalog):
+        from models.deep_learning import DeepLearningModel
+
+        self.catalog = pd.Index(catalog)
+        self.model = DeepLearningModel(epochs=3, batch_size=256).build(train, movie_encoder=IdEncoder(catalog))
+        self.scorer = self.model.scorer()
+        self.global_mean = float(train['rating'].mean())
+
+    def predict(self, user_ids, movie_ids):
+        users = self.model.user_encoder.transform(user_ids)
+        movies = self.model.movie_encoder.transform(movie_ids)
+        known = (users >= 0) & (movies >= 0)
+        # Pairs the embeddings never saw get the train mean, like the other recommenders' fallbacks
+        estimates = np.full(len(users), self.global_mean)
+        u, m = users[known], movies[known]
+        s = self.scorer
+        estimates[known] = np.maximum(
+            s.user_term[u] + s.movie_term[m] + np.einsum('ij,ij->i', s.user_mf[u], s.movie_mf[m]), 0)
+        return estimates
+
+    def recommend(self, user_ids, top_n):
+        from utils.ranking import top_n as select_top_n
+
+        codes = self.model.user_encoder.transform(user_ids)
+        scores = np.full((len(codes), len(self.catalog)), -np.inf, dtype=np.float32)
+        known = codes >= 0
+        scores[known] = self.scorer.score(codes[known])
+        scores[self.model.rated_index.mask(user_ids, self.catalog)] = -np.inf
+        positions, _ = select_top_n(scores, top_n)
+        return np.where(positions >= 0, self.catalog.values[np.maximum(positions, 0)], -1)
+
+def evaluate_recommender(name, store_path, train_path, test_path, ks=(10,),
+                         threshold=config.COLLABORATIVE_FILTERING_THRESHOLD):
+    """
+    Trains and scores one registered recommender on a cached split.
+
+    Runs in a worker process; the ratings store and the split indices are
+    memory-mapped from disk. Movies a user rated >= `threshold` in the test
+    split are the relevant items for the ranking metrics.
+
+    Timings come from an untraced run; peak_mb from a second run of fit()
+    and recommend() under tracemalloc, whose hooks would otherwise slow
+    Python-heavy models more than vectorized ones.
+
+    Returns:
+        dict of timings, memory and metrics; 'error' instead of the metrics
+        when the recommender fails (e.g. TensorFlow is not installed)
+    """
+    store = RatingsStore(store_path)
+    frame = store.to_frame()
+    train = frame.iloc[np.load(train_path, mmap_mode='r')].reset_index(drop=True)
+    test = frame.iloc[np.load(test_path, mmap_mode='r')].reset_index(drop=True)
+    catalog = np.asarray(store.movie_ids)
+    result = {'model': name}
+
+    try:
+        recommender = RECOMMENDERS[name]()
+        start = time.perf_counter()
+        recommender.fit(train, catalog)
+        result['train_s'] = time.perf_counter() - start
+
+        if hasattr(recommender, 'predict'):
+            estimates = recommender.predict(test['userId'].tolist(), test['movieId'].values)
+            errors = estimates - test['rating'].values
+            result['rmse'] = float(np.sqrt(np.mean(errors ** 2)))
+            result['mae'] = float(np.mean(np.abs(errors)))
+
+        relevant = test[test['rating'] >= threshold]
+        users = np.unique(relevant['userId'].values)
+        start = time.perf_counter()
+        top = recommender.recommend(users.tolist(), max(ks))
+        result['infer_ms_per_user'] = (time.perf_counter() - start) / max(len(users), 1) * 1e3
+
+        # Relevant movies and predictions as catalog positions for ranking_metrics
+        positions = pd.Index(catalog)
+        rows = pd.Index(users).get_indexer(relevant['userId'].values)
+        truth = truth_matrix(rows, positions.get_indexer(relevant['movieId'].values), len(users), len(catalog))
+        predicted = np.where(top >= 0, positions.get_indexer(top.ravel()).reshape(top.shape), -1)
+        result.update(ranking_metrics(predicted, truth, ks))
+
+        # Peak Python/NumPy allocations of a fresh fit + recommend, traced separately from the timings
+        del recommender
+        tracemalloc.start()
+        try:
+            recommender = RECOMMENDERS[name]()
+            recommender.fit(train, catalog)
+            recommender.recommend(users.tolist(), max(ks))
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    except Exception as error:
+        result['error'] = f"{type(error).__name__}: {error}"
+    # The worker's resident high-water mark
+    result['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+    return result
+
+def evaluate(models=None, split='random', ks=(10,), n_jobs=None, store_path=config.RATINGS_STORE_PATH,
+             **split_params):
+    """
+    Evaluates registered recommenders on one cached split, in parallel.
+
+    Args:
+        models: registry names (default: all registered recommenders)
+        split: one of SPLIT_KINDS
+        ks: ranking cut-offs
+        n_jobs: worker processes (default: one per model, at most the CPU count)
+        store_path: ratings store to evaluate on
+        **split_params: passed to make_split (test_size, seed, cutoff_quantile)
+
+    Returns:
+        list of per-model result dicts, in the order of `models`
+    """
+    models = list(models or RECOMMENDERS)
+    store = RatingsStore.open(store_path)
+    train_path, test_path = cached_split(store, split, **split_params)
+    n_jobs = n_jobs or min(len(models), os.cpu_count() or 1)
+    # A fresh process per model, so the resident high-water marks are not shared between models
+    # (multiprocessing.Pool: ProcessPoolExecutor only takes max_tasks_per_child from Python 3.11)
+    with multiprocessing.Pool(processes=n_jobs, maxtasksperchild=1) as pool:
+        results = [pool.apply_async(evaluate_recommender, (name, store_path, train_path, test_path, tuple(ks)))
+                   for name in models]
+        return [result.get() for result in results]
+
+def format_report(results, ks=(10,)):
+    # One row per model: cost columns first, then accuracy
+    columns = [('train_s', 'train s', '{:.2f}'), ('infer_ms_per_user', 'ms/user', '{:.3f}'),
+               ('peak_mb', 'peak MB', '{:.0f}'), ('max_rss_mb', 'RSS MB', '{:.0f}'),
+               ('rmse', 'RMSE', '{:.4f}'), ('mae', 'MAE', '{:.4f}')]
+    for k in ks:
+        columns += [(f'{metric}@{k}', f'{label}@{k}', '{:.4f}') for metric, label in
+                    (('precision', 'P'), ('recall', 'R'), ('ndcg', 'NDCG'), ('map', 'MAP'), ('hit_rate', 'HR'),
+                     ('coverage', 'Cov'))]
+    lines = [f"{'model':<12}" + "".join(f"{label:>10}" for _, label, _ in columns)]
+    for result in results:
+        if 'error' in result:
+            lines.append(f"{result['model']:<12}  failed: {result['error']}")
+            continue
+        cells = [fmt.format(result[key]) if key in result else '-' for key, _, fmt in columns]
+        lines.append(f"{result['model']:<12}" + "".join(f"{cell:>10}" for cell in cells))
+    return "\n".join(lines)
@@ -84,4 +84,117 @@ def calculate_recall_at_k(predictions, k):
 
 def calculate_rmse(predictions, actual_ratings):
     # Calculate Root Mean Squared Error (RMSE) between predicted and actual ratings
-    return mean_squared_error(actual_ratings, predictions, squared=False)
\ No newline at end of file
+    return mean_squared_error(actual_ratings, predictions, squared=False)
+
+def truth_matrix(user_indices, item_indices, n_users, n_items):
+    """
+    Builds the ground-truth matrix used by ranking_metrics().
+
+    Args:
+        user_indices: row index (position in the top-K matrix) of every relevant pair
+        item_indices: encoded item index of every relevant pair
+        n_users: number of rows
+        n_items: catalog size
+
+    Returns:
+        boolean CSR matrix (n_users x n_items) with sorted, de-duplicated indices
+    """
+    from scipy.sparse import csr_matrix
+
+    truth = csr_matrix((np.ones(len(user_indices), dtype=bool), (user_indices, item_indices)),
+                       shape=(n_users, n_items))
+    truth.sum_duplicates()
+    return truth
+
+def _hit_matrix(top_k, truth, block_bytes=1 << 24):
+    # hits[u, j] is True when top_k[u, j] is a relevant item of row u
+    n_users, n_items = truth.shape
+    truth = truth.tocsr()
+    valid = (top_k >= 0) & (top_k < n_items)
+    items = np.where(valid, top_k, 0)
+    hits = np.zeros(top_k.shape, dtype=bool)
+
+    # Expand blocks of rows to dense boolean masks and gather the predictions
+    block_size = max(1, block_bytes // max(n_items, 1))
+    for start in range(0, n_users, block_size):
+        stop = min(start + block_size, n_users)
+        rows = np.arange(stop - start)[:, None]
+        block = items[start:stop]
+        dense = truth[start:stop].toarray().astype(bool, copy=False)
+        hits[start:stop] = dense[rows, block] & valid[start:stop]
+
+        # A repeated prediction only counts once, like the set intersection of the loop version
+        dense[:] = False
+        dense[rows, block] = valid[start:stop]
+        if np.count_nonzero(dense) != np.count_nonzero(valid[start:stop]):
+            hits[start:stop] &= ~_repeated(top_k[start:stop])
+    return hits
+
+def _repeated(top_k):
+    # Marks every prediction that already appeared earlier in its row
+    order = np.argsort(top_k, axis=1, kind='stable')
+    sorted_items = np.take_along_axis(top_k, order, axis=1)
+    repeated = np.zeros(top_k.shape, dtype=bool)
+    repeated[:, 1:] = sorted_items[:, 1:] == sorted_items[:, :-1]
+    np.put_along_axis(repeated, order, repeated.copy(), axis=1)
+    return repeated
+
+def ranking_metrics(top_k, truth, ks=(10,), n_items=None):
+    """
+    Computes top-K ranking metrics for all users and several K in one pass.
+
+    Every row of `top_k` is one user's ranked predictions (encoded item
+    indices, padded with -1, e.g. the output of utils.ranking.top_n) and
+    the matching row of `truth` holds the user's relevant items. Metrics are
+    averaged over all rows; rows without relevant items score 0, and as in
+    calculate_precision_at_k precision always divides by K.
+
+    Args:
+        top_k: int array (n_users x K) of predicted item indices
+        truth: sparse matrix (n_users x n_items) of relevant items, see truth_matrix()
+        ks: cut-offs to evaluate, each at most K
+        n_items: catalog size for coverage (defaults to truth.shape[1])
+
+    Returns:
+        dict with 'precision@k', 'recall@k', 'ndcg@k', 'map@k', 'hit_rate@k'
+        and 'coverage@k' for every k in ks
+    """
+    top_k = np.asarray(top_k, dtype=np.int64)
+    if top_k.ndim == 1:
+        top_k = top_k[None, :]
+    if top_k.shape[0] != truth.shape[0]:
+        raise ValueError(f"top_k has {top_k.shape[0]} rows but truth has {truth.shape[0]}")
+    if max(ks) > top_k.shape[1]:
+        raise ValueError(f"k={max(ks)} is larger than the {top_k.shape[1]} predictions per user")
+    n_items = truth.shape[1] if n_items is None else n_items
+    n_users = max(top_k.shape[0], 1)
+
+    hits = _hit_matrix(top_k, truth)
+    n_relevant = np.diff(truth.tocsr().indptr)
+    cum_hits = np.cumsum(hits, axis=1)
+    ranks = np.arange(1, top_k.shape[1] + 1)
+
+    # Discounts 1 / log2(rank + 1) and the ideal DCG for every possible number of relevant items
+    discounts = 1.0 / np.log2(ranks + 1)
+    dcg = np.cumsum(hits * discounts, axis=1)
+    ideal_dcg = np.concatenate([[0.0], np.cumsum(discounts)])
+    # Precision at every hit position, summed for average precision
+    precision_sum = np.cumsum(np.where(hits, cum_hits / ranks, 0.0), axis=1)
+
+    results = {}
+    for k in ks:
+        n_hits = cum_hits[:, k - 1]
+        ideal = np.minimum(n_relevant, k)
+        has_relevant = ideal > 0
+        safe_ideal = np.maximum(ideal, 1)
+
+        results[f'precision@{k}'] = n_hits.sum() / (k * n_users)
+        results[f'recall@{k}'] = np.where(has_relevant, n_hits / np.maximum(n_relevant, 1), 0.0).sum() / n_users
+        results[f'ndcg@{k}'] = np.where(has_relevant, dcg[:, k - 1] / ideal_dcg[safe_ideal], 0.0).sum() / n_users
+        results[f'map@{k}'] = np.where(has_relevant, precision_sum[:, k - 1] / safe_ideal, 0.0).sum() / n_users
+        results[f'hit_rate@{k}'] = np.count_nonzero(n_hits) / n_users
+
+        predicted = top_k[:, :k]
+        predicted = predicted[(predicted >= 0) & (predicted < n_items)]
+        results[f'coverage@{k}'] = np.count_nonzero(np.bincount(predicted, minlength=n_items)) / max(n_items, 1)
+    return {name: float(value) for name, value in results.items()}
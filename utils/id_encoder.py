@@ -0,0 +1,86 @@
+import numpy as np
+
+class IdEncoder:
+    """
+    Maps raw ids (user or movie ids) to dense integer codes and back.
+
+    The mapping is held as arrays: `classes_[code]` is the raw id of a code
+    and a sorted view of `classes_` answers id -> code lookups with
+    np.searchsorted, so encoding a whole column is one vectorized call.
+    A fresh encoder assigns codes in sorted id order (like np.unique and
+    sklearn's LabelEncoder, which it replaces); ids seen later through
+    partial_fit() are appended, so the codes of earlier ids never change.
+    """
+
+    def __init__(self, classes=None):
+        self.classes_ = np.asarray([] if classes is None else classes, dtype=np.int64)
+        self._reindex()
+
+    def _reindex(self):
+        self._order = np.argsort(self.classes_, kind='stable')
+        self._sorted = self.classes_[self._order]
+
+    def __len__(self):
+        return len(self.classes_)
+
+    def __contains__(self, raw_id):
+        return self.transform([raw_id])[0] >= 0
+
+    def __getitem__(self, raw_id):
+        # Dict-style lookup so an encoder can stand in for the old id -> index dicts
+        code = self.transform([raw_id])[0]
+        if code < 0:
+            raise KeyError(raw_id)
+        return int(code)
+
+    def fit(self, ids):
+        self.classes_ = np.unique(np.asarray(ids, dtype=np.int64))
+        self._reindex()
+        return self
+
+    def fit_transform(self, ids):
+        classes, codes = np.unique(np.asarray(ids, dtype=np.int64), return_inverse=True)
+        self.classes_ = classes
+        self._reindex()
+        return codes.reshape(-1)
+
+    def transform(self, ids, unknown=-1):
+        """
+        Encodes raw ids; ids the encoder has never seen get `unknown`.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(self.classes_):
+            return np.full(ids.shape, unknown, dtype=np.int64)
+        pos = np.searchsorted(self._sorted, ids)
+        pos[pos == len(self._sorted)] = 0
+        found = self._sorted[pos] == ids
+        return np.where(found, self._order[pos], unknown)
+
+    def partial_fit(self, ids):
+        """
+        Encodes raw ids, giving new ids the next free codes.
+
+        Args:
+            ids: array of raw ids
+
+        Returns:
+            codes: int64 array of codes for `ids`
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        codes = self.transform(ids)
+        missing = codes < 0
+        if missing.any():
+            self.classes_ = np.concatenate([self.classes_, np.unique(ids[missing])])
+            self._reindex()
+            codes[missing] = self.transform(ids[missing])
+        return codes
+
+    def inverse_transform(self, codes):
+        return self.classes_[np.asarray(codes)]
+
+    def save(self, path):
+        np.save(path, self.classes_)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        return cls(np.load(path, mmap_mode=mmap_mode))
@@ -0,0 +1,73 @@
+import numpy as np
+
+import config
+
+def make_lookup_table(encoder):
+    """
+    Turns an IdEncoder into a TensorFlow hash table (raw id -> code).
+
+    Unknown ids map to -1, so rows with ids outside the shared mapping can
+    be filtered inside the pipeline.
+    """
+    import tensorflow as tf
+
+    keys = tf.constant(np.asarray(encoder.classes_, dtype=np.int64))
+    values = tf.range(len(encoder), dtype=tf.int64)
+    return tf.lookup.StaticHashTable(tf.lookup.KeyValueTensorInitializer(keys, values), default_value=-1)
+
+def make_ratings_dataset(user_encoder, movie_encoder, ratings_path=config.USER_RATINGS_PATH, batch_size=64,
+                         shuffle_buffer=100_000, validation_every=5, subset='train', seed=42):
+    """
+    Streams (user, movie) -> rating batches from the ratings CSV with tf.data.
+
+    Lines are read from disk as they are needed, shuffled within a bounded
+    buffer, batched, and only then parsed and encoded in a parallel map, so
+    memory stays flat regardless of the file size and parsing overlaps with
+    training through prefetch. Ids are encoded with hash tables built from
+    the shared IdEncoders, so the codes match the rest of the models.
+
+    Args:
+        user_encoder: IdEncoder of the user ids
+        movie_encoder: IdEncoder of the movie ids
+        ratings_path: ratings CSV (userId, movieId, rating, timestamp)
+        batch_size: ratings per batch
+        shuffle_buffer: number of lines held by the shuffle buffer (0 disables shuffling)
+        validation_every: every n-th line goes to the validation subset (0 keeps all lines)
+        subset: 'train', 'validation' or 'all'
+        seed: shuffle seed
+
+    Returns:
+        tf.data.Dataset of ((user_codes, movie_codes), ratings) batches
+    """
+    import tensorflow as tf
+
+    user_table = make_lookup_table(user_encoder)
+    movie_table = make_lookup_table(movie_encoder)
+
+    lines = tf.data.TextLineDataset(ratings_path).skip(1)
+    # Deterministic split on the line number, so train and validation never overlap
+    if validation_every and subset != 'all':
+        is_validation = subset == 'validation'
+        lines = lines.enumerate().filter(
+            lambda index, line: tf.equal(index % validation_every == 0, is_validation)
+        ).map(lambda index, line: line)
+    if shuffle_buffer and subset != 'validation':
+        lines = lines.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+
+    # userId, movieId, rating, timestamp; empty defaults make every column required
+    record_defaults = [tf.constant([], tf.int64), tf.constant([], tf.int64),
+                       tf.constant([], tf.float32), tf.constant([], tf.int64)]
+
+    def parse(batch):
+        user_ids, movie_ids, ratings, _ = tf.io.decode_csv(batch, record_defaults)
+        user_codes = user_table.lookup(user_ids)
+        movie_codes = movie_table.lookup(movie_ids)
+        # Drop ratings of users or movies the encoders do not know
+        known = (user_codes >= 0) & (movie_codes >= 0)
+        # Column vectors, matching the Input(shape=(1,)) layers of the model
+        inputs = (tf.boolean_mask(user_codes, known)[:, None], tf.boolean_mask(movie_codes, known)[:, None])
+        return inputs, tf.boolean_mask(ratings, known)
+
+    return (lines.batch(batch_size)
+            .map(parse, num_parallel_calls=tf.data.AUTOTUNE)
+            .prefetch(tf.data.AUTOTUNE))
@@ -0,0 +1,311 @@
+import bisect
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import config
+
+# Instrumentation tiers: stages are tagged BASIC (load/train/request) or VERBOSE (inner steps)
+OFF, BASIC, VERBOSE = 0, 1, 2
+LEVELS = {'off': OFF, 'basic': BASIC, 'verbose': VERBOSE}
+
+# Latency bucket upper bounds in seconds (Prometheus histogram layout)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+           float('inf'))
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram with count, sum, min and max.
+    """
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-quantile (capped by the observed max)
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count, 'sum': self.total, 'min': self.min if self.count else 0.0, 'max': self.max,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99),
+            'buckets': dict(zip(map(str, BUCKETS), self.counts)),
+        }
+
+class SlowRequestProfiler:
+    """
+    Sampling profiler that keeps the stacks of slow requests only.
+
+    A daemon thread samples the stack of every thread currently inside a
+    profiled stage every `interval` seconds (sys._current_frames()). When the
+    stage ends faster than `threshold` its samples are dropped; otherwise
+    they are written in collapsed-stack format ("a;b;c count" lines, the
+    input of flamegraph.pl and speedscope) to `directory`. The thread starts
+    with the first profiled stage and runs until stop(); used as a context
+    manager the profiler is stopped on exit.
+    """
+
+    def __init__(self, threshold, directory, interval=0.005):
+        self.threshold = threshold
+        self.directory = directory
+        self.interval = interval
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def stop(self):
+        # Stop and join the sampling thread; the next profiled stage starts a new one
+        with self._lock:
+            thread, stop, self._thread, self._stop = self._thread, self._stop, None, None
+        if thread is not None:
+            stop.set()
+            thread.join()
+
+    def begin(self):
+        # Nested profiled stages on one thread share the samples of the outermost one
+        with self._lock:
+            entry = self._active.setdefault(threading.get_ident(), [0, Counter()])
+            entry[0] += 1
+            if self._thread is None:
+                self._stop = threading.Event()
+                self._thread = threading.Thread(target=self._sample, args=(self._stop,), name='slow-request-profiler',
+                                                daemon=True)
+                self._thread.start()
+
+    def end(self, name, seconds):
+        ident = threading.get_ident()
+        with self._lock:
+            entry = self._active.get(ident)
+            if entry is None:
+                return None
+            entry[0] -= 1
+            if entry[0]:
+                return None
+            samples = self._active.pop(ident)[1]
+        if not samples or seconds < self.threshold:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{int(seconds * 1e3)}ms.folded")
+        with open(path, 'w') as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in samples.most_common())
+        return path
+
+    def _sample(self, stop):
+        while not stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, (_, samples) in self._active.items():
+                    frame = frames.get(ident)
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    if stack:
+                        samples[';'.join(reversed(stack))] += 1
+
+class Instrumentation:
+    """
+    Process-wide timers, counters and latency histograms.
+
+    Stages are timed with stage() (context manager) or timed() (decorator)
+    and counted with count(). Every stage has a tier; stages above the
+    configured level cost one integer comparison, and with the level set
+    to 'off' in config.py timed() returns the function undecorated.
+    """
+
+    def __init__(self, level=BASIC, slow_threshold=None, profile_dir=None):
+        self.level = level
+        self.histograms = {}
+        self.counters = Counter()
+        self.profiler = None
+        self._lock = threading.Lock()
+        self.configure(slow_threshold=slow_threshold, profile_dir=profile_dir)
+
+    def configure(self, level=None, slow_threshold=None, profile_dir=None):
+        """
+        Changes the tier and/or enables the slow-request profiler.
+
+        Args:
+            level: 'off', 'basic' or 'verbose' (or OFF/BASIC/VERBOSE)
+            slow_threshold: seconds after which a profiled stage keeps its samples
+            profile_dir: where slow-request profiles are written
+        """
+        if level is not None:
+            self.level = LEVELS[level] if isinstance(level, str) else level
+        if slow_threshold is not None:
+            if self.profiler is not None:
+                self.profiler.stop()
+            self.profiler = SlowRequestProfiler(slow_threshold, profile_dir or config.INSTRUMENTATION_PROFILE_DIR)
+
+    def enabled(self, level=BASIC):
+        return self.level >= level
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, value=1, level=BASIC):
+        if self.level >= level:
+            with self._lock:
+                self.counters[name] += value
+
+    def stage(self, name, level=BASIC, profile=False):
+        """
+        Context manager timing one stage into the `name` histogram.
+
+        Args:
+            name: stage name, e.g. 'recommend.svd.score'
+            level: BASIC or VERBOSE
+            profile: run the slow-request profiler for this stage (request entry points)
+        """
+        if self.level < level:
+            return _NULL_STAGE
+        return _Stage(self, name, profile and self.profiler is not None)
+
+    def timed(self, name=None, level=BASIC, profile=False):
+        """
+        Decorator timing every call of a function as a stage.
+
+        Args:
+            name: stage name (defaults to module.qualname)
+            level: BASIC or VERBOSE
+            profile: run the slow-request profiler for calls of this function
+        """
+        def decorator(func):
+            if self.level == OFF:
+                return func
+            stage_name = name or f"{func.__module__}.{func.__qualname__}"
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if self.level < level:
+                    return func(*args, **kwargs)
+                with _Stage(self, stage_name, profile and self.profiler is not None):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        # Plain-dict copy of every metric
+        with self._lock:
+            return {
+                'stages': {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+    def to_prometheus(self, prefix='movieplatform'):
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Stage histograms become one `<prefix>_stage_seconds` family labelled
+        by stage, counters one `<prefix>_events_total` family labelled by name.
+        """
+        snapshot = self.snapshot()
+        lines = [f"# HELP {prefix}_stage_seconds Wall time of instrumented stages",
+                 f"# TYPE {prefix}_stage_seconds histogram"]
+        for name, stats in snapshot['stages'].items():
+            cumulative = 0
+            for bound, count in stats['buckets'].items():
+                cumulative += count
+                le = '+Inf' if bound == 'inf' else bound
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stats["sum"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+        lines += [f"# HELP {prefix}_events_total Instrumented event counters",
+                  f"# TYPE {prefix}_events_total counter"]
+        lines += [f'{prefix}_events_total{{name="{name}"}} {value}' for name, value in snapshot['counters'].items()]
+        return "\n".join(lines) + "\n"
+
+    def export(self, path=None):
+        """
+        Writes the metrics to a file: JSON for *.json, Prometheus text otherwise.
+
+        The file is replaced atomically, so a scraper never reads a partial one.
+        """
+        path = path or config.INSTRUMENTATION_EXPORT_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        text = json.dumps(self.snapshot(), indent=2) if path.endswith('.json') else self.to_prometheus()
+        with open(path + '.tmp', 'w') as f:
+            f.write(text)
+        os.replace(path + '.tmp', path)
+        return path
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+class _Stage:
+    __slots__ = ('metrics', 'name', 'profile', 'start')
+
+    def __init__(self, metrics, name, profile):
+        self.metrics = metrics
+        self.name = name
+        self.profile = profile
+
+    def __enter__(self):
+        if self.profile:
+            self.metrics.profiler.begin()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        self.metrics.observe(self.name, seconds)
+        if exc_type is not None:
+            self.metrics.count(f"{self.name}.errors")
+        if self.profile:
+            self.metrics.profiler.end(self.name, seconds)
+        return False
+
+class _NullStage:
+    # Shared no-op context manager for stages above the configured tier
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+# Process-wide instance used by the modules; config.INSTRUMENTATION_VERBOSE switches on the verbose tier
+metrics = Instrumentation(LEVELS[config.INSTRUMENTATION_LEVEL], config.INSTRUMENTATION_SLOW_SECONDS)
+stage = metrics.stage
+timed = metrics.timed
+count = metrics.count
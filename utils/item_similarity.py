@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from sklearn.neighbors import NearestNeighbors
+
+from utils.id_encoder import IdEncoder
+from utils.instrumentation import timed
+
+@timed('train.create_X')
+def create_X(df, user_encoder=None, movie_encoder=None):
+    """
+    Generates a sparse matrix from ratings dataframe.
+    
+    Args:
+        df: pandas dataframe
+        user_encoder: IdEncoder to reuse (e.g. loaded with a saved model);
+            users it has not seen are appended without re-encoding history
+        movie_encoder: IdEncoder to reuse for the movie ids
+    
+    Returns:
+        X: sparse matrix
+        user_mapper: IdEncoder that maps user id's to user indices
+        movie_mapper: IdEncoder that maps movie id's to movie indices
+        user_inv_mapper: array that maps user indices to user id's
+        movie_inv_mapper: array that maps movie indices to movie id's
+    """
+    user_mapper = user_encoder if user_encoder is not None else IdEncoder()
+    movie_mapper = movie_encoder if movie_encoder is not None else IdEncoder()
+
+    user_index = user_mapper.partial_fit(df['userId'].values)
+    item_index = movie_mapper.partial_fit(df['movieId'].values)
+
+    N = len(user_mapper)
+    M = len(movie_mapper)
+    X = csr_matrix((df["rating"].values, (item_index, user_index)), shape=(M, N))
+    
+    return X, user_mapper, movie_mapper, user_mapper.classes_, movie_mapper.classes_
+
+@timed('recommend.similar_movies')
+def find_similar_movies(movie_id, X, k, movie_mapper, movie_inv_mapper, metric='cosine', show_distance=False,
+                        user_id=None, rated_index=None, index=None):
+    """
+    Finds k-nearest neighbours for a given movie id.
+    
+    Args:
+        movie_id: id of the movie of interest
+        X: user-item utility matrix
+        k: number of similar movies to retrieve
+        metric: distance metric for kNN calculations
+        user_id: optional user whose already rated movies are left out
+        rated_index: RatedItemsIndex holding the rating history of user_id
+        index: prebuilt SimilarItemsIndex over X; when given it answers the
+            query instead of fitting a new NearestNeighbors model on X
+    
+    Returns:
+        list of k similar movie ID's
+    """
+    neighbour_ids = []
+    
+    movie_ind = movie_mapper[movie_id]
+    movie_vec = X[movie_ind]
+    excluded = ()
+    if user_id is not None and rated_index is not None:
+        excluded = set(rated_index.rated_items(user_id).tolist())
+    if index is not None:
+        neighbours, _ = index.query([movie_ind], k + len(excluded))
+        neighbour_ids = [movie_inv_mapper[n] for n in neighbours[0].tolist() if n >= 0]
+        return [i for i in neighbour_ids if i not in excluded][:k]
+    n_neighbours = min(k + 1 + len(excluded), X.shape[0])
+    kNN = NearestNeighbors(n_neighbors=n_neighbours, algorithm="brute", metric=metric)
+    kNN.fit(X)
+    if isinstance(movie_vec, (np.ndarray)):
+        movie_vec = movie_vec.reshape(1,-1)
+    neighbour = kNN.kneighbors(movie_vec, return_distance=show_distance)
+    if show_distance:
+        neighbour = neighbour[1]
+    for i in range(0, n_neighbours):
+        n = neighbour.item(i)
+        neighbour_ids.append(movie_inv_mapper[n])
+    neighbour_ids.pop(0)
+    return [i for i in neighbour_ids if i not in excluded][:k]
\ No newline at end of file
@@ -1,9 +1,15 @@
 import pandas as pd
 
-def load_user_ratings(file_path):
+import config
+from utils.ratings_store import RatingsStore
+
+def load_user_ratings(file_path=config.USER_RATINGS_PATH):
     try:
-        # Load user ratings data from the CSV file
-        user_ratings = pd.read_csv(file_path)
+        # Load user ratings data from the binary store, or parse any other CSV
+        if file_path == config.USER_RATINGS_PATH:
+            user_ratings = RatingsStore.open().to_frame()
+        else:
+            user_ratings = pd.read_csv(file_path)
 
         # You can perform additional preprocessing or validation here if needed
 
@@ -16,4 +22,4 @@ def load_user_ratings(file_path):
         return None
 
 # I can use this function to load user ratings data in my user interface script as follows:
-user_ratings = load_user_ratings('C:\ProjectRecommendationSystems\MoviePlatform\data/user_ratings.csv')
\ No newline at end of file
+# user_ratings = load_user_ratings()
\ No newline at end of file
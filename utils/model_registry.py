@@ -0,0 +1,222 @@
+import importlib
+import inspect
+import json
+import os
+import shutil
+import threading
+import time
+
+import config
+from utils.instrumentation import metrics, timed
+
+class ModelRegistry:
+    """
+    Versioned on-disk store of trained models.
+
+    Every published model is a directory `<root>/<name>/<version>` holding
+    whatever the model's save() writes (.npy arrays plus meta.json for the
+    models of this repo) and a registry.json recording the class and the
+    caller's metadata. Versions are written to a temporary directory and
+    renamed into place, and the LATEST pointer of a name is replaced with
+    os.replace(), so readers only ever see complete versions. load() calls
+    the class's load(), which memory-maps the arrays: opening a version
+    reads the metadata and maps the files without copying them.
+    """
+
+    def __init__(self, root=config.MODEL_REGISTRY_DIR):
+        self.root = root
+
+    def _path(self, name, version=None):
+        return os.path.join(self.root, name) if version is None else os.path.join(self.root, name, f'{version:06d}')
+
+    def versions(self, name):
+        # Published versions of a model, oldest first
+        directory = self._path(name)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(entry) for entry in os.listdir(directory) if entry.isdigit())
+
+    def latest(self, name):
+        # Version the LATEST pointer refers to, or None before the first publish
+        try:
+            with open(os.path.join(self._path(name), 'LATEST')) as f:
+                return int(f.read())
+        except FileNotFoundError:
+            return None
+
+    def publish(self, name, model, metadata=None, promote=True):
+        """
+        Saves a trained model as the next version of `name`.
+
+        Args:
+            name: registry name, e.g. 'collaborative_filtering'
+            model: object with save(path) and a matching load(path)
+            metadata: JSON-serializable details (data version, metrics, ...)
+            promote: also point LATEST at the new version
+
+        Returns:
+            the new version number
+        """
+        directory = self._path(name)
+        os.makedirs(directory, exist_ok=True)
+        staging = os.path.join(directory, f'.staging-{os.getpid()}-{threading.get_ident()}')
+        shutil.rmtree(staging, ignore_errors=True)
+        model.save(staging)
+        cls = type(model)
+        info = {'class': f'{cls.__module__}.{cls.__qualname__}', 'name': name,
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'metadata': metadata or {}}
+
+        # The rename fails when a concurrent publisher took the version first; take the next one
+        while True:
+            version = max(self.versions(name), default=0) + 1
+            info['version'] = version
+            with open(os.path.join(staging, 'registry.json'), 'w') as f:
+                json.dump(info, f, indent=2)
+            try:
+                os.rename(staging, self._path(name, version))
+                break
+            except OSError:
+                if not os.path.isdir(self._path(name, version)):
+                    raise
+        if promote:
+            self.promote(name, version)
+        return version
+
+    def promote(self, name, version):
+        """
+        Points LATEST at a published version (also used to roll back).
+        """
+        if not os.path.isdir(self._path(name, version)):
+            raise ValueError(f"{name} has no version {version}")
+        pointer = os.path.join(self._path(name), 'LATEST')
+        with open(f'{pointer}.tmp-{os.getpid()}', 'w') as f:
+            f.write(str(version))
+        os.replace(f'{pointer}.tmp-{os.getpid()}', pointer)
+
+    def info(self, name, version=None):
+        version = self.latest(name) if version is None else version
+        if version is None:
+            raise ValueError(f"Nothing published under {name!r}")
+        with open(os.path.join(self._path(name, version), 'registry.json')) as f:
+            return json.load(f)
+
+    @timed('load.registry')
+    def load(self, name, version=None, cls=None):
+        """
+        Loads a version of a model (the LATEST one by default).
+
+        Args:
+            name: registry name
+            version: version number, LATEST when None
+            cls: class to load with instead of the published one, for readers
+                of the same layout (e.g. NumpyNeuMFModel for a DeepLearningModel)
+
+        Returns:
+            (version, model)
+        """
+        info = self.info(name, version)
+        if cls is None:
+            module, _, qualname = info['class'].rpartition('.')
+            cls = importlib.import_module(module)
+            for attribute in qualname.split('.'):
+                cls = getattr(cls, attribute)
+        path = self._path(name, info['version'])
+        # Instance loaders (model.load(path) returning self) and classmethod loaders (Index.load(path))
+        if isinstance(inspect.getattr_static(cls, 'load'), classmethod):
+            return info['version'], cls.load(path)
+        return info['version'], cls().load(path)
+
+    def prune(self, name, keep=3):
+        """
+        Deletes all but the newest `keep` versions, never the LATEST one.
+
+        Processes still serving a deleted version keep working: their memory
+        maps hold the removed files open until they swap.
+        """
+        latest = self.latest(name)
+        removed = [version for version in self.versions(name)[:-keep] if version != latest]
+        for version in removed:
+            shutil.rmtree(self._path(name, version))
+        return removed
+
+class ServingHandle:
+    """
+    The current version of a registry model inside a serving process.
+
+    Callers read `handle.model` once per request (or batch) and use that
+    object throughout; swap() loads the new version first and then replaces
+    the (version, model) reference in one assignment. In-flight calls keep
+    the model they started with, so a swap never waits for them and never
+    makes them wait. watch() polls LATEST from a daemon thread and swaps
+    when it moves.
+    """
+
+    def __init__(self, registry, name, version=None, on_swap=None, cls=None):
+        self.registry = registry
+        self.name = name
+        self.on_swap = on_swap
+        self.cls = cls
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._current = registry.load(name, version, cls)
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    @property
+    def model(self):
+        return self._current[1]
+
+    def swap(self, version=None):
+        """
+        Loads `version` (LATEST by default) and makes it the current model.
+
+        Returns:
+            True when the current version changed
+        """
+        # One reload at a time; readers never take this lock
+        with self._reload_lock:
+            target = self.registry.latest(self.name) if version is None else version
+            if target is None or target == self.version:
+                return False
+            start = time.perf_counter()
+            self._current = self.registry.load(self.name, target, self.cls)
+            metrics.observe(f'swap.{self.name}', time.perf_counter() - start)
+            if self.on_swap is not None:
+                self.on_swap(*self._current)
+            return True
+
+    def watch(self, interval=config.MODEL_REGISTRY_POLL_SECONDS):
+        # Swap to every newly promoted version, checking LATEST every `interval` seconds
+        def poll():
+            while not self._stop.wait(interval):
+                try:
+                    self.swap()
+                except Exception:
+                    # A half-published or broken version must not kill the watcher; keep serving the current one
+                    metrics.count(f'swap.{self.name}.errors')
+        thread = threading.Thread(target=poll, name=f'registry-watch-{self.name}', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def recommend(self, *args, **kwargs):
+        return self.model.recommend(*args, **kwargs)
+
+    # Name used by utils.user_interface.UserInterface
+    get_recommendations = recommend
+
+# Example usage: publish the collaborative filtering model and load it back
+if __name__ == "__main__":
+    from models.collaborative_filtering import CollaborativeFilteringModel
+
+    registry = ModelRegistry()
+    version = registry.publish('collaborative_filtering', CollaborativeFilteringModel().build(),
+                               metadata={'data': config.USER_RATINGS_PATH})
+    start = time.perf_counter()
+    _, model = registry.load('collaborative_filtering')
+    print(f"Published version {version}, loaded in {(time.perf_counter() - start) * 1e3:.1f} ms")
+    print(model.recommend(1))
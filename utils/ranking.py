@@ -0,0 +1,66 @@
+import numpy as np
+
+def top_n(scores, n):
+    """
+    Selects the n highest scores of every row with argpartition.
+
+    Ties are broken by column position so the result matches a stable
+    descending sort of the full row. Entries scored -inf are treated as
+    excluded; rows with fewer than n candidates are padded with -1.
+
+    Args:
+        scores: 1-D or 2-D numpy array of scores (rows are queries)
+        n: number of items to keep per row
+
+    Returns:
+        indices: int array of shape (rows, n) with the selected columns
+        values: float array of shape (rows, n) with the selected scores
+    """
+    scores = np.asarray(scores)
+    squeeze = scores.ndim == 1
+    scores = np.atleast_2d(scores)
+    n_rows, n_cols = scores.shape
+    k = min(n, n_cols)
+
+    indices = np.full((n_rows, n), -1, dtype=np.int64)
+    values = np.full((n_rows, n), -np.inf, dtype=np.float64)
+    if k == 0 or n_rows == 0:
+        return (indices[0], values[0]) if squeeze else (indices, values)
+
+    # Unordered top-k per row, then order only those k columns
+    if k < n_cols:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(n_cols), (n_rows, n_cols)).copy()
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.lexsort((part, -part_scores), axis=1)
+    part = np.take_along_axis(part, order, axis=1)
+    part_scores = np.take_along_axis(part_scores, order, axis=1)
+
+    # argpartition picks arbitrary members of a tie at the cut-off, so rows
+    # with more ties than room are re-selected by column position
+    if k < n_cols:
+        threshold = part_scores[:, -1:]
+        crowded = np.flatnonzero((scores >= threshold).sum(axis=1) > k)
+        if len(crowded):
+            rows, threshold = scores[crowded], threshold[crowded]
+            above_rows, above_cols = np.nonzero(rows > threshold)
+            tie_rows, tie_cols = np.nonzero(rows == threshold)
+            # Keep everything above the cut-off plus the leftmost ties
+            room = k - np.bincount(above_rows, minlength=len(crowded))
+            tie_counts = np.bincount(tie_rows, minlength=len(crowded))
+            tie_rank = np.arange(len(tie_rows)) - np.repeat(np.cumsum(tie_counts) - tie_counts, tie_counts)
+            leftmost = tie_rank < room[tie_rows]
+            sel_rows = np.concatenate([above_rows, tie_rows[leftmost]])
+            sel_cols = np.concatenate([above_cols, tie_cols[leftmost]])
+            sel_scores = rows[sel_rows, sel_cols]
+            order = np.lexsort((sel_cols, -sel_scores, sel_rows))
+            part[crowded] = sel_cols[order].reshape(len(crowded), k)
+            part_scores[crowded] = sel_scores[order].reshape(len(crowded), k)
+
+    valid = part_scores > -np.inf
+    indices[:, :k] = np.where(valid, part, -1)
+    values[:, :k] = part_scores
+    if squeeze:
+        return indices[0], values[0]
+    return indices, values
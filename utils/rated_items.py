@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+class RatedItemsIndex:
+    """
+    User -> rated movies index used to exclude already seen items.
+
+    The history is kept as CSR arrays (one row per user, movie ids sorted
+    inside each row), so a user's row is a slice and membership is a binary
+    search within that row. New ratings go to a small per-user buffer that is
+    merged into the CSR arrays once it grows past `compact_every` entries,
+    which means the index never has to be rebuilt from the ratings table.
+    """
+
+    def __init__(self, user_ids, indptr, indices, compact_every=10000):
+        """
+        Args:
+            user_ids: raw user id of every CSR row
+            indptr: CSR row pointer array (len(user_ids) + 1)
+            indices: raw movie ids, sorted within each row
+            compact_every: pending appends tolerated before merging
+        """
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.compact_every = compact_every
+        self._rows = {user_id: row for row, user_id in enumerate(self.user_ids.tolist())}
+        self._pending = {}
+        self._n_pending = 0
+
+    @classmethod
+    def from_pairs(cls, user_ids, movie_ids, **kwargs):
+        """
+        Builds the index from parallel arrays of (user, movie) pairs.
+
+        Args:
+            user_ids: raw user id of every rating
+            movie_ids: raw movie id of every rating
+
+        Returns:
+            RatedItemsIndex
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+
+        # Sort by (user, movie) and drop duplicate ratings of the same movie
+        order = np.lexsort((movie_ids, user_ids))
+        user_ids, movie_ids = user_ids[order], movie_ids[order]
+        if len(user_ids):
+            keep = np.ones(len(user_ids), dtype=bool)
+            keep[1:] = (user_ids[1:] != user_ids[:-1]) | (movie_ids[1:] != movie_ids[:-1])
+            user_ids, movie_ids = user_ids[keep], movie_ids[keep]
+
+        unique_users, counts = np.unique(user_ids, return_counts=True)
+        indptr = np.zeros(len(unique_users) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(unique_users, indptr, movie_ids, **kwargs)
+
+    @classmethod
+    def from_ratings(cls, user_ratings, **kwargs):
+        """
+        Builds the index from a ratings dataframe (userId, movieId columns).
+        """
+        return cls.from_pairs(user_ratings['userId'].values, user_ratings['movieId'].values, **kwargs)
+
+    def __len__(self):
+        return len(self.indices) + self._n_pending
+
+    def add(self, user_id, movie_id):
+        # Record a new rating without touching the CSR arrays
+        if self.has_rated(user_id, movie_id):
+            return
+        self._pending.setdefault(user_id, set()).add(movie_id)
+        self._n_pending += 1
+        if self._n_pending >= self.compact_every:
+            self.compact()
+
+    def add_ratings(self, user_ratings):
+        # Record every rating of a (new) ratings dataframe
+        for user_id, movie_id in zip(user_ratings['userId'].tolist(), user_ratings['movieId'].tolist()):
+            self.add(user_id, movie_id)
+
+    def compact(self):
+        # Merge the pending appends into the CSR arrays
+        if not self._n_pending:
+            return
+        rows = np.repeat(self.user_ids, np.diff(self.indptr))
+        new_users = [user_id for user_id, items in self._pending.items() for _ in items]
+        new_items = [movie_id for items in self._pending.values() for movie_id in items]
+        merged = RatedItemsIndex.from_pairs(
+            np.concatenate([rows, np.asarray(new_users, dtype=np.int64)]),
+            np.concatenate([self.indices, np.asarray(new_items, dtype=np.int64)]),
+        )
+        self.user_ids, self.indptr, self.indices = merged.user_ids, merged.indptr, merged.indices
+        self._rows = merged._rows
+        self._pending = {}
+        self._n_pending = 0
+
+    def pairs(self):
+        # (user ids, movie ids) arrays of every recorded rating, pending appends included
+        self.compact()
+        return np.repeat(self.user_ids, np.diff(self.indptr)), self.indices
+
+    def has_rated(self, user_id, movie_id):
+        """
+        Checks whether a user has rated a movie.
+        """
+        row = self._rows.get(user_id)
+        if row is not None:
+            start, end = self.indptr[row], self.indptr[row + 1]
+            pos = start + np.searchsorted(self.indices[start:end], movie_id)
+            if pos < end and self.indices[pos] == movie_id:
+                return True
+        return movie_id in self._pending.get(user_id, ())
+
+    def rated_items(self, user_id):
+        """
+        Returns the sorted raw movie ids rated by a user.
+        """
+        row = self._rows.get(user_id)
+        items = self.indices[self.indptr[row]:self.indptr[row + 1]] if row is not None else self.indices[:0]
+        pending = self._pending.get(user_id)
+        if pending:
+            items = np.union1d(items, np.fromiter(pending, dtype=np.int64))
+        return items
+
+    def mask(self, user_ids, movie_ids):
+        """
+        Marks which catalog movies each user has rated.
+
+        Args:
+            user_ids: iterable of raw user ids
+            movie_ids: catalog of raw movie ids (array or pandas Index)
+
+        Returns:
+            mask: boolean array of shape (len(user_ids), len(movie_ids))
+        """
+        catalog = movie_ids if isinstance(movie_ids, pd.Index) else pd.Index(movie_ids)
+        user_ids = list(user_ids)
+        mask = np.zeros((len(user_ids), len(catalog)), dtype=bool)
+
+        # Gather the CSR rows of the requested users in one pass
+        rows = np.array([self._rows.get(u, -1) for u in user_ids], dtype=np.int64)
+        present = np.flatnonzero(rows >= 0)
+        starts = self.indptr[rows[present]]
+        lengths = self.indptr[rows[present] + 1] - starts
+        out_rows = np.repeat(present, lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        cols = catalog.get_indexer(self.indices[np.repeat(starts, lengths) + offsets])
+        keep = cols >= 0
+        mask[out_rows[keep], cols[keep]] = True
+
+        for out_row, user_id in enumerate(user_ids):
+            pending = self._pending.get(user_id)
+            if pending:
+                cols = catalog.get_indexer(list(pending))
+                mask[out_row, cols[cols >= 0]] = True
+        return mask
@@ -0,0 +1,197 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+from utils.id_encoder import IdEncoder
+from utils.instrumentation import timed
+
+# Column name -> dtype of the fixed-width rating columns
+RATING_COLUMNS = {
+    'user_code': np.int32,
+    'movie_code': np.int32,
+    'rating': np.float32,
+    'timestamp': np.int64,
+}
+MOVIE_TEXT_COLUMNS = ('title', 'genres')
+
+@timed('load.ingest')
+def ingest(store_path=config.RATINGS_STORE_PATH, ratings_path=config.USER_RATINGS_PATH,
+           movies_path=config.MOVIE_DATA_PATH, chunksize=1_000_000):
+    """
+    Converts user_ratings.csv and movie_data.csv into the binary columnar store.
+
+    The ratings CSV is read in chunks of `chunksize` rows, so files of any
+    size (e.g. MovieLens-25M) are ingested with bounded memory. Ids are
+    encoded to dense int32 codes with an IdEncoder that grows chunk by chunk
+    and the code -> raw id tables are stored next to the columns.
+
+    Everything is written to a fresh sibling directory first and published
+    by _publish(), so processes that have the current store mapped are never
+    truncated under and an interrupted ingest leaves the old store in place.
+
+    Args:
+        store_path: output directory
+        ratings_path: ratings CSV (userId, movieId, rating, timestamp)
+        movies_path: movies CSV (movieId, title, genres)
+        chunksize: rows parsed per chunk
+    """
+    store_path = os.path.abspath(store_path)
+    os.makedirs(os.path.dirname(store_path), exist_ok=True)
+    staging = f'{store_path}.{time.time_ns()}-{os.getpid()}'
+    os.makedirs(staging)
+    try:
+        _write_store(staging, ratings_path, movies_path, chunksize)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _publish(staging, store_path)
+
+def _write_store(store_path, ratings_path, movies_path, chunksize):
+    user_encoder = IdEncoder()
+    movie_encoder = IdEncoder()
+    n_rows = 0
+
+    files = {name: open(os.path.join(store_path, f'{name}.bin'), 'wb') for name in RATING_COLUMNS}
+    try:
+        for chunk in pd.read_csv(ratings_path, chunksize=chunksize):
+            columns = {
+                'user_code': user_encoder.partial_fit(chunk['userId'].values),
+                'movie_code': movie_encoder.partial_fit(chunk['movieId'].values),
+                'rating': chunk['rating'].values,
+                'timestamp': chunk['timestamp'].values,
+            }
+            for name, dtype in RATING_COLUMNS.items():
+                files[name].write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+            n_rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    user_encoder.save(os.path.join(store_path, 'user_ids.npy'))
+    movie_encoder.save(os.path.join(store_path, 'movie_ids.npy'))
+    _ingest_movies(store_path, movies_path)
+
+    meta = {
+        'n_ratings': n_rows,
+        'columns': {name: np.dtype(dtype).str for name, dtype in RATING_COLUMNS.items()},
+        'sources': {path: _file_signature(path) for path in (ratings_path, movies_path)},
+    }
+    with open(os.path.join(store_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+def _publish(staging, store_path):
+    """
+    Makes a finished store directory the one at store_path.
+
+    store_path is a symlink to the directory of the latest ingest and is
+    swapped with os.replace(), so readers see either the old or the new
+    store, never a mix. The old directory is deleted afterwards; processes
+    that mapped its files keep reading them until they reopen the store.
+    """
+    previous = os.path.realpath(store_path) if os.path.islink(store_path) else None
+    if os.path.isdir(store_path) and previous is None:
+        # A store written as a plain directory: move it aside once, the link takes its place
+        previous = f'{staging}.old'
+        os.rename(store_path, previous)
+    link = f'{staging}.link'
+    os.symlink(os.path.basename(staging), link)
+    os.replace(link, store_path)
+    if previous is not None and previous != staging:
+        shutil.rmtree(previous, ignore_errors=True)
+
+def _ingest_movies(store_path, movies_path):
+    # Movie ids as an array, titles/genres as UTF-8 blobs with offsets
+    movies = pd.read_csv(movies_path)
+    np.save(os.path.join(store_path, 'movies_movie_id.npy'), movies['movieId'].values.astype(np.int64))
+    for column in MOVIE_TEXT_COLUMNS:
+        encoded = [value.encode('utf-8') for value in movies[column].astype(str)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        with open(os.path.join(store_path, f'movies_{column}.bin'), 'wb') as f:
+            f.write(b''.join(encoded))
+        np.save(os.path.join(store_path, f'movies_{column}_offsets.npy'), offsets)
+
+def _file_signature(path):
+    stat = os.stat(path)
+    # Nanoseconds: an edit within the same second as the ingest still changes the signature
+    return [stat.st_size, stat.st_mtime_ns]
+
+def is_fresh(store_path=config.RATINGS_STORE_PATH):
+    """
+    Checks that the store exists and was ingested from the current CSV files.
+    """
+    meta_path = os.path.join(store_path, 'meta.json')
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        sources = json.load(f)['sources']
+    return all(os.path.exists(path) and _file_signature(path) == signature for path, signature in sources.items())
+
+class RatingsStore:
+    """
+    Memory-mapped view of the binary columnar ratings store.
+
+    Opening the store parses nothing: every column is an np.memmap over its
+    .bin file, so pages are only read when a column is touched and separate
+    processes share them through the OS page cache.
+    """
+
+    def __init__(self, store_path=config.RATINGS_STORE_PATH):
+        with open(os.path.join(store_path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.path = store_path
+        self.n_ratings = meta['n_ratings']
+        for name, dtype in meta['columns'].items():
+            column = os.path.join(store_path, f'{name}.bin')
+            # np.memmap cannot map an empty file
+            array = np.memmap(column, dtype=dtype, mode='r', shape=(self.n_ratings,)) if self.n_ratings \
+                else np.empty(0, dtype=dtype)
+            setattr(self, name, array)
+        self.user_ids = np.load(os.path.join(store_path, 'user_ids.npy'), mmap_mode='r')
+        self.movie_ids = np.load(os.path.join(store_path, 'movie_ids.npy'), mmap_mode='r')
+
+    @classmethod
+    def open(cls, store_path=config.RATINGS_STORE_PATH, auto_ingest=True):
+        # Open the store, ingesting the CSVs first when it is missing or stale
+        if auto_ingest and not is_fresh(store_path):
+            ingest(store_path)
+        return cls(store_path)
+
+    def __len__(self):
+        return self.n_ratings
+
+    def user_encoder(self):
+        # IdEncoder matching the user codes of the store
+        return IdEncoder(self.user_ids)
+
+    def movie_encoder(self):
+        # IdEncoder matching the movie codes of the store
+        return IdEncoder(self.movie_ids)
+
+    def to_frame(self):
+        """
+        Returns the ratings as a dataframe with the CSV columns.
+        """
+        return pd.DataFrame({
+            'userId': self.user_ids[self.user_code],
+            'movieId': self.movie_ids[self.movie_code],
+            'rating': self.rating,
+            'timestamp': self.timestamp,
+        })
+
+    def movies(self):
+        """
+        Returns the movie table as a dataframe with the CSV columns.
+        """
+        data = {'movieId': np.load(os.path.join(self.path, 'movies_movie_id.npy'))}
+        for column in MOVIE_TEXT_COLUMNS:
+            with open(os.path.join(self.path, f'movies_{column}.bin'), 'rb') as f:
+                blob = f.read()
+            offsets = np.load(os.path.join(self.path, f'movies_{column}_offsets.npy')).tolist()
+            data[column] = [blob[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])]
+        return pd.DataFrame(data)
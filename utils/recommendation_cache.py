@@ -0,0 +1,242 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class RecommendationCache:
+    """
+    Two-level cache of recommendation lists.
+
+    Entries are keyed by (model, model version, subject, top_n), where the
+    subject is a user id or a movie title. The first level is an in-process
+    LRU with an optional TTL; the optional second level is a SQLite file so
+    results survive restarts and can be shared between processes. A user's
+    entries are dropped when that user rates a movie (invalidate_subject) and
+    all entries of a model are dropped when its version changes
+    (set_model_version). A result computed while either happened is stale:
+    callers take a token() before computing and put() drops the write when
+    the token no longer matches.
+    """
+
+    def __init__(self, max_entries=10000, ttl=None, disk_path=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._by_subject = {}
+        self._versions = {}
+        # Bumped by invalidate_subject, so puts computed before an invalidation can be told apart
+        self._epochs = {}
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(('hits', 'disk_hits', 'misses', 'evictions', 'expirations', 'invalidations',
+                                      'stale_puts'), 0)
+
+        self._disk = None
+        if disk_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS entries (model TEXT, version TEXT, subject TEXT, top_n INTEGER, "
+                "expires REAL, value BLOB, PRIMARY KEY (model, version, subject, top_n))"
+            )
+            self._disk.execute("CREATE INDEX IF NOT EXISTS entries_subject ON entries (subject)")
+            self._disk.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def model_version(self, model):
+        return self._versions.get(model, 0)
+
+    def set_model_version(self, model, version):
+        """
+        Switches `model` to a new version and drops every cached entry of it.
+        """
+        with self._lock:
+            if self._versions.get(model, 0) == version:
+                return
+            self._versions[model] = version
+            stale = [key for key in self._entries if key[0] == model]
+            for key in stale:
+                self._remove(key)
+            self.counters['invalidations'] += len(stale)
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM entries WHERE model = ? AND version != ?", (model, str(version)))
+                self._disk.commit()
+
+    def invalidate_subject(self, subject):
+        """
+        Drops every cached entry about one user (or movie), for all models.
+        """
+        with self._lock:
+            self._epochs[subject] = self._epochs.get(subject, 0) + 1
+            keys = list(self._by_subject.get(subject, ()))
+            for key in keys:
+                self._remove(key)
+            self.counters['invalidations'] += len(keys)
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM entries WHERE subject = ?", (str(subject),))
+                self._disk.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_subject.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM entries")
+                self._disk.commit()
+
+    def get(self, model, subject, top_n):
+        """
+        Looks up a cached result.
+
+        Returns:
+            (True, result) on a hit, (False, None) on a miss
+        """
+        key = (model, self.model_version(model), subject, top_n)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires is None or expires > now:
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return True, result
+                self._remove(key)
+                self.counters['expirations'] += 1
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT expires, value FROM entries WHERE model = ? AND version = ? AND subject = ? AND top_n = ?",
+                    (model, str(key[1]), str(subject), top_n),
+                ).fetchone()
+                if row is not None and (row[0] is None or row[0] > time.time()):
+                    result = pickle.loads(row[1])
+                    # Promote to the in-process level with the remaining lifetime
+                    remaining = None if row[0] is None else row[0] - time.time()
+                    self._insert(key, result, None if remaining is None else now + remaining)
+                    self.counters['disk_hits'] += 1
+                    return True, result
+
+            self.counters['misses'] += 1
+            return False, None
+
+    def token(self, model, subject):
+        """
+        Current (model version, subject epoch), taken before computing a result for put().
+        """
+        with self._lock:
+            return self._versions.get(model, 0), self._epochs.get(subject, 0)
+
+    def put(self, model, subject, top_n, result, token=None):
+        """
+        Caches a result.
+
+        Args:
+            model: model name
+            subject: user id or movie title the recommendations are for
+            top_n: number of recommendations
+            result: recommendations to cache
+            token: token() taken before the result was computed; the write is
+                dropped when the model version or the subject changed since
+
+        Returns:
+            True when the result was cached
+        """
+        with self._lock:
+            if token is None:
+                token = self._versions.get(model, 0), self._epochs.get(subject, 0)
+            elif token != (self._versions.get(model, 0), self._epochs.get(subject, 0)):
+                self.counters['stale_puts'] += 1
+                return False
+            key = (model, token[0], subject, top_n)
+            self._insert(key, result, None if self.ttl is None else self.clock() + self.ttl)
+            if self._disk is not None:
+                # The disk level outlives the process, so it stores wall-clock expiry times
+                expires = None if self.ttl is None else time.time() + self.ttl
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                    (model, str(key[1]), str(subject), top_n, expires, pickle.dumps(result)),
+                )
+                self._disk.commit()
+        return True
+
+    def get_or_compute(self, model, subject, top_n, compute):
+        """
+        Returns the cached result, or calls compute() and caches its result.
+
+        Args:
+            model: model name
+            subject: user id or movie title the recommendations are for
+            top_n: number of recommendations
+            compute: zero-argument callable producing the result on a miss
+        """
+        # Taken first: a version switch or invalidation during compute() keeps the result out of the cache
+        token = self.token(model, subject)
+        hit, result = self.get(model, subject, top_n)
+        if hit:
+            return result
+        result = compute()
+        self.put(model, subject, top_n, result, token)
+        return result
+
+    def stats(self):
+        # Counters plus the derived hit rate and the current size
+        counters = dict(self.counters)
+        lookups = counters['hits'] + counters['disk_hits'] + counters['misses']
+        counters['hit_rate'] = (counters['hits'] + counters['disk_hits']) / lookups if lookups else 0.0
+        counters['entries'] = len(self._entries)
+        return counters
+
+    def _insert(self, key, result, expires):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        self._entries[key] = (expires, result)
+        self._by_subject.setdefault(key[2], set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.counters['evictions'] += 1
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        keys = self._by_subject.get(key[2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_subject[key[2]]
+
+class CachedRecommender:
+    """
+    Puts a RecommendationCache in front of a model's recommend() method.
+
+    Exposes the same recommend()/get_recommendations() interface, so it can
+    replace the model in UserInterface. add_rating() records a new rating in
+    the model's rated-items index (when it has one) and drops the user's
+    cached lists; set_model() swaps in a retrained model under a new version.
+    """
+
+    def __init__(self, model, cache, name=None, version=0):
+        self.model = model
+        self.cache = cache
+        self.name = name or model.__class__.__name__
+        cache.set_model_version(self.name, version)
+
+    def recommend(self, subject, top_n=10):
+        return self.cache.get_or_compute(self.name, subject, top_n, lambda: self.model.recommend(subject, top_n))
+
+    # Name used by utils.user_interface.UserInterface
+    get_recommendations = recommend
+
+    def add_rating(self, user_id, movie_id):
+        rated_index = getattr(self.model, 'rated_index', None)
+        if rated_index is not None:
+            rated_index.add(user_id, movie_id)
+        self.cache.invalidate_subject(user_id)
+
+    def set_model(self, model, version):
+        self.model = model
+        self.cache.set_model_version(self.name, version)
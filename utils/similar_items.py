@@ -0,0 +1,229 @@
+import json
+import os
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from utils.ranking import top_n
+
+BACKENDS = ('exact', 'ivf')
+METRICS = ('cosine', 'euclidean')
+
+class SimilarItemsIndex:
+    """
+    Persistent k-nearest-neighbour index over the rows of the item-user matrix.
+
+    The index is built once from the `create_X` matrix and answers batches of
+    "similar movies" queries without refitting. Two backends are available:
+
+    - 'exact': brute-force scoring of every item, the reference results.
+    - 'ivf': items are partitioned with k-means into `n_lists` inverted lists
+      and a query only scores the items of its `nprobe` closest lists.
+      Raising `nprobe` trades latency for recall (nprobe == n_lists is exact).
+
+    All arrays are saved as .npy files so `load` can memory-map them.
+    """
+
+    def __init__(self, vectors, sq_norms, metric='cosine', backend='exact', item_ids=None,
+                 centroids=None, list_indptr=None, list_items=None, nprobe=8):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+        self.vectors = vectors
+        self.sq_norms = sq_norms
+        self.metric = metric
+        self.backend = backend
+        self.item_ids = item_ids
+        self.centroids = centroids
+        self.list_indptr = list_indptr
+        self.list_items = list_items
+        self.nprobe = nprobe
+        if backend == 'ivf':
+            # Inverted list of every item, used to mask non-probed candidates
+            self.item_lists = np.empty(vectors.shape[0], dtype=np.int32)
+            self.item_lists[np.asarray(list_items)] = np.repeat(
+                np.arange(len(list_indptr) - 1, dtype=np.int32), np.diff(list_indptr)
+            )
+
+    @classmethod
+    def build(cls, X, metric='cosine', backend='exact', item_ids=None, n_lists=None, n_iter=10,
+              nprobe=8, random_state=0):
+        """
+        Builds the index from the item-user utility matrix.
+
+        Args:
+            X: sparse matrix with one row per item (as returned by create_X)
+            metric: 'cosine' or 'euclidean'
+            backend: 'exact' or 'ivf'
+            item_ids: optional raw movie id of every row
+            n_lists: number of k-means partitions for 'ivf' (default sqrt(items))
+            n_iter: k-means iterations
+            nprobe: default number of lists scanned per query
+            random_state: seed for the k-means initialisation
+
+        Returns:
+            SimilarItemsIndex
+        """
+        vectors = csr_matrix(X, dtype=np.float32)
+        vectors.sort_indices()
+        sq_norms = np.asarray(vectors.multiply(vectors).sum(axis=1), dtype=np.float32).ravel()
+        if metric == 'cosine':
+            # On unit vectors the dot product is the cosine similarity
+            inv_norms = np.zeros_like(sq_norms)
+            np.divide(1.0, np.sqrt(sq_norms), out=inv_norms, where=sq_norms > 0)
+            vectors = csr_matrix(vectors.multiply(inv_norms[:, None]), dtype=np.float32)
+            sq_norms = (sq_norms > 0).astype(np.float32)
+        if item_ids is not None:
+            item_ids = np.asarray(item_ids)
+
+        if backend == 'exact':
+            return cls(vectors, sq_norms, metric, backend, item_ids, nprobe=nprobe)
+
+        n_items = vectors.shape[0]
+        n_lists = n_lists or max(1, int(np.sqrt(n_items)))
+        centroids, assignment = _kmeans(vectors, sq_norms, metric, n_lists, n_iter, random_state)
+        list_items = np.argsort(assignment, kind='stable').astype(np.int32)
+        list_indptr = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=n_lists), out=list_indptr[1:])
+        return cls(vectors, sq_norms, metric, backend, item_ids, centroids, list_indptr, list_items, nprobe)
+
+    def save(self, path):
+        # Store every array as .npy so load() can memory-map it
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            'data': self.vectors.data,
+            'indices': self.vectors.indices,
+            'indptr': self.vectors.indptr,
+            'sq_norms': self.sq_norms,
+        }
+        if self.item_ids is not None:
+            arrays['item_ids'] = self.item_ids
+        if self.backend == 'ivf':
+            arrays.update(centroids=self.centroids, list_indptr=self.list_indptr, list_items=self.list_items)
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f'{name}.npy'), np.asarray(array))
+
+        meta = {'metric': self.metric, 'backend': self.backend, 'nprobe': self.nprobe,
+                'shape': list(self.vectors.shape)}
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Loads an index written by save(), memory-mapping its arrays.
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+
+        def array(name):
+            file_path = os.path.join(path, f'{name}.npy')
+            return np.load(file_path, mmap_mode=mmap_mode) if os.path.exists(file_path) else None
+
+        vectors = csr_matrix((array('data'), array('indices'), array('indptr')), shape=tuple(meta['shape']), copy=False)
+        return cls(vectors, array('sq_norms'), meta['metric'], meta['backend'], array('item_ids'),
+                   array('centroids'), array('list_indptr'), array('list_items'), meta['nprobe'])
+
+    def query(self, item_indices, k=10, nprobe=None, group_size=64):
+        """
+        Finds the k most similar items for a batch of items.
+
+        Args:
+            item_indices: row positions of the query items in X
+            k: number of neighbours per query (the item itself is excluded)
+            nprobe: lists scanned per query for 'ivf' (defaults to self.nprobe)
+            group_size: queries scored together in one sparse product
+
+        Returns:
+            neighbours: int array (len(item_indices), k) of row positions,
+                padded with -1
+            scores: similarity (cosine) or negated squared distance (euclidean)
+        """
+        item_indices = np.atleast_1d(np.asarray(item_indices, dtype=np.int64))
+        neighbours = np.full((len(item_indices), k), -1, dtype=np.int64)
+        scores = np.full((len(item_indices), k), -np.inf)
+
+        if self.backend == 'exact':
+            for start in range(0, len(item_indices), group_size):
+                batch = item_indices[start:start + group_size]
+                out = slice(start, start + len(batch))
+                neighbours[out], scores[out] = self._score_candidates(batch, None, k)
+            return neighbours, scores
+
+        # Probe the closest lists, then group queries sharing their first list
+        # so each group scores a small union of candidates in one product
+        nprobe = min(nprobe or self.nprobe, len(self.list_indptr) - 1)
+        probes, _ = top_n(self._centroid_scores(item_indices), nprobe)
+        order = np.argsort(probes[:, 0], kind='stable')
+        for start in range(0, len(order), group_size):
+            rows = order[start:start + group_size]
+            probe_mask = np.zeros((len(rows), len(self.list_indptr) - 1), dtype=bool)
+            np.put_along_axis(probe_mask, probes[rows], True, axis=1)
+            lists = np.flatnonzero(probe_mask.any(axis=0))
+            candidates = np.concatenate([self.list_items[self.list_indptr[l]:self.list_indptr[l + 1]] for l in lists])
+            allowed = probe_mask[:, self.item_lists[candidates]]
+            neighbours[rows], scores[rows] = self._score_candidates(item_indices[rows], candidates, k, allowed)
+        return neighbours, scores
+
+    def query_ids(self, movie_ids, k=10, **kwargs):
+        # Same as query() but with raw movie ids in and out
+        positions = {movie_id: pos for pos, movie_id in enumerate(self.item_ids.tolist())}
+        neighbours, scores = self.query([positions[m] for m in movie_ids], k, **kwargs)
+        return np.where(neighbours >= 0, self.item_ids[neighbours], -1), scores
+
+    def _score_candidates(self, queries, candidates, k, allowed=None):
+        # Score the query rows against the candidate rows (all items when
+        # candidates is None) and keep the top k
+        if candidates is None:
+            candidates = np.arange(self.vectors.shape[0])
+            dots = (self.vectors[queries] @ self.vectors.T).toarray()
+        else:
+            candidates = np.asarray(candidates, dtype=np.int64)
+            dots = (self.vectors[queries] @ self.vectors[candidates].T).toarray()
+        if self.metric == 'cosine':
+            sims = dots
+        else:
+            sims = 2 * dots - self.sq_norms[queries][:, None] - self.sq_norms[candidates][None, :]
+        sims[candidates[None, :] == queries[:, None]] = -np.inf
+        if allowed is not None:
+            sims[~allowed] = -np.inf
+        positions, values = top_n(sims, k)
+        return np.where(positions >= 0, candidates[positions], -1), values
+
+    def _centroid_scores(self, item_indices):
+        dots = np.asarray(self.vectors[item_indices] @ self.centroids.T)
+        if self.metric == 'cosine':
+            return dots
+        return 2 * dots - np.square(self.centroids).sum(axis=1)[None, :]
+
+def _kmeans(vectors, sq_norms, metric, n_lists, n_iter, random_state):
+    # Lloyd iterations on the sparse item vectors (spherical for cosine)
+    rng = np.random.default_rng(random_state)
+    n_items = vectors.shape[0]
+    nonzero = np.flatnonzero(sq_norms > 0)
+    seeds = rng.choice(nonzero if len(nonzero) >= n_lists else n_items, n_lists, replace=False)
+    centroids = vectors[seeds].toarray()
+
+    def assign(centroids):
+        dots = np.asarray(vectors @ centroids.T)
+        if metric == 'euclidean':
+            dots = 2 * dots - np.square(centroids).sum(axis=1)[None, :]
+        return dots.argmax(axis=1)
+
+    for _ in range(n_iter):
+        assignment = assign(centroids)
+        members = csr_matrix(
+            (np.ones(n_items, dtype=np.float32), (assignment, np.arange(n_items))), shape=(n_lists, n_items)
+        )
+        counts = np.asarray(members.sum(axis=1)).ravel()
+        sums = np.asarray((members @ vectors).todense())
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty lists with random items so every list stays in use
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(n_items, empty.sum(), replace=False)].toarray()
+        if metric == 'cosine':
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.where(norms > 0, norms, 1.0)
+    return centroids.astype(np.float32), assign(centroids)
@@ -0,0 +1,216 @@
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+# Leading/trailing articles dropped from titles ("Matrix, The" and "The Matrix" both become "matrix")
+ARTICLES = ('the', 'a', 'an', 'le', 'la', 'les', 'l', 'il', 'el', 'los', 'las', 'der', 'die', 'das', 'de', 'het')
+# Shorter queries get no prefix bonus: "x" would otherwise match "X-Men" and every other title starting with x
+MIN_PREFIX_LENGTH = 4
+_YEAR = re.compile(r'\s*\((\d{4})(?:[-–]\d{0,4})?\)\s*$')
+_TRAILING_ARTICLE = re.compile(r',\s*(' + '|'.join(ARTICLES) + r")'?$")
+_LEADING_ARTICLE = re.compile(r'^(' + '|'.join(ARTICLES) + r")(?:\s+|')")
+_ALIAS = re.compile(r'\s*\(([^()]*)\)')
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+def split_year(title):
+    # "Toy Story (1995)" -> ("Toy Story", 1995); titles without a year get 0
+    match = _YEAR.search(title)
+    if match is None:
+        return title.strip(), 0
+    return title[:match.start()].strip(), int(match.group(1))
+
+def normalize(name):
+    """
+    Canonical form of one title (without its year) for matching.
+
+    Accents are stripped, leading or trailing articles ("Matrix, The",
+    "Cité des enfants perdus, La") dropped, and everything except letters
+    and digits collapsed to single spaces.
+    """
+    name = unicodedata.normalize('NFKD', name.lower().strip())
+    name = ''.join(c for c in name if not unicodedata.combining(c)).replace('&', ' and ')
+    name = _TRAILING_ARTICLE.sub('', name)
+    name = _NON_WORD.sub(' ', name).strip()
+    return _LEADING_ARTICLE.sub('', name).strip()
+
+def title_aliases(title):
+    """
+    Normalized names of a MovieLens title plus its year.
+
+    "City of Lost Children, The (Cité des enfants perdus, La) (1995)" has
+    two names: the main title and the alternate title in parentheses
+    ("a.k.a." prefixes are dropped), both matched on their own.
+    """
+    rest, year = split_year(title)
+    names = [_ALIAS.sub('', rest)] + [re.sub(r'^(a\.k\.a\.|aka)\s*', '', alias, flags=re.I)
+                                      for alias in _ALIAS.findall(rest)]
+    return [normalized for normalized in dict.fromkeys(normalize(name) for name in names) if normalized], year
+
+def _grams(text, n=3):
+    padded = f' {text} '
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+def levenshtein(a, b):
+    """
+    Edit distance of two strings with the bit-parallel algorithm of Myers / Hyyrö.
+
+    One pass over `b` updates the whole DP column of `a` as Python int bit
+    vectors, so the cost is O(len(b)) big-int operations instead of
+    O(len(a) * len(b)) Python steps.
+    """
+    if not a:
+        return len(b)
+    if not b:
+        return len(a)
+    peq = {}
+    for i, c in enumerate(a):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    full = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    pv, mv, score = full, 0, len(a)
+    for c in b:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv & full
+    return score
+
+class TitleIndex:
+    """
+    Typo-tolerant lookup of movie titles.
+
+    Every title (and each alternate title in parentheses) is normalized and
+    split into character trigrams; an inverted index maps every trigram to
+    the names containing it as a CSR posting list. A query is normalized
+    the same way, candidates are ranked by the Dice overlap of their
+    trigrams with the query's, and only the best `n_candidates` are
+    re-ranked by edit distance. A "(1995)" year in the query favours
+    titles of that year. Exact normalized matches skip the fuzzy step.
+    """
+
+    def __init__(self, names, positions, years, grams, indptr, postings, gram_counts):
+        self.names = names
+        self.positions = positions
+        self.years = years
+        self.grams = grams
+        self.indptr = indptr
+        self.postings = postings
+        self.gram_counts = gram_counts
+        self._gram_rows = {gram: row for row, gram in enumerate(grams.tolist())}
+        self._exact = {}
+        for alias, name in enumerate(names.tolist()):
+            self._exact.setdefault(name, []).append(alias)
+
+    @classmethod
+    def build(cls, titles):
+        """
+        Indexes a sequence of titles; results refer to positions in it.
+
+        Args:
+            titles: e.g. movie_data['title']
+        """
+        names, positions, years = [], [], []
+        for position, title in enumerate(titles):
+            aliases, year = title_aliases(str(title))
+            names += aliases
+            positions += [position] * len(aliases)
+            years += [year] * len(aliases)
+
+        alias_grams = [_grams(name) for name in names]
+        grams = np.array(sorted(set().union(*alias_grams)) if alias_grams else [], dtype=str)
+        gram_rows = {gram: row for row, gram in enumerate(grams.tolist())}
+        rows = np.fromiter((gram_rows[g] for gs in alias_grams for g in gs), dtype=np.int64)
+        aliases = np.repeat(np.arange(len(names)), [len(gs) for gs in alias_grams])
+        order = np.lexsort((aliases, rows))
+        indptr = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(grams)), out=indptr[1:])
+        return cls(np.array(names, dtype=str), np.array(positions, dtype=np.int32), np.array(years, dtype=np.int16),
+                   grams, indptr, aliases[order].astype(np.int32),
+                   np.array([len(gs) for gs in alias_grams], dtype=np.int16))
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in ('names', 'positions', 'years', 'grams', 'indptr', 'postings', 'gram_counts'):
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, path):
+        # Numeric arrays are memory-mapped; the names and trigrams are read to rebuild the lookup dicts
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+                  for name in ('positions', 'years', 'indptr', 'postings', 'gram_counts')}
+        return cls(np.load(os.path.join(path, 'names.npy')), arrays['positions'], arrays['years'],
+                   np.load(os.path.join(path, 'grams.npy')), arrays['indptr'], arrays['postings'],
+                   arrays['gram_counts'])
+
+    def search(self, query, limit=5, n_candidates=20):
+        """
+        Best matching titles of a query.
+
+        Args:
+            query: title as typed, e.g. "matrix" or "Jumanji (1995)"
+            limit: number of results
+            n_candidates: trigram candidates re-ranked by edit distance
+
+        Returns:
+            list of (position, score) sorted by decreasing score; score is
+            1 - edit distance / length (0.9 x that for a prefix of a longer
+            title, for queries of MIN_PREFIX_LENGTH characters or more),
+            adjusted by the year when one is given
+        """
+        # Queries are parsed like the indexed titles; the main name drives the fuzzy match
+        names, year = title_aliases(query)
+        if not names:
+            return []
+        name = names[0]
+
+        # Exact normalized matches plus the best trigram candidates
+        candidates = [alias for other in names for alias in self._exact.get(other, ())]
+        query_grams = _grams(name)
+        rows = [self._gram_rows[gram] for gram in query_grams if gram in self._gram_rows]
+        if rows:
+            hits = np.concatenate([self.postings[self.indptr[row]:self.indptr[row + 1]] for row in rows])
+            aliases, shared = np.unique(hits, return_counts=True)
+            dice = 2 * shared / (len(query_grams) + self.gram_counts[aliases])
+            if len(aliases) > n_candidates:
+                keep = np.argpartition(-dice, n_candidates - 1)[:n_candidates]
+                aliases = aliases[keep]
+            candidates += aliases.tolist()
+
+        best = {}
+        for alias in dict.fromkeys(candidates):
+            candidate = str(self.names[alias])
+            score = 1 - levenshtein(name, candidate) / max(len(name), len(candidate))
+            if len(candidate) > len(name) >= MIN_PREFIX_LENGTH:
+                # Prefix queries ("shawshank", "star wars") match the start of a longer title, slightly discounted
+                score = max(score, 0.9 * (1 - levenshtein(name, candidate[:len(name)]) / len(name)))
+            if year:
+                score += 0.05 if self.years[alias] == year else -0.1
+            position = int(self.positions[alias])
+            if score > best.get(position, -np.inf):
+                best[position] = score
+        return sorted(best.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def lookup(self, query, min_score=0.6):
+        # Position of the best match, or None when nothing scores min_score or better
+        names, year = title_aliases(query)
+        exact = [alias for name in names for alias in self._exact.get(name, ())]
+        if exact:
+            # Exact name: the first title of the requested year (or the first title when no year is given)
+            same_year = [alias for alias in exact if not year or self.years[alias] == year]
+            if same_year:
+                return int(self.positions[same_year[0]])
+        results = self.search(query, limit=1)
+        if results and results[0][1] >= min_score:
+            return results[0][0]
+        return None
@@ -0,0 +1,131 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.id_encoder import IdEncoder
+from utils.ranking import top_n as select_top_n
+
+# Bytes per scored (user, movie) cell: float32 score, float64 copy in top_n, exclusion mask
+BYTES_PER_CELL = 16
+
+def tile_shape(n_users, n_movies, memory_budget_mb):
+    """
+    Chooses a (users, movies) tile whose score matrix fits the memory budget.
+
+    Whole catalog rows are preferred; the catalog is only split when a
+    single row of it does not fit.
+    """
+    cells = max(1, int(memory_budget_mb * 2**20) // BYTES_PER_CELL)
+    movies = min(n_movies, cells)
+    users = min(n_users, max(1, cells // movies))
+    return users, movies
+
+def build_top_n_table(path, score, user_encoder, movie_encoder, top_n=10, rated_index=None,
+                      memory_budget_mb=256):
+    """
+    Scores every user against every movie and writes the top-N table to disk.
+
+    The users x movies score matrix is never materialized: it is computed in
+    tiles sized to `memory_budget_mb`, already-rated movies are masked, and a
+    running top-N per user is merged with each tile's argpartition top-N.
+    Results are written straight into memory-mapped output files.
+
+    Args:
+        path: output directory
+        score: callable (user_codes, movie_codes) -> scores array of shape (users, movies)
+        user_encoder: IdEncoder of the users (table rows)
+        movie_encoder: IdEncoder of the movies (score columns)
+        top_n: recommendations kept per user
+        rated_index: optional RatedItemsIndex of movies to exclude
+        memory_budget_mb: approximate memory for one tile
+
+    Returns:
+        TopNTable opened on `path`
+    """
+    os.makedirs(path, exist_ok=True)
+    n_users, n_movies = len(user_encoder), len(movie_encoder)
+    user_tile, movie_tile = tile_shape(n_users, n_movies, memory_budget_mb)
+    catalog = pd.Index(movie_encoder.classes_)
+
+    user_encoder.save(os.path.join(path, 'user_ids.npy'))
+    movie_encoder.save(os.path.join(path, 'movie_ids.npy'))
+    items = np.lib.format.open_memmap(os.path.join(path, 'items.npy'), mode='w+', dtype=np.int32,
+                                      shape=(n_users, top_n))
+    scores = np.lib.format.open_memmap(os.path.join(path, 'scores.npy'), mode='w+', dtype=np.float32,
+                                       shape=(n_users, top_n))
+
+    for user_start in range(0, n_users, user_tile):
+        user_codes = np.arange(user_start, min(user_start + user_tile, n_users))
+        best_items = np.full((len(user_codes), top_n), -1, dtype=np.int64)
+        best_scores = np.full((len(user_codes), top_n), -np.inf)
+
+        for movie_start in range(0, n_movies, movie_tile):
+            movie_codes = np.arange(movie_start, min(movie_start + movie_tile, n_movies))
+            tile = np.asarray(score(user_codes, movie_codes), dtype=np.float64)
+            if rated_index is not None:
+                rated = rated_index.mask(user_encoder.inverse_transform(user_codes).tolist(), catalog[movie_codes])
+                tile[rated] = -np.inf
+
+            # Merge the tile's top-N into the running top-N; running entries come
+            # first, so ties still resolve to the lower movie code
+            tile_items, tile_scores = select_top_n(tile, top_n)
+            tile_items = np.where(tile_items >= 0, tile_items + movie_start, -1)
+            merged_items = np.concatenate([best_items, tile_items], axis=1)
+            merged_scores = np.concatenate([best_scores, tile_scores], axis=1)
+            positions, best_scores = select_top_n(merged_scores, top_n)
+            best_items = np.where(positions >= 0, np.take_along_axis(merged_items, np.maximum(positions, 0), axis=1), -1)
+
+        items[user_codes] = best_items
+        scores[user_codes] = best_scores
+    items.flush()
+    scores.flush()
+    return TopNTable.load(path)
+
+class TopNTable:
+    """
+    Precomputed top-N recommendations of every user, served from disk.
+
+    `items[row]` holds movie codes (-1 padded) and `scores[row]` their
+    scores; both are memory-mapped, so a lookup is one id -> row encoding
+    and one row read.
+    """
+
+    def __init__(self, user_encoder, movie_encoder, items, scores):
+        self.user_encoder = user_encoder
+        self.movie_encoder = movie_encoder
+        self.items = items
+        self.scores = scores
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        return cls(
+            IdEncoder.load(os.path.join(path, 'user_ids.npy')),
+            IdEncoder.load(os.path.join(path, 'movie_ids.npy')),
+            np.load(os.path.join(path, 'items.npy'), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, 'scores.npy'), mmap_mode=mmap_mode),
+        )
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, user_id):
+        return user_id in self.user_encoder
+
+    def lookup(self, user_id, top_n=None):
+        """
+        Returns the stored recommendations of one user.
+
+        Args:
+            user_id: raw user id
+            top_n: optional cut-off (at most the stored N)
+
+        Returns:
+            movie_ids: list of raw movie ids, best first
+            scores: list of their scores
+        """
+        row = self.user_encoder[user_id]
+        items = self.items[row, :top_n]
+        keep = items >= 0
+        return (self.movie_encoder.inverse_transform(items[keep]).tolist(),
+                self.scores[row, :top_n][keep].tolist())
@@ -1,10 +1,23 @@
 # utils/user_interface.py
 
+from utils.instrumentation import stage
+from utils.recommendation_cache import CachedRecommender
+
 class UserInterface:
-    def __init__(self, collaborative_filtering_model, content_based_model, deep_learning_model):
+    def __init__(self, collaborative_filtering_model, content_based_model, deep_learning_model, cache=None,
+                 hybrid_model=None):
+        # With a RecommendationCache every model is served through it
+        if cache is not None:
+            collaborative_filtering_model = CachedRecommender(collaborative_filtering_model, cache)
+            content_based_model = CachedRecommender(content_based_model, cache)
+            deep_learning_model = CachedRecommender(deep_learning_model, cache)
+            if hybrid_model is not None:
+                hybrid_model = CachedRecommender(hybrid_model, cache)
         self.cf_model = collaborative_filtering_model
         self.cb_model = content_based_model
         self.dl_model = deep_learning_model
+        # Optional models.hybrid.HybridRecommender blending the three models
+        self.hybrid_model = hybrid_model
 
     def get_user_input(self):
         print("Welcome to Movie Recommendation System!")
@@ -27,6 +40,8 @@ class UserInterface:
             'Content-Based': self.cb_model,
             'Deep Learning': self.dl_model
         }
+        if self.hybrid_model is not None:
+            recommendation_models['Hybrid'] = self.hybrid_model
         
         print("\nChoose a recommendation model:")
         for i, model_name in enumerate(recommendation_models.keys(), start=1):
@@ -43,9 +58,11 @@ class UserInterface:
             except ValueError:
                 print("Invalid input. Please enter a valid number.")
         
-        recommendations = chosen_model.get_recommendations(user_id)
+        model_name = chosen_model.name if isinstance(chosen_model, CachedRecommender) else chosen_model.__class__.__name__
+        with stage(f'request.{model_name}', profile=True):
+            recommendations = chosen_model.get_recommendations(user_id)
         
-        print(f"\n{chosen_model.__class__.__name__} Recommendations:")
+        print(f"\n{model_name} Recommendations:")
         for i, movie in enumerate(recommendations, start=1):
             print(f"{i}. {movie}")
 
@@ -59,5 +76,6 @@ class UserInterface:
 #     content_based_model = ContentBasedModel()
 #     deep_learning_model = DeepLearningModel()
 #
-#     ui = UserInterface(collaborative_filtering_model, content_based_model, deep_learning_model)
+#     cache = RecommendationCache(max_entries=10000, ttl=3600)
+#     ui = UserInterface(collaborative_filtering_model, content_based_model, deep_learning_model, cache)
 #     ui.run()